@@ -0,0 +1,317 @@
+"""
+Runs many Brewin programs across a pool of worker processes.
+
+    jobs = [BatchJob.from_file(path) for path in paths]       # program.br with optional program.in / program.out
+    for result in run_batch(jobs, workers=8, timeout=10, memory_limit=512 * 1024 * 1024, history=runtimes):
+        ...                                                     # results arrive as the programs finish
+
+    python batch_runner.py [--workers N] [--timeout S] [--memory MB] [--history FILE] [--output FILE]
+                           [--max-steps N] [--max-seconds S] [--max-objects N] [--max-call-depth N] program.br ...
+
+Each worker process runs one program at a time with Interpreter(console_output=False) and sends back a result:
+    name, status, output (get_output()), error_type and error_line (get_error_type_and_line()), exception (the
+    message of the error that stopped the program), seconds, usage (Interpreter.get_resource_usage()), and
+    passed when the job has an expected output
+status is "ok", "error" (a Brewin error, with error_type set), "exception" (any other Python error), "limit"
+(the program exceeded one of the ResourceLimits given as limits, and the worker stopped it), "timeout" (the
+worker was killed after timeout seconds), "memory" (the program exceeded memory_limit bytes of address space)
+or "crash" (the worker died). A worker that timed out, crashed or ran out of memory is replaced; limits stop
+runaway programs inside the worker, which then goes on to its next job. Each worker keeps the Programs (see
+program.py) of the last PROGRAMS_PER_WORKER sources it ran, so jobs that run one program against many inputs
+only load it once per worker.
+
+Jobs run longest first by their runtimes in history (name -> seconds), which run_batch updates as results come
+in; jobs that have no runtime yet run before all others. The command line runner keeps the history in a JSON
+file and writes every result as a line of JSON as soon as it arrives.
+"""
+
+import argparse
+import collections
+import json
+import multiprocessing
+import multiprocessing.connection
+import os
+import sys
+import time
+
+try:
+    import resource
+except ImportError:  # not available on Windows; memory_limit is then ignored
+    resource = None
+
+OK = "ok"
+ERROR = "error"
+EXCEPTION = "exception"
+LIMIT = "limit"
+TIMEOUT = "timeout"
+MEMORY = "memory"
+CRASH = "crash"
+
+PROGRAMS_PER_WORKER = 16  # loaded programs each worker keeps for reuse
+
+
+class BatchJob:
+    # program is a list of source lines; inp is a list of input lines; expected_output is a list of lines
+    def __init__(self, name, program, inp=None, expected_output=None):
+        self.name = name
+        self.program = program
+        self.inp = inp
+        self.expected_output = expected_output
+
+    # reads path, plus the input and expected output next to it (same name, .in and .out), if they exist
+    @staticmethod
+    def from_file(path):
+        base = os.path.splitext(path)[0]
+        return BatchJob(path, _read_lines(path), _read_lines(base + ".in"), _read_lines(base + ".out"))
+
+
+def _read_lines(path):
+    if not os.path.exists(path):
+        return None
+    with open(path) as source:
+        return source.read().splitlines()
+
+
+# runs in the worker process: runs jobs sent over conn until it receives None
+def _worker_main(conn, engine, memory_limit, limits):
+    if memory_limit is not None and resource is not None:
+        resource.setrlimit(resource.RLIMIT_AS, (memory_limit, memory_limit))
+    from interpreterv3 import Interpreter
+    from governor import ResourceLimitExceeded
+
+    programs = collections.OrderedDict()  # source lines -> Program, least recently run first
+    while True:
+        job = conn.recv()
+        if job is None:
+            return
+        name, program, inp, job_limits = job
+        interpreter = Interpreter(console_output=False, inp=inp, engine=engine)
+        status = OK
+        exception = None
+        start = time.perf_counter()
+        try:
+            interpreter.run(_load(programs, program), limits=limits if job_limits is None else job_limits)
+        except MemoryError:
+            status = MEMORY
+        except ResourceLimitExceeded as exceeded:
+            status = LIMIT
+            exception = str(exceeded)
+        except Exception as error:
+            status = ERROR if interpreter.error_type is not None else EXCEPTION
+            exception = f"{type(error).__name__}: {error}"
+        seconds = time.perf_counter() - start
+        error_type, error_line = interpreter.get_error_type_and_line()
+        try:
+            conn.send(
+                {
+                    "name": name,
+                    "status": status,
+                    "output": list(interpreter.get_output()),
+                    "error_type": None if error_type is None else error_type.name,
+                    "error_line": error_line,
+                    "exception": exception,
+                    "seconds": seconds,
+                    "usage": interpreter.get_resource_usage(),
+                }
+            )
+        except MemoryError:
+            conn.send(_result(name, MEMORY, seconds))
+
+
+# returns the Program for source, from programs if it was loaded recently
+def _load(programs, source):
+    from program import Program
+
+    key = tuple(source)
+    program = programs.get(key)
+    if program is None:
+        program = programs[key] = Program(source)
+        if len(programs) > PROGRAMS_PER_WORKER:
+            programs.popitem(last=False)
+    else:
+        programs.move_to_end(key)
+    return program
+
+
+def _result(name, status, seconds, exception=None):
+    return {
+        "name": name,
+        "status": status,
+        "output": [],
+        "error_type": None,
+        "error_line": None,
+        "exception": exception,
+        "seconds": seconds,
+        "usage": None,
+    }
+
+
+# parent-side handle of one worker process; limits apply to every job sent without its own
+class Worker:
+    def __init__(self, context, engine, memory_limit, limits):
+        self.conn, child_conn = context.Pipe()
+        self.process = context.Process(
+            target=_worker_main, args=(child_conn, engine, memory_limit, limits), name="brewin-batch", daemon=True
+        )
+        self.process.start()
+        child_conn.close()
+        self.job = None
+        self.started = None
+        self.jobs_run = 0
+
+    # starts running job (a BatchJob), with limits instead of the worker's if given
+    def send(self, job, limits=None):
+        self.job = job
+        self.started = time.perf_counter()
+        self.jobs_run += 1
+        try:
+            self.conn.send((job.name, job.program, job.inp, limits))
+        except OSError:
+            pass  # the worker process has died; receive reports the crash
+
+    # waits up to timeout seconds from the start of the job (None: no limit) for its result; returns the result
+    # and whether the worker is still alive
+    def receive(self, timeout=None):
+        ready = timeout is None or self.conn.poll(max(0.0, self.started + timeout - time.perf_counter()))
+        elapsed = time.perf_counter() - self.started
+        if not ready:
+            return _result(self.job.name, TIMEOUT, elapsed), False
+        try:
+            return self.conn.recv(), True
+        except (EOFError, OSError):
+            self.process.join(1)
+            return _result(self.job.name, CRASH, elapsed, f"worker exited with code {self.process.exitcode}"), False
+
+    def stop(self):
+        try:
+            self.conn.send(None)
+        except OSError:
+            pass
+        self.process.join(1)
+        self.kill()
+
+    def kill(self):
+        if self.process.is_alive():
+            self.process.kill()
+            self.process.join()
+        self.conn.close()
+
+
+# returns jobs sorted longest first by their previous runtimes; jobs without one go first
+def schedule(jobs, history):
+    unknown = float("inf")
+    return sorted(jobs, key=lambda job: -history.get(job.name, unknown))
+
+
+# yields a result dict per job as the jobs finish; history (name -> seconds), if given, orders the jobs and is
+# updated with the new runtimes. max_jobs_per_worker replaces each worker after that many programs. limits is an
+# optional ResourceLimits every program runs with
+def run_batch(
+    jobs,
+    workers=None,
+    timeout=None,
+    memory_limit=None,
+    engine="tree",
+    history=None,
+    max_jobs_per_worker=None,
+    limits=None,
+):
+    history = {} if history is None else history
+    pending = schedule(jobs, history)
+    pending.reverse()  # pop() takes the longest
+    context = multiprocessing.get_context()
+    pool_size = max(1, min(workers or os.cpu_count() or 1, len(pending)))
+    idle = [Worker(context, engine, memory_limit, limits) for _ in range(pool_size if pending else 0)]
+    busy = []
+    try:
+        while pending or busy:
+            while pending and idle:
+                worker = idle.pop()
+                worker.send(pending.pop())
+                busy.append(worker)
+            wait_time = None
+            if timeout is not None:
+                now = time.perf_counter()
+                wait_time = max(0.0, min(worker.started + timeout for worker in busy) - now)
+            ready = multiprocessing.connection.wait([worker.conn for worker in busy], wait_time)
+            for worker in list(busy):
+                if worker.conn in ready:
+                    result, alive = worker.receive()
+                elif timeout is not None and time.perf_counter() - worker.started >= timeout:
+                    result, alive = worker.receive(timeout)
+                else:
+                    continue
+                busy.remove(worker)
+                job = worker.job
+                if job.expected_output is not None:
+                    result["passed"] = result["status"] in (OK, ERROR) and result["output"] == job.expected_output
+                history[job.name] = result["seconds"]
+                # a worker that ran out of memory may be left in a bad state, so it is replaced too
+                retire = result["status"] == MEMORY or (
+                    max_jobs_per_worker is not None and worker.jobs_run >= max_jobs_per_worker
+                )
+                if alive and not retire:
+                    idle.append(worker)
+                else:
+                    if alive:
+                        worker.stop()
+                    else:
+                        worker.kill()
+                    if pending:
+                        idle.append(Worker(context, engine, memory_limit, limits))
+                yield result
+    finally:
+        for worker in idle:
+            worker.stop()
+        for worker in busy:
+            worker.kill()
+
+
+def main(argv):
+    from interpreterv3 import Interpreter
+    from governor import ResourceLimits
+
+    arg_parser = argparse.ArgumentParser(description="Run Brewin programs across a pool of worker processes.")
+    arg_parser.add_argument("programs", nargs="+")
+    arg_parser.add_argument("--workers", type=int, help="worker processes (default: one per CPU)")
+    arg_parser.add_argument("--timeout", type=float, help="seconds each program may run")
+    arg_parser.add_argument("--memory", type=int, help="megabytes of address space each worker may use")
+    arg_parser.add_argument("--engine", default="tree", choices=sorted(Interpreter.ENGINES))
+    arg_parser.add_argument("--history", help="JSON file of previous runtimes, used to run long programs first")
+    arg_parser.add_argument("--output", help="write results here instead of stdout")
+    arg_parser.add_argument("--max-steps", type=int, help="loop iterations and calls each program may make")
+    arg_parser.add_argument("--max-seconds", type=float, help="seconds each program may run before its worker stops it")
+    arg_parser.add_argument("--max-objects", type=int, help="Brewin objects each program may have alive at once")
+    arg_parser.add_argument("--max-call-depth", type=int, help="how deeply each program's method calls may nest")
+    args = arg_parser.parse_args(argv)
+
+    history = {}
+    if args.history and os.path.exists(args.history):
+        with open(args.history) as source:
+            history = json.load(source)
+    jobs = [BatchJob.from_file(path) for path in args.programs]
+    memory_limit = None if args.memory is None else args.memory * 1024 * 1024
+    limits = None
+    if any(limit is not None for limit in (args.max_steps, args.max_seconds, args.max_objects, args.max_call_depth)):
+        limits = ResourceLimits(args.max_steps, args.max_seconds, args.max_objects, args.max_call_depth)
+    output = sys.stdout if args.output is None else open(args.output, "w")
+    failed = 0
+    try:
+        for result in run_batch(
+            jobs, args.workers, args.timeout, memory_limit, args.engine, history, limits=limits
+        ):
+            output.write(json.dumps(result) + "\n")
+            output.flush()
+            if result.get("passed") is False:
+                failed += 1
+    finally:
+        if output is not sys.stdout:
+            output.close()
+        if args.history:
+            with open(args.history, "w") as destination:
+                json.dump(history, destination, indent=1, sort_keys=True)
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,770 @@
+"""
+Benchmark suite. By default it runs every program in benchmarks/programs under each engine, checks its output
+against the .out file next to it, and reports the time per benchmark side by side:
+
+    python benchmarks/run_benchmarks.py [--engine E ...] [--only NAME ...] [--warmup W] [--repeat R]
+                                        [--save FILE] [--compare FILE] [--threshold PERCENT]
+
+Each benchmark is run W times untimed and then R times timed, each time by a new Interpreter; the report gives
+the fastest and the median run. --save writes the results to a JSON baseline, and --compare flags every
+benchmark whose fastest run is more than --threshold percent slower than in the baseline, exiting with status
+1 if there are any.
+
+--case runs one of the comparison cases below instead, each timing one workload under the configurations it
+compares and reporting the best of R runs of each. --size sets the size of the workload (its unit is given
+below, with the default), and --engine the engines it runs under:
+
+    python benchmarks/run_benchmarks.py --case NAME [--case NAME ...] [--engine E ...] [--repeat R] [--size N]
+
+    parse       BParser.parse (regex tokenizer) against BParser.parse_by_char (the original character loop)
+                on a generated source; classes (2000)
+    new         allocating a linked list of objects from a class hierarchy and walking it through inherited
+                and overridden methods; objects (20000)
+    typecheck   runs with and without Interpreter(type_check=True), which skips the runtime type checks the
+                checker proved redundant, and the time of Interpreter.validate; loop iterations (20000)
+    output      each output sink and output log on a print-heavy program, with the peak memory traced while
+                it ran; lines (200000), bytecode engine
+    input       an inp list (the whole file read first) against each streaming InputSource on a program
+                summing a file of integers, with the peak memory; numbers (200000), bytecode engine
+    optimizer   runs with and without Interpreter(optimize=True) on a loop full of constant and loop-invariant
+                expressions, and the time of the optimizing pass; loop iterations (20000)
+    quicken     the tree walker with Interpreter(quicken=False) and the default quicken=True on an arithmetic
+                loop, and the quickening counters; numbers whose Collatz steps are summed (2000), tree engine
+    rope        building a string one character at a time, with ropes and with plain Python strings, for
+                four lengths halving from the size; characters (1 MB), bytecode engine
+    program     one small program run against many input sets, from its source each time and from a Program
+                built once, without and with type checking; input sets (200)
+    daemon      a new interpreter process per run, a `python daemon.py run` process and a connected Client,
+                against a daemon the case starts; runs of fib(10) (20)
+    lazy        a program bundling many library classes, of which main uses a few, with and without
+                Interpreter(lazy_classes=True), timing whole runs; library classes (300)
+"""
+
+import argparse
+import glob
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+PROGRAM_DIR = os.path.join(BENCHMARK_DIR, "programs")
+ROOT = os.path.join(BENCHMARK_DIR, "..")
+
+sys.path.insert(0, ROOT)
+
+from bparser import BParser  # noqa: E402
+from daemon import Client, Daemon  # noqa: E402
+from input_sources import FileInput, IteratorInput  # noqa: E402
+from interpreterv3 import Interpreter  # noqa: E402
+from optimizer import Optimizer  # noqa: E402
+from output_sinks import FileSink, NullSink, RingLog, SpillLog  # noqa: E402
+from program import Program  # noqa: E402
+from type_valuev2 import Rope  # noqa: E402
+
+BASELINE_VERSION = 1
+ALL_ENGINES = sorted(Interpreter.ENGINES)
+
+
+# runs program (a list of lines, or a Program) with a new Interpreter made with options, and returns the
+# interpreter; raises RuntimeError if the program didn't print expected (None: don't check)
+def run_program(program, expected, **options):
+    interpreter = Interpreter(console_output=False, **options)
+    interpreter.run(program)
+    if expected is not None and interpreter.get_output() != expected:
+        raise RuntimeError(f"{options} printed {interpreter.get_output()}")
+    return interpreter
+
+
+# the fastest of repeat calls of run(), in seconds
+def best_time(run, repeat):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        run()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+# the peak memory allocated while run() ran, in MiB; it is measured on its own run, since tracing allocations
+# slows the program down
+def peak_memory(run):
+    tracemalloc.start()
+    try:
+        run()
+        return tracemalloc.get_traced_memory()[1] / (1024 * 1024)
+    finally:
+        tracemalloc.stop()
+
+
+# the program suite
+
+# name -> (source lines, expected output lines)
+def load_benchmarks(only=None):
+    benchmarks = {}
+    for path in sorted(glob.glob(os.path.join(PROGRAM_DIR, "*.br"))):
+        name = os.path.splitext(os.path.basename(path))[0]
+        if only and name not in only:
+            continue
+        with open(path) as source:
+            program = source.read().splitlines()
+        with open(os.path.splitext(path)[0] + ".out") as expected:
+            benchmarks[name] = (program, expected.read().splitlines())
+    return benchmarks
+
+
+# returns {"min": seconds, "median": seconds}
+def time_benchmark(name, program, expected, engine, warmup, repeat):
+    times = []
+    for run in range(warmup + repeat):
+        interpreter = Interpreter(console_output=False, engine=engine)
+        start = time.perf_counter()
+        interpreter.run(program)
+        elapsed = time.perf_counter() - start
+        if interpreter.get_output() != expected:
+            raise RuntimeError(f"{name} printed {interpreter.get_output()} under the {engine} engine")
+        if run >= warmup:
+            times.append(elapsed)
+    return {"min": min(times), "median": statistics.median(times)}
+
+
+def print_report(results, engines, names):
+    header = f"{'benchmark':<14}" + "".join(f" {engine + ' median ms (min)':>26}" for engine in engines)
+    if len(engines) > 1:
+        header += "".join(f" {engine + ' x':>12}" for engine in engines[1:])
+    print(header)
+    for name in names:
+        row = f"{name:<14}"
+        for engine in engines:
+            timing = results[engine][name]
+            row += f" {timing['median'] * 1000:>17.1f} ({timing['min'] * 1000:>6.1f})"
+        for engine in engines[1:]:  # speedup of each engine over the first, by median
+            row += f" {results[engines[0]][name]['median'] / results[engine][name]['median']:>11.2f}x"
+        print(row)
+
+
+def save_baseline(path, results, warmup, repeat):
+    baseline = {
+        "version": BASELINE_VERSION,
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "warmup": warmup,
+        "repeat": repeat,
+        "results": results,
+    }
+    with open(path, "w") as destination:
+        json.dump(baseline, destination, indent=1, sort_keys=True)
+
+
+# prints the comparison with a saved baseline; returns the number of regressions
+def compare_baseline(path, results, threshold):
+    with open(path) as source:
+        baseline = json.load(source)
+    if baseline.get("version") != BASELINE_VERSION:
+        raise RuntimeError(f"{path} is not a version {BASELINE_VERSION} baseline")
+    regressions = 0
+    print(f"\ncompared with {path} (threshold {threshold:.0f}%)")
+    for engine, timings in results.items():
+        for name, timing in timings.items():
+            previous = baseline["results"].get(engine, {}).get(name)
+            if previous is None:
+                print(f"  {engine:<9} {name:<14} new")
+                continue
+            change = 100 * (timing["min"] / previous["min"] - 1)
+            flag = ""
+            if change > threshold:
+                flag = "  REGRESSION"
+                regressions += 1
+            elif change < -threshold:
+                flag = "  faster"
+            print(
+                f"  {engine:<9} {name:<14} {previous['min'] * 1000:9.1f} -> {timing['min'] * 1000:9.1f} ms"
+                f"  {change:+6.1f}%{flag}"
+            )
+    return regressions
+
+
+# the comparison cases: each is called as case(engines, size, repeat) and prints its report
+
+PARSE_CLASS = [
+    "# generated class {n}",
+    "(class worker{n} inherits base",
+    '  (field string label "worker number {n} # not a comment")',
+    "  (field int count 0)",
+    "  (method int step ((int x) (int y))  # comment after code",
+    "    (begin",
+    "      (set count (+ count 1))",
+    "      (if (> x y) (return (- x y)) (return (* (+ x {n}) y)))))",
+    "  (method void run ()",
+    "    (let ((int i 0) (string s \"\"))",
+    "      (while (< i 10)",
+    "        (begin",
+    '          (set s (+ s "ab"))',
+    "          (try (call me step i {n}) (print exception))",
+    "          (set i (+ i 1))))",
+    "      (print label \" \" s))))",
+]
+
+
+def _parse_tree(tree):
+    if isinstance(tree, list):
+        return [_parse_tree(item) for item in tree]
+    return (str(tree), tree.line_num)
+
+
+def case_parse(engines, size, repeat):
+    lines = ["(class base (method void hello () (print \"hi\")))"]
+    for n in range(size):
+        lines.extend(line.format(n=n) for line in PARSE_CLASS)
+    lines.append("(class main (method void main () (call (new worker0) run)))")
+    status_fast, tree_fast = BParser.parse(lines)
+    status_slow, tree_slow = BParser.parse_by_char(lines)
+    if (status_fast, _parse_tree(tree_fast)) != (status_slow, _parse_tree(tree_slow)):
+        raise RuntimeError("parsers disagree on the generated program")
+
+    print(f"{len(lines)} lines, {sum(len(line) for line in lines)} characters")
+    results = {}
+    for name, parse in (("parse_by_char", BParser.parse_by_char), ("parse", BParser.parse)):
+        results[name] = elapsed = best_time(lambda: parse(lines), repeat)
+        print(f"  {name:<14} {elapsed * 1000:9.1f} ms  {len(lines) / elapsed:12,.0f} lines/s")
+    print(f"  speedup        {results['parse_by_char'] / results['parse']:9.2f}x")
+
+
+NEW_PROGRAM = """
+(class shape
+  (field int id 0)
+  (field string label "shape")
+  (method void set_id ((int i)) (set id i))
+  (method int area () (return 0))
+  (method int weight () (return (+ id (call me area)))))
+(class rect inherits shape
+  (field int w 2)
+  (field int h 3)
+  (method int area () (return (* w h))))
+(class node inherits rect
+  (field node next null)
+  (field bool visited false)
+  (method void link ((node n)) (set next n))
+  (method node get_next () (return next))
+  (method int area () (return (+ 1 (call super area)))))
+(class main
+  (method void main ()
+    (let ((node head null) (node n null) (int i 0) (int total 0))
+      (while (< i {size})
+        (begin
+          (set n (new node))
+          (call n set_id i)
+          (call n link head)
+          (set head n)
+          (set i (+ i 1))))
+      (while (!= head null)
+        (begin
+          (set total (+ total (call head weight)))
+          (set head (call head get_next))))
+      (print total))))
+"""
+
+
+def case_new(engines, size, repeat):
+    lines = NEW_PROGRAM.format(size=size).strip().splitlines()
+    expected = [str(sum(i + 7 for i in range(size)))]
+    print(f"{size} objects")
+    for engine in engines:
+        elapsed = best_time(lambda: run_program(lines, expected, engine=engine), repeat)
+        print(f"  {engine:<9} {elapsed * 1000:9.1f} ms  {size / elapsed:12,.0f} objects/s")
+
+
+TYPECHECK_PROGRAM = """
+(class counter
+  (field int total 0)
+  (field string tag "")
+  (method int add ((int x))
+    (begin
+      (set total (+ total x))
+      (return total)))
+  (method string label ((int x))
+    (if (> x 0) (return "pos") (return "neg"))))
+(class main
+  (method void main ()
+    (let ((counter c null) (int i 0) (int last 0) (string s ""))
+      (set c (new counter))
+      (while (< i {size})
+        (begin
+          (set last (call c add i))
+          (set s (call c label last))
+          (set i (+ i 1))))
+      (print last " " s))))
+"""
+
+
+def case_typecheck(engines, size, repeat):
+    lines = TYPECHECK_PROGRAM.format(size=size).strip().splitlines()
+    total = sum(range(size))
+    expected = [f"{total} {'pos' if total > 0 else 'neg'}"]
+    print(f"{size} iterations")
+    for engine in engines:
+        checked = best_time(lambda: run_program(lines, expected, engine=engine), repeat)
+        unchecked = best_time(lambda: run_program(lines, expected, engine=engine, type_check=True), repeat)
+        print(
+            f"  {engine:<9} runtime checks {checked * 1000:9.1f} ms   type_check=True {unchecked * 1000:9.1f} ms"
+            f"   ({checked / unchecked:.2f}x)"
+        )
+
+    def validate():
+        if Interpreter(console_output=False).validate(lines):
+            raise RuntimeError("benchmark program failed validation")
+
+    print(f"  validate  {best_time(validate, 100) * 1e6:9.1f} us per program")
+
+
+OUTPUT_PROGRAM = """
+(class main
+  (method void main ()
+    (let ((int i 0))
+      (while (< i {size})
+        (begin
+          (print "line " i " of the output")
+          (set i (+ i 1)))))))
+"""
+
+# name -> function returning (output_sink, output_log) for a run that writes into directory
+OUTPUT_CONFIGURATIONS = {
+    "file per line, full log": lambda directory: (FileSink(os.path.join(directory, "a.txt"), batch_lines=1), True),
+    "batched file, full log": lambda directory: (FileSink(os.path.join(directory, "b.txt")), True),
+    "batched file, ring log": lambda directory: (FileSink(os.path.join(directory, "c.txt")), RingLog(100)),
+    "batched file, spill log": lambda directory: (
+        FileSink(os.path.join(directory, "d.txt")), SpillLog(1000, directory)
+    ),
+    "batched file, no log": lambda directory: (FileSink(os.path.join(directory, "e.txt")), False),
+    "null sink, no log": lambda directory: (NullSink(), False),
+}
+
+
+def case_output(engines, size, repeat):
+    lines = OUTPUT_PROGRAM.format(size=size).strip().splitlines()
+    print(f"{size} lines")
+    with tempfile.TemporaryDirectory() as directory:
+        for engine in engines:
+            for name, configuration in OUTPUT_CONFIGURATIONS.items():
+
+                def run():
+                    sink, log = configuration(directory)
+                    run_program(lines, None, engine=engine, output_sink=sink, output_log=log)
+                    sink.close()
+                    if hasattr(log, "close"):
+                        log.close()
+
+                elapsed = best_time(run, repeat)
+                print(
+                    f"  {engine:<9} {name:<26} {elapsed * 1000:9.1f} ms  {size / elapsed:12,.0f} lines/s"
+                    f"  peak {peak_memory(run):8.1f} MiB"
+                )
+
+
+INPUT_PROGRAM = """
+(class main
+  (method void main ()
+    (let ((int count 0) (int i 0) (int n 0) (int total 0))
+      (inputi count)
+      (while (< i count)
+        (begin
+          (inputi n)
+          (set total (+ total n))
+          (set i (+ i 1))))
+      (print total))))
+"""
+
+
+def _read_lines(path):
+    with open(path) as source:
+        return source.read().splitlines()
+
+
+# name -> function returning the inp for a run reading path
+INPUT_CONFIGURATIONS = {
+    "list": _read_lines,
+    "FileInput": lambda path: FileInput(path),
+    "FileInput mmap": lambda path: FileInput(path, use_mmap=True),
+    "FileInput prefetch": lambda path: FileInput(path, prefetch=4),
+    "IteratorInput": lambda path: IteratorInput(open(path)),
+}
+
+
+def case_input(engines, size, repeat):
+    lines = INPUT_PROGRAM.strip().splitlines()
+    expected = [str(sum(i * 7 % 1000 for i in range(size)))]
+    print(f"{size} numbers")
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "numbers.txt")
+        with open(path, "w") as destination:
+            destination.write(f"{size}\n")
+            for i in range(size):
+                destination.write(f"{i * 7 % 1000}\n")
+        for engine in engines:
+            for name, configuration in INPUT_CONFIGURATIONS.items():
+
+                def run():
+                    inp = configuration(path)
+                    run_program(lines, expected, engine=engine, inp=inp)
+                    if hasattr(inp, "close"):
+                        inp.close()
+
+                elapsed = best_time(run, repeat)
+                print(
+                    f"  {engine:<9} {name:<20} {elapsed * 1000:9.1f} ms  {size / elapsed:12,.0f} lines/s"
+                    f"  peak {peak_memory(run):8.1f} MiB"
+                )
+
+
+OPTIMIZER_PROGRAM = """
+(class main
+  (method int seconds ((int hours) (int minutes) (string unit))
+    (let ((int i 0) (int total 0) (string label ""))
+      (while (< i {size})
+        (begin
+          (set total (+ total (+ (* hours (* 60 60)) (* minutes 60))))
+          (if (== (% (+ hours minutes) 2) 0)
+            (set label (+ unit (+ "/" "s")))
+            (set label unit))
+          (if false (print "debug " i))
+          (set i (+ i 1))))
+      (return (+ total (* 24 (* 60 60))))))
+  (method void main ()
+    (print (call me seconds 2 30 "sec"))))
+"""
+
+
+def case_optimizer(engines, size, repeat):
+    lines = OPTIMIZER_PROGRAM.format(size=size).strip().splitlines()
+    expected = [str(size * (2 * 3600 + 30 * 60) + 24 * 3600)]
+    print(f"{size} iterations")
+    for engine in engines:
+        unoptimized = best_time(lambda: run_program(lines, expected, engine=engine), repeat)
+        optimized = best_time(lambda: run_program(lines, expected, engine=engine, optimize=True), repeat)
+        print(
+            f"  {engine:<9} optimize=False {unoptimized * 1000:9.1f} ms   optimize=True {optimized * 1000:9.1f} ms"
+            f"   ({unoptimized / optimized:.2f}x)"
+        )
+    loaded = []
+    for _ in range(100):
+        interpreter = Interpreter(console_output=False)
+        interpreter.load(lines)
+        loaded.append(interpreter)
+    elapsed = best_time(lambda: Optimizer(loaded.pop()).optimize_program(), 100)
+    print(f"  optimizer {elapsed * 1e6:9.1f} us per program")
+
+
+QUICKEN_PROGRAM = """
+(class main
+  (method int collatz_steps ((int n))
+    (let ((int steps 0))
+      (while (!= n 1)
+        (begin
+          (if (== (% n 2) 0)
+            (set n (/ n 2))
+            (set n (+ (* 3 n) 1)))
+          (set steps (+ steps 1))))
+      (return steps)))
+  (method void main ()
+    (let ((int i 1) (int total 0) (string tag "") (bool odd false))
+      (while (<= i {size})
+        (begin
+          (set total (+ total (call me collatz_steps i)))
+          (set odd (! odd))
+          (if (& odd (< (% i 1000) 3))
+            (set tag (+ tag "."))
+            (set tag tag))
+          (set i (+ i 1))))
+      (print total " " tag))))
+"""
+
+
+def case_quicken(engines, size, repeat):
+    lines = QUICKEN_PROGRAM.format(size=size).strip().splitlines()
+    total = 0
+    for i in range(1, size + 1):
+        n = i
+        while n != 1:
+            n = n // 2 if n % 2 == 0 else 3 * n + 1
+            total += 1
+    expected = [f"{total} {'.' * sum(1 for i in range(1, size + 1) if i % 2 == 1 and i % 1000 < 3)}"]
+    print(f"{size} iterations")
+    for engine in engines:
+        generic = best_time(lambda: run_program(lines, expected, engine=engine, quicken=False), repeat)
+        quickened = best_time(lambda: run_program(lines, expected, engine=engine), repeat)
+        print(
+            f"  {engine:<9} quicken=False {generic * 1000:9.1f} ms   quicken=True {quickened * 1000:9.1f} ms"
+            f"   ({generic / quickened:.2f}x)"
+        )
+        stats = run_program(lines, expected, engine=engine).get_quickening_stats()
+        print(
+            f"  {'':<9} {len(stats['operators'])} operators, {stats['specializations']} specializations,"
+            f" {stats['deoptimizations']} deoptimizations, {stats['hits']} specialized evaluations"
+        )
+
+
+ROPE_PROGRAM = """
+(class main
+  (method void main ()
+    (let ((string s "") (int i 0))
+      (while (< i {size})
+        (begin
+          (set s (+ s "x"))
+          (set i (+ i 1))))
+      (if (== s "") (print "empty") (print "built")))))
+"""
+
+
+def case_rope(engines, size, repeat):
+    def build(engine, length, ropes):
+        lines = ROPE_PROGRAM.format(size=length).strip().splitlines()
+        leaf_size = Rope.LEAF_SIZE
+        if not ropes:
+            Rope.LEAF_SIZE = float("inf")  # every concatenation is then a plain str one
+        try:
+            return best_time(lambda: run_program(lines, ["built"], engine=engine), repeat)
+        finally:
+            Rope.LEAF_SIZE = leaf_size
+
+    print("ms in total (us per character)")
+    for engine in engines:
+        for step in reversed(range(4)):
+            length = size >> step
+            roped = build(engine, length, True)
+            plain = build(engine, length, False)
+            print(
+                f"  {engine:<9} {length:>8} chars   ropes {roped * 1000:9.1f} ({roped / length * 1e6:5.2f})"
+                f"   plain strings {plain * 1000:9.1f} ({plain / length * 1e6:5.2f})"
+            )
+
+
+PROGRAM_PROGRAM = """
+(tclass node (field_type)
+  (field node@field_type next null)
+  (field field_type value)
+  (method void set_val ((field_type v)) (set value v))
+  (method field_type get_val () (return value))
+  (method void set_next ((node@field_type n)) (set next n))
+  (method node@field_type get_next () (return next)))
+(class shape
+  (field string name "shape")
+  (method int area () (return 0))
+  (method string describe () (return (+ name (+ " of area " "?")))))
+(class square inherits shape
+  (field int side 0)
+  (method void init ((int s)) (set side s))
+  (method int area () (return (* side side))))
+(class main
+  (method int sum_to ((int n))
+    (let ((int total 0) (int i 1))
+      (while (<= i n) (begin (set total (+ total i)) (set i (+ i 1))))
+      (return total)))
+  (method void main ()
+    (let ((int n 0) (string label "") (square sq null) (node@int totals null))
+      (inputi n)
+      (inputs label)
+      (set sq (new square))
+      (call sq init n)
+      (set totals (new node@int))
+      (call totals set_val (call me sum_to n))
+      (if (> (call sq area) 10)
+        (print label ": big " (call sq area) " " (call totals get_val))
+        (print label ": small " (call sq area) " " (call totals get_val))))))
+"""
+
+
+def case_program(engines, size, repeat):
+    lines = PROGRAM_PROGRAM.strip().splitlines()
+    inputs = [[str(i % 7 + 1), f"case{i}"] for i in range(size)]
+
+    def expected(inp):
+        n = int(inp[0])
+        return [f"{inp[1]}: {'big' if n * n > 10 else 'small'} {n * n} {n * (n + 1) // 2}"]
+
+    def run_all(engine, type_check, compile_once):
+        program = Program(lines, type_check=type_check) if compile_once else lines
+        for inp in inputs:
+            run_program(program, expected(inp), engine=engine, inp=inp, type_check=type_check)
+
+    print(f"{size} input sets; ms per run")
+    for engine in engines:
+        for type_check in (False, True):
+            source = best_time(lambda: run_all(engine, type_check, False), repeat)
+            compiled = best_time(lambda: run_all(engine, type_check, True), repeat)
+            print(
+                f"  {engine:<9} {'type_check' if type_check else '':<10}"
+                f" from source {source / size * 1000:7.3f}   Program {compiled / size * 1000:7.3f}"
+                f"   ({source / compiled:.2f}x)"
+            )
+
+
+DAEMON_PROGRAM = """
+(class main
+  (method int fib ((int n))
+    (if (< n 2) (return n) (return (+ (call me fib (- n 1)) (call me fib (- n 2))))))
+  (method void main ()
+    (let ((int n 0))
+      (inputi n)
+      (print (call me fib n)))))
+"""
+
+DAEMON_DIRECT = """
+import sys
+sys.path.insert(0, sys.argv[1])
+from interpreterv3 import Interpreter
+with open(sys.argv[2]) as source:
+    Interpreter(inp=sys.stdin.read().splitlines()).run(source.read().splitlines())
+"""
+
+
+def case_daemon(engines, size, repeat):
+    def time_runs(run_once):
+        def run():
+            for _ in range(size):
+                output = run_once()
+                if output != "55":
+                    raise RuntimeError(f"printed {output!r}")
+
+        return best_time(run, repeat) / size
+
+    lines = DAEMON_PROGRAM.strip().splitlines()
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "program.br")
+        with open(path, "w") as destination:
+            destination.write(DAEMON_PROGRAM.strip() + "\n")
+        socket_path = os.path.join(directory, "daemon.sock")
+        daemon = Daemon(socket_path, workers=2)
+        server = threading.Thread(target=daemon.serve_forever)
+        server.start()
+        while not os.path.exists(socket_path):
+            time.sleep(0.01)
+        try:
+
+            def direct():
+                command = [sys.executable, "-c", DAEMON_DIRECT, ROOT, path]
+                return subprocess.run(command, input="10\n", capture_output=True, text=True).stdout.strip()
+
+            def client_command():
+                command = [sys.executable, os.path.join(ROOT, "daemon.py"), "run", "--socket", socket_path, path]
+                return subprocess.run(command, input="10\n", capture_output=True, text=True).stdout.strip()
+
+            with Client(socket_path) as client:
+                connected = time_runs(lambda: "\n".join(client.run(lines, ["10"])["output"]))
+            print(f"{size} runs of fib(10); ms per run")
+            print(f"  new interpreter process   {time_runs(direct) * 1000:8.2f}")
+            print(f"  daemon.py run process     {time_runs(client_command) * 1000:8.2f}")
+            print(f"  connected Client          {connected * 1000:8.2f}")
+        finally:
+            daemon.shutdown()
+            server.join()
+
+
+LAZY_LIBRARY_CLASS = """
+(class {name}{inherits}
+  (field int count 0)
+  (field string label "{name}")
+  (field bool active true)
+  (method void add ((int amount)) (set count (+ count amount)))
+  (method int get () (return count))
+  (method string describe ((string prefix)) (return (+ prefix label)))
+  (method bool toggle () (begin (set active (! active)) (return active))))
+"""
+
+LAZY_MAIN_CLASS = """
+(class main
+  (method void main ()
+    (let ((lib0 first null) (lib1 second null) (int i 0))
+      (set first (new lib0))
+      (set second (new lib1))
+      (while (< i 10) (begin (call first add i) (call second add 1) (set i (+ i 1))))
+      (print (call first get) " " (call second get) " " (call second describe "from ")))))
+"""
+
+
+def case_lazy(engines, size, repeat):
+    source = ""
+    for i in range(size):
+        inherits = f" inherits lib{i - 1}" if i % 2 else ""  # every odd class extends the one before it
+        source += LAZY_LIBRARY_CLASS.format(name=f"lib{i}", inherits=inherits)
+    lines = (source + LAZY_MAIN_CLASS).strip().splitlines()
+    expected = ["45 10 from lib1"]
+    print(f"{size} library classes, {len(lines)} lines")
+    for engine in engines:
+        results = {}
+        for lazy in (False, True):
+            elapsed = best_time(lambda: run_program(lines, expected, engine=engine, lazy_classes=lazy), repeat)
+            built = len(run_program(lines, expected, engine=engine, lazy_classes=lazy).class_index)
+            results[lazy] = (elapsed, built)
+        (eager, eager_built), (lazy, lazy_built) = results[False], results[True]
+        print(
+            f"  {engine:<9} eager {eager * 1000:8.2f} ms ({eager_built} classes built)"
+            f"   lazy {lazy * 1000:8.2f} ms ({lazy_built} built)   ({eager / lazy:.2f}x)"
+        )
+
+
+# name -> (case, default size, default engines)
+CASES = {
+    "parse": (case_parse, 2000, []),
+    "new": (case_new, 20000, ALL_ENGINES),
+    "typecheck": (case_typecheck, 20000, ALL_ENGINES),
+    "output": (case_output, 200000, ["bytecode"]),
+    "input": (case_input, 200000, ["bytecode"]),
+    "optimizer": (case_optimizer, 20000, ALL_ENGINES),
+    "quicken": (case_quicken, 2000, ["tree"]),
+    "rope": (case_rope, 1 << 20, ["bytecode"]),
+    "program": (case_program, 200, ALL_ENGINES),
+    "daemon": (case_daemon, 20, []),
+    "lazy": (case_lazy, 300, ALL_ENGINES),
+}
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    arg_parser.add_argument(
+        "--engine", action="append", choices=ALL_ENGINES, help="engines to run (default: all, or the case's)"
+    )
+    arg_parser.add_argument("--only", action="append", help="benchmarks to run (default: all)")
+    arg_parser.add_argument("--warmup", type=int, default=1, help="untimed runs before timing")
+    arg_parser.add_argument("--repeat", type=int, default=5, help="timed runs per benchmark and engine")
+    arg_parser.add_argument("--save", metavar="FILE", help="save the results as a JSON baseline")
+    arg_parser.add_argument("--compare", metavar="FILE", help="flag regressions against a saved baseline")
+    arg_parser.add_argument("--threshold", type=float, default=10.0, help="percent slowdown that is a regression")
+    arg_parser.add_argument("--case", action="append", choices=list(CASES), help="run comparison cases instead")
+    arg_parser.add_argument("--size", type=int, help="workload of the cases (default: each case's own)")
+    args = arg_parser.parse_args()
+
+    if args.case:
+        for name in args.case:
+            case, size, engines = CASES[name]
+            print(f"{name}: best of {args.repeat}")
+            case(args.engine or engines, args.size or size, args.repeat)
+        return 0
+
+    engines = args.engine or list(Interpreter.ENGINES)
+    benchmarks = load_benchmarks(args.only)
+    if not benchmarks:
+        arg_parser.error("no benchmarks selected")
+    print(f"{len(benchmarks)} benchmarks, {args.warmup} warmup + {args.repeat} timed runs each; median (min)")
+    results = {}
+    for engine in engines:
+        results[engine] = {}
+        for name, (program, expected) in benchmarks.items():
+            results[engine][name] = time_benchmark(name, program, expected, engine, args.warmup, args.repeat)
+    print_report(results, engines, list(benchmarks))
+
+    if args.save:
+        save_baseline(args.save, results, args.warmup, args.repeat)
+    if args.compare and compare_baseline(args.compare, results, args.threshold):
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
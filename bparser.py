@@ -5,6 +5,8 @@ Provided module for parsing Brewin programs. When grading your project,
 we'll use our own copy; don't submit (or change) your own version!
 """
 
+import re
+
 
 class StringWithLineNumber(str):
     """
@@ -24,6 +26,9 @@ class StringWithLineNumber(str):
     def __deepcopy__(self, _memo):
         return StringWithLineNumber(self, self.line_num)
 
+    def __reduce__(self):
+        return StringWithLineNumber, (str(self), self.line_num)
+
 
 class BParser:
     """
@@ -37,6 +42,11 @@ class BParser:
     WHITESPACE_CHARS = " \t\r\n"
     DELIMETER_CHARS = WHITESPACE_CHARS + OPEN_PAREN_CHAR + CLOSE_PAREN_CHAR
 
+    # one match per token: a paren, a quoted string (possibly unterminated), a comment running to the end of
+    # the line, or a run of ordinary characters. Only whitespace is left unmatched, so findall skips it.
+    TOKEN_REGEX = re.compile(r'[()]|"[^"]*"?|#.*|[^ \t\r\n"()#]+', re.DOTALL)
+    SPECIAL_TOKEN_START_CHARS = OPEN_PAREN_CHAR + CLOSE_PAREN_CHAR + QUOTE_CHAR + COMMENT_CHAR
+
     @staticmethod
     def parse(lines):
         """
@@ -56,6 +66,48 @@ class BParser:
                 [(1, 'this'), (1, 'is'), (1, 'too')]
             ]
         )
+        Each line is split with TOKEN_REGEX; the result is identical to parse_by_char's.
+        """
+        output = []
+        output_stack = [output]
+        current = output
+        findall = BParser.TOKEN_REGEX.findall
+        special = BParser.SPECIAL_TOKEN_START_CHARS
+        new_token = str.__new__  # skips StringWithLineNumber.__new__'s extra call; line_num is set below
+        for line_no, line in enumerate(lines):
+            for token in findall(line):
+                first_char = token[0]
+                if first_char not in special:
+                    token = new_token(StringWithLineNumber, token)
+                    token.line_num = line_no
+                    current.append(token)
+                elif first_char == BParser.OPEN_PAREN_CHAR:
+                    nested = []
+                    current.append(nested)
+                    output_stack.append(nested)
+                    current = nested
+                elif first_char == BParser.CLOSE_PAREN_CHAR:
+                    if len(output_stack) < 2:
+                        return False, "Extra closing parenthesis"
+                    output_stack.pop()
+                    current = output_stack[-1]
+                elif first_char == BParser.QUOTE_CHAR:
+                    if len(token) < 2 or token[-1] != BParser.QUOTE_CHAR:
+                        return False, "Unclosed string"
+                    token = new_token(StringWithLineNumber, token)
+                    token.line_num = line_no
+                    current.append(token)
+                else:  # comment; ignore the rest of the line
+                    break
+        if len(output_stack) > 1:
+            return False, "Unclosed parenthesis"
+        return True, output
+
+    @staticmethod
+    def parse_by_char(lines):
+        """
+        The original character-at-a-time parser; same result as parse. Kept as the reference
+        implementation for the parser benchmark.
         """
         cur_token = ""
         in_quote = False
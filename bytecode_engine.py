@@ -0,0 +1,1046 @@
+"""
+Bytecode compiler and stack-based virtual machine, selected with Interpreter(engine="bytecode").
+
+Each MethodDef's code is lowered once, on its first call, into a CodeObject: a flat list of
+(opcode, argument) integer pairs plus a constant pool holding literal Values, names, operator info and
+line numbers. BytecodeEngine runs a CodeObject in a single dispatch loop with an operand stack, so
+begin/let/if/while/set/return/try/throw within a method never recurse through Python and never build
+(status, value) tuples. if/while compile to jumps; try registers its handler on a block stack that is
+unwound by throw. Environment handling (EnvironmentManager blocks, the exception variable) mirrors the
+tree walker operation for operation, so output and errors are identical.
+
+Interpreter(engine="stackless") runs the same bytecode without nesting Python calls for Brewin calls: a call
+pushes a heap-allocated Frame on an explicit call stack, so recursion is limited by Interpreter(max_call_depth=N)
+instead of Python's recursion limit, and a call whose result is returned right away, as in
+(return (call me f ...)) outside any try, replaces the calling frame instead, so tail recursion runs in constant
+space. Statements and expressions left to the tree walker, and every call while a profiler or tracer is
+attached, still go through ObjectDef.call_method and nest Python calls (within the same depth limit).
+
+Run this module on a Brewin source file to print the bytecode generated for every method:
+    python bytecode_engine.py program.br
+"""
+
+import operator
+import sys
+
+from intbase import InterpreterBase, ErrorType
+from objectv2 import ObjectDef
+from classv2 import VariableDef
+from closure_engine import PRIMITIVE_DEFAULTS, collect_local_names
+from type_valuev2 import Type, Value, concatenate, create_value, create_default_value, flatten
+
+STATUS_PROCEED = ObjectDef.STATUS_PROCEED
+STATUS_RETURN = ObjectDef.STATUS_RETURN
+STATUS_ERROR = ObjectDef.STATUS_ERROR
+STATUS_CALL = 3  # run() asks the stackless engine to make a call; the value is (object, method_def, env)
+
+INT_TYPE_CONST = ObjectDef.INT_TYPE_CONST
+STRING_TYPE_CONST = ObjectDef.STRING_TYPE_CONST
+BOOL_TYPE_CONST = ObjectDef.BOOL_TYPE_CONST
+
+# opcodes; the argument of each instruction is an index into the constant pool unless noted otherwise
+LOAD_CONST = 0  # push constants[arg]
+LOAD_NAME = 1  # push local/param, falling back to field, literal, me (same order as the walker)
+LOAD_FIELD = 2  # push a field of the current object, by slot
+LOAD_ME = 3  # push the current object
+NAME_ERROR = 4  # report an unknown identifier
+BINARY_OP = 5
+UNARY_NOT = 6  # arg: the line number, for the error on a non-bool operand
+STORE = 7  # pop a value into a local/param or field
+UPDATE_NAME = 8  # superinstruction for (set x (op x constant))
+POP_JUMP_IF_FALSE = 9  # arg is a jump target
+JUMP = 10  # arg is a jump target
+CHECK_BOOL = 11  # report a non-boolean if/while condition
+CALL = 12
+CALL_ME = 13
+CALL_SUPER = 14
+CHECK_NULL = 15  # fault if the call target on top of the stack is null
+CHECK_SUPER = 16  # type error: super used in a class without a superclass
+NEW = 17
+POP = 18
+PRINT = 19  # arg is the number of values to pop and print
+INPUT_STRING = 20
+INPUT_INT = 21
+ENTER_LET = 22
+DECLARE = 23
+EXIT_LET = 24
+SETUP_TRY = 25  # arg is the handler's jump target
+POP_TRY = 26
+BIND_EXCEPTION = 27
+END_CATCH = 28
+THROW = 29
+RETURN_VALUE = 30
+RETURN_NONE = 31
+TRACE = 32
+EXEC_TREE = 33  # run a statement the compiler doesn't specialize with the tree walker
+EVAL_TREE = 34  # evaluate an expression the compiler doesn't specialize with the tree walker
+END = 35  # end of the method body
+JUMP_BACK = 36  # the jump back to the start of a while loop; arg is a jump target
+
+OPCODE_NAMES = [
+    "LOAD_CONST", "LOAD_NAME", "LOAD_FIELD", "LOAD_ME", "NAME_ERROR", "BINARY_OP", "UNARY_NOT",
+    "STORE", "UPDATE_NAME", "POP_JUMP_IF_FALSE", "JUMP", "CHECK_BOOL", "CALL", "CALL_ME",
+    "CALL_SUPER", "CHECK_NULL", "CHECK_SUPER", "NEW", "POP", "PRINT", "INPUT_STRING", "INPUT_INT",
+    "ENTER_LET", "DECLARE", "EXIT_LET", "SETUP_TRY", "POP_TRY", "BIND_EXCEPTION", "END_CATCH",
+    "THROW", "RETURN_VALUE", "RETURN_NONE", "TRACE", "EXEC_TREE", "EVAL_TREE", "END", "JUMP_BACK",
+]
+JUMP_OPCODES = {POP_JUMP_IF_FALSE, JUMP, SETUP_TRY, JUMP_BACK}
+COUNT_OPCODES = {PRINT}
+NO_ARG_OPCODES = {
+    LOAD_ME, POP, INPUT_STRING, INPUT_INT, ENTER_LET, EXIT_LET, POP_TRY, END_CATCH, RETURN_NONE, END,
+}
+
+# markers on the VM's block stack; try blocks push their handler offset, which is never negative
+LET_BLOCK = -1
+CATCH_BLOCK = -2
+
+# (python operator, result type) for each Brewin operator, by operand type; mirrors the lambdas in
+# ObjectDef.__create_map_of_operations_to_lambdas
+BINARY_OPERATIONS = {
+    InterpreterBase.INT_DEF: {
+        "+": (operator.add, INT_TYPE_CONST),
+        "-": (operator.sub, INT_TYPE_CONST),
+        "*": (operator.mul, INT_TYPE_CONST),
+        "/": (operator.floordiv, INT_TYPE_CONST),
+        "%": (operator.mod, INT_TYPE_CONST),
+        "==": (operator.eq, BOOL_TYPE_CONST),
+        "!=": (operator.ne, BOOL_TYPE_CONST),
+        ">": (operator.gt, BOOL_TYPE_CONST),
+        "<": (operator.lt, BOOL_TYPE_CONST),
+        ">=": (operator.ge, BOOL_TYPE_CONST),
+        "<=": (operator.le, BOOL_TYPE_CONST),
+    },
+    InterpreterBase.STRING_DEF: {
+        "+": (concatenate, STRING_TYPE_CONST),
+        "==": (operator.eq, BOOL_TYPE_CONST),
+        "!=": (operator.ne, BOOL_TYPE_CONST),
+        ">": (operator.gt, BOOL_TYPE_CONST),
+        "<": (operator.lt, BOOL_TYPE_CONST),
+        ">=": (operator.ge, BOOL_TYPE_CONST),
+        "<=": (operator.le, BOOL_TYPE_CONST),
+    },
+    InterpreterBase.BOOL_DEF: {
+        "&": (lambda a, b: a and b, BOOL_TYPE_CONST),
+        "|": (lambda a, b: a or b, BOOL_TYPE_CONST),
+        "==": (operator.eq, BOOL_TYPE_CONST),
+        "!=": (operator.ne, BOOL_TYPE_CONST),
+    },
+    InterpreterBase.CLASS_DEF: {
+        "==": (operator.eq, BOOL_TYPE_CONST),
+        "!=": (operator.ne, BOOL_TYPE_CONST),
+    },
+}
+BINARY_OPERATORS = ["+", "-", "*", "/", "%", "==", "!=", "<", "<=", ">", ">=", "&", "|"]
+UNARY_OPERATORS = ["!"]
+
+
+# the compiled form of one method
+class CodeObject:
+    def __init__(self, name, line_num, code, lines, constants):
+        self.name = name
+        self.line_num = line_num
+        self.code = code  # flat list: opcode, argument, opcode, argument, ...
+        self.lines = lines  # source line of each instruction, indexed by instruction offset // 2
+        self.constants = constants
+
+
+# the state of one method call: where the method is in its bytecode, and its operand and block stacks
+class Frame:
+    __slots__ = (
+        "code_object", "obj", "env", "return_type", "method_def", "pc", "stack", "blocks", "exception", "returns"
+    )
+
+    def __init__(self, code_object, obj, env, method_def):
+        self.code_object = code_object
+        self.obj = obj
+        self.env = env
+        self.return_type = method_def.return_type
+        self.method_def = method_def
+        self.pc = 0
+        self.stack = []
+        self.blocks = []
+        self.exception = None  # a Brewin exception to unwind when the frame resumes
+        # (return type, line number, checked) of each return the frame's result still has to go through, innermost
+        # first: the returns of the frames it replaced with a tail call
+        self.returns = ()
+
+
+class BytecodeEngine:
+    heap_frames = False  # run() hands calls back to its caller instead of making them (see StacklessEngine)
+
+    def __init__(self, interpreter):
+        self.interpreter = interpreter
+        self.compiled = {}  # maps MethodDef -> CodeObject
+
+    def execute_method(self, obj, env, method_def):
+        code_object = self.compiled.get(method_def)
+        if code_object is None:
+            code_object = self.compile_method(method_def.class_def, method_def)
+        return self.run(Frame(code_object, obj, env, method_def))
+
+    def compile_method(self, class_def, method_def):
+        code_object = self.compiled.get(method_def)
+        if code_object is None:
+            code_object = BytecodeCompiler(self.interpreter, class_def, method_def).compile()
+            self.compiled[method_def] = code_object
+        return code_object
+
+    # the dispatch loop; returns (status, value) just like ObjectDef.__execute_statement does for a method body.
+    # With heap_frames it also returns (STATUS_CALL, (object, method_def, env)) for each call, leaving the frame
+    # ready to resume with the call's result pushed on its stack or with its exception set
+    def run(self, frame):
+        code_object = frame.code_object
+        code = code_object.code
+        constants = code_object.constants
+        interpreter = self.interpreter
+        obj = frame.obj
+        env = frame.env
+        return_type = frame.return_type
+        slots = obj.slots
+        stack = frame.stack
+        push = stack.append
+        pop = stack.pop
+        blocks = frame.blocks
+        unwind = BytecodeEngine.__unwind
+        heap_frames = self.heap_frames
+        governor = interpreter.governor
+        exception = frame.exception
+        pc = frame.pc
+        if exception is not None:  # the call the frame made threw
+            frame.exception = None
+            pc = unwind(blocks, env, stack)
+            if pc < 0:
+                return STATUS_ERROR, exception
+        while True:
+            op = code[pc]
+            arg = code[pc + 1]
+            pc += 2
+
+            if op == LOAD_NAME:
+                load = constants[arg]
+                var_def = env.get(load[0])
+                if var_def is None:
+                    push(self.__load_name_fallback(load, obj))
+                    continue
+                value = var_def.value
+                push(Value(var_def.type, None) if value.is_null() else value)
+            elif op == LOAD_CONST:
+                push(constants[arg])
+            elif op == BINARY_OP:
+                operand2 = pop()
+                push(self.__binary_operation(constants[arg], pop(), operand2))
+            elif op == POP_JUMP_IF_FALSE:
+                if not pop().value():
+                    pc = arg
+            elif op == CHECK_BOOL:
+                if stack[-1].type() is not BOOL_TYPE_CONST:
+                    kind, condition_expr, line_num = constants[arg]
+                    interpreter.error(
+                        ErrorType.TYPE_ERROR,
+                        f"non-boolean {kind} condition " + ' '.join(x for x in condition_expr),
+                        line_num,
+                    )
+            elif op == JUMP_BACK:
+                pc = arg
+                if governor is not None:
+                    governor.step()
+            elif op == JUMP:
+                pc = arg
+            elif op == UPDATE_NAME:
+                load, operation, constant, store = constants[arg]
+                var_def = env.get(load[0])
+                if var_def is None:
+                    value = self.__load_name_fallback(load, obj)
+                else:
+                    value = var_def.value
+                    if value.is_null():
+                        value = Value(var_def.type, None)
+                if (
+                    value.type() is INT_TYPE_CONST
+                    and constant.type() is INT_TYPE_CONST
+                    and operation[1] is not None
+                ):
+                    int_op = operation[1]
+                    result = Value(int_op[1], int_op[0](value.value(), constant.value()))
+                else:
+                    result = self.__binary_operation(operation, value, constant)
+                self.__store(store, result, env, obj)
+            elif op == STORE:
+                self.__store(constants[arg], pop(), env, obj)
+            elif op == LOAD_FIELD:
+                field_index = constants[arg][1]
+                value = slots[field_index]
+                push(obj._get_field(field_index) if value.is_null() else value)
+            elif op == CALL_ME:
+                method_name, argc, line_num, call_site, class_def = constants[arg]
+                if argc:
+                    actual_args = stack[-argc:]
+                    del stack[-argc:]
+                else:
+                    actual_args = []
+                if heap_frames:
+                    frame.pc = pc
+                    return STATUS_CALL, (obj, *obj._prepare_call(
+                        method_name, actual_args, False, line_num, call_site, class_def
+                    ))
+                status, value = obj.call_method(method_name, actual_args, False, line_num, call_site, class_def)
+                if status == STATUS_ERROR:
+                    exception = value
+                    pc = unwind(blocks, env, stack)
+                    if pc < 0:
+                        return status, exception
+                    continue
+                push(value)
+            elif op == CALL:
+                method_name, argc, line_num, call_site, _ = constants[arg]
+                if argc:
+                    actual_args = stack[-argc:]
+                    del stack[-argc:]
+                else:
+                    actual_args = []
+                target = pop().value()
+                if heap_frames:
+                    frame.pc = pc
+                    return STATUS_CALL, (target, *target._prepare_call(
+                        method_name, actual_args, False, line_num, call_site, None
+                    ))
+                status, value = target.call_method(method_name, actual_args, False, line_num, call_site)
+                if status == STATUS_ERROR:
+                    exception = value
+                    pc = unwind(blocks, env, stack)
+                    if pc < 0:
+                        return status, exception
+                    continue
+                push(value)
+            elif op == CHECK_NULL:
+                if stack[-1].is_null():
+                    interpreter.error(ErrorType.FAULT_ERROR, "null dereference", constants[arg])
+            elif op == POP:
+                pop()
+            elif op == RETURN_VALUE:
+                result = pop()
+                line_num, checked = constants[arg]
+                if result.is_typeless_null():
+                    if checked:
+                        self.__check_return_type(return_type, result, line_num)
+                    result = Value(return_type, None)  # propagate return type to null
+                if checked:
+                    self.__check_return_type(return_type, result, line_num)
+                return STATUS_RETURN, result
+            elif op == RETURN_NONE:
+                return STATUS_RETURN, None
+            elif op == PRINT:
+                output = ""
+                if arg:
+                    for term in stack[-arg:]:
+                        val = term.value()
+                        if term.type() is BOOL_TYPE_CONST:
+                            val = "true" if val == True else "false"
+                        output += str(val)
+                    del stack[-arg:]
+                interpreter.output(output)
+            elif op == LOAD_ME:
+                push(obj.get_me_as_value())
+            elif op == NEW:
+                class_name, line_num = constants[arg]
+                new_obj = interpreter.instantiate(class_name, line_num)
+                push(Value(Type(class_name), new_obj))
+            elif op == UNARY_NOT:
+                operand = pop()
+                if operand.type() is not BOOL_TYPE_CONST:
+                    interpreter.error(
+                        ErrorType.TYPE_ERROR,
+                        "invalid unary operator applied to " + operand.type().type_name,
+                        constants[arg],
+                    )
+                push(Value(BOOL_TYPE_CONST, not operand.value()))
+            elif op == ENTER_LET:
+                env.block_nest()
+                blocks.append(LET_BLOCK)
+            elif op == DECLARE:
+                self.__declare(constants[arg], obj, env)
+            elif op == EXIT_LET:
+                blocks.pop()
+                env.block_unnest()
+            elif op == TRACE:
+                interpreter.trace_statement(obj, constants[arg])
+            elif op == CHECK_SUPER:
+                class_name, line_num = constants[arg]
+                interpreter.error(
+                    ErrorType.TYPE_ERROR,
+                    "invalid call to super object by class " + class_name,
+                    line_num,
+                )
+            elif op == CALL_SUPER:
+                method_name, argc, line_num, call_site, superclass_def = constants[arg]
+                if argc:
+                    actual_args = stack[-argc:]
+                    del stack[-argc:]
+                else:
+                    actual_args = []
+                if heap_frames:
+                    frame.pc = pc
+                    return STATUS_CALL, (obj, *obj._prepare_call(
+                        method_name, actual_args, True, line_num, call_site, superclass_def
+                    ))
+                status, value = obj.call_method(method_name, actual_args, True, line_num, call_site, superclass_def)
+                if status == STATUS_ERROR:
+                    exception = value
+                    pc = unwind(blocks, env, stack)
+                    if pc < 0:
+                        return status, exception
+                    continue
+                push(value)
+            elif op == NAME_ERROR:
+                name, line_num = constants[arg]
+                interpreter.error(ErrorType.NAME_ERROR, "invalid field or parameter " + name, line_num)
+            elif op == INPUT_STRING:
+                push(Value(STRING_TYPE_CONST, interpreter.get_input()))
+            elif op == INPUT_INT:
+                push(Value(INT_TYPE_CONST, int(interpreter.get_input())))
+            elif op == SETUP_TRY:
+                blocks.append(arg)
+            elif op == POP_TRY:
+                blocks.pop()
+            elif op == BIND_EXCEPTION:
+                # bound exactly the way ObjectDef.__execute_try_helper binds it
+                exception_def = ["string", "exception", '"' + exception.value() + '"']
+                obj._add_locals_to_env(env, [exception_def], constants[arg])
+                blocks.append(CATCH_BLOCK)
+            elif op == END_CATCH:
+                blocks.pop()
+                env.block_unnest()
+            elif op == THROW:
+                value = pop()
+                obj.called_throw = True
+                if value.type() is not STRING_TYPE_CONST:
+                    interpreter.error(ErrorType.TYPE_ERROR, "exception is not a string", constants[arg])
+                exception = Value(STRING_TYPE_CONST, flatten(value.value()))
+                pc = unwind(blocks, env, stack)
+                if pc < 0:
+                    return STATUS_ERROR, exception
+            elif op == EXEC_TREE:
+                status, value = obj._execute_statement(env, return_type, constants[arg])
+                if status == STATUS_RETURN:
+                    return status, value
+                if status == STATUS_ERROR:
+                    exception = value
+                    pc = unwind(blocks, env, stack)
+                    if pc < 0:
+                        return status, exception
+                    continue
+            elif op == EVAL_TREE:
+                expr, line_num = constants[arg]
+                status, value = obj._evaluate_expression(env, expr, line_num)
+                if status == STATUS_ERROR:
+                    exception = value
+                    pc = unwind(blocks, env, stack)
+                    if pc < 0:
+                        return status, exception
+                    continue
+                push(value)
+            elif op == END:
+                return STATUS_PROCEED, None
+            else:
+                raise ValueError(f"bad opcode {op} at offset {pc - 2}")
+
+    # pops the block stack up to the innermost try, leaving each let/catch block the way the walker does,
+    # and returns the try's handler offset, or -1 if the exception escapes the method
+    @staticmethod
+    def __unwind(blocks, env, stack):
+        while blocks:
+            block = blocks.pop()
+            if block >= 0:
+                del stack[:]
+                return block
+            env.block_unnest()
+            if block == CATCH_BLOCK:
+                env.block_unnest()
+        return -1
+
+    # an identifier that isn't in the environment: field, then literal, then me
+    def __load_name_fallback(self, load, obj):
+        name, field_index, constant, line_num = load
+        if field_index is not None:
+            return obj._get_field(field_index)
+        if constant is not None:
+            return constant
+        if name == InterpreterBase.ME_DEF:
+            return obj.get_me_as_value()
+        self.interpreter.error(
+            ErrorType.NAME_ERROR, "invalid field or parameter " + name, line_num
+        )
+
+    def __binary_operation(self, operation, operand1, operand2):
+        operator_name, int_op, string_op, bool_op, line_num = operation
+        type1 = operand1.type()
+        if type1 is operand2.type():
+            if type1 is INT_TYPE_CONST:
+                if int_op is None:
+                    self.interpreter.error(
+                        ErrorType.TYPE_ERROR, "invalid operator applied to ints", line_num
+                    )
+                return Value(int_op[1], int_op[0](operand1.value(), operand2.value()))
+            if type1 is STRING_TYPE_CONST:
+                if string_op is None:
+                    self.interpreter.error(
+                        ErrorType.TYPE_ERROR, "invalid operator applied to strings", line_num
+                    )
+                return Value(string_op[1], string_op[0](operand1.value(), operand2.value()))
+            if type1 is BOOL_TYPE_CONST:
+                if bool_op is None:
+                    self.interpreter.error(
+                        ErrorType.TYPE_ERROR, "invalid operator applied to bool", line_num
+                    )
+                return Value(bool_op[1], bool_op[0](operand1.value(), operand2.value()))
+        # handle object reference comparisons last
+        if self.interpreter.check_type_compatibility(type1, operand2.type(), False):
+            class_op = BINARY_OPERATIONS[InterpreterBase.CLASS_DEF][operator_name]
+            return Value(class_op[1], class_op[0](operand1.value(), operand2.value()))
+        self.interpreter.error(
+            ErrorType.TYPE_ERROR,
+            f"operator {operator_name} applied to two incompatible types",
+            line_num,
+        )
+
+    # params shadow fields, locals shadow params
+    def __store(self, target, value, env, obj):
+        name, field_index, may_be_local, line_num, checked = target
+        var_def = env.get(name) if may_be_local else None
+        if var_def is None:
+            if field_index is None:
+                self.interpreter.error(
+                    ErrorType.NAME_ERROR, "unknown field/variable " + name, line_num
+                )
+            var_type = obj.class_def.slot_types[field_index]
+        else:
+            var_type = var_def.type
+        if checked and not self.interpreter.check_type_compatibility(var_type, value.type(), True):
+            self.interpreter.error(
+                ErrorType.TYPE_ERROR,
+                f"type mismatch {var_type.type_name} and {value.type().type_name}",
+                line_num,
+            )
+        if var_def is None:
+            obj.slots[field_index] = value
+        else:
+            var_def.set_value(value)
+
+    # what RETURN_VALUE does with the value of the (return expression)
+    def _return_value(self, result, return_type, line_num, checked):
+        if result.is_typeless_null():
+            if checked:
+                self.__check_return_type(return_type, result, line_num)
+            result = Value(return_type, None)  # propagate return type to null
+        if checked:
+            self.__check_return_type(return_type, result, line_num)
+        return result
+
+    def __check_return_type(self, return_type, result, line_num):
+        if not self.interpreter.check_type_compatibility(return_type, result.type(), True):
+            self.interpreter.error(
+                ErrorType.TYPE_ERROR,
+                f"type mismatch {return_type.type_name} and {result.type().type_name}",
+                line_num,
+            )
+
+    # declaration is built by BytecodeCompiler.__compile_local
+    def __declare(self, declaration, obj, env):
+        var_def, line_num, fast = declaration
+        if fast is None:
+            obj._add_locals_to_env(env, [var_def], line_num)
+            return
+        var_name, var_type, default_value, default_token = fast
+        if len(var_def) == 2:  # the walker fills in the default on first use; keep traces identical
+            var_def.append(default_token)
+        if not env.create_new_symbol(var_name):
+            self.interpreter.error(
+                ErrorType.NAME_ERROR, "duplicate local variable name " + var_name, line_num
+            )
+        env.set(var_name, VariableDef(var_type, var_name, default_value))
+
+
+# runs the bytecode with an explicit stack of heap-allocated Frames instead of a Python call per Brewin call
+class StacklessEngine(BytecodeEngine):
+    def __init__(self, interpreter):
+        super().__init__(interpreter)
+        # calls are handed to the profiler and tracer by ObjectDef.call_method, so they keep using it
+        self.heap_frames = interpreter.profiler is None and interpreter.tracer is None
+        self.max_depth = interpreter.max_call_depth
+        self.depth = 0  # frames on the call stacks of the runs in progress, up to the frame that is running
+
+    def execute_method(self, obj, env, method_def):
+        base = self.depth
+        if base >= self.max_depth:
+            self.__overflow()
+        try:
+            return self.__run_frames(Frame(self.compile_method(method_def.class_def, method_def), obj, env, method_def))
+        finally:
+            self.depth = base
+
+    # runs frame and every call it makes, returning the frame's (status, value)
+    def __run_frames(self, frame):
+        callers = []  # the frames waiting for a call to return, outermost first
+        base = self.depth + 1
+        max_depth = self.max_depth
+        governor = self.interpreter.governor
+        while True:
+            self.depth = base + len(callers)
+            if governor is not None:  # for calls the frame makes through ObjectDef.call_method
+                governor.depth = self.depth
+            status, value = self.run(frame)
+            if status == STATUS_CALL:
+                obj, method_def, env = value
+                callee = Frame(self.compile_method(method_def.class_def, method_def), obj, env, method_def)
+                code = frame.code_object.code
+                if code[frame.pc] == RETURN_VALUE and all(block < 0 for block in frame.blocks):
+                    # a tail call outside any try: the callee's result goes through frame's return and then
+                    # through whatever frame's result would have gone through
+                    line_num, checked = frame.code_object.constants[code[frame.pc + 1]]
+                    callee.returns = StacklessEngine.__add_return(
+                        frame.returns, (frame.return_type, line_num, checked)
+                    )
+                else:
+                    if base + len(callers) >= max_depth:
+                        self.__overflow()
+                    callers.append(frame)
+                if governor is not None:
+                    governor.depth = base + len(callers) - 1
+                    governor.enter()
+                frame = callee
+                continue
+            if status == STATUS_ERROR:
+                if not callers:
+                    return status, value
+                frame = callers.pop()
+                frame.exception = value
+                continue
+            # the frame returned: the result is what ObjectDef.call_method would have returned for it
+            if value is None:
+                value = create_default_value(frame.method_def.return_type)
+            for return_type, line_num, checked in frame.returns:
+                value = self._return_value(value, return_type, line_num, checked)
+            if not callers:
+                return STATUS_RETURN, value
+            frame = callers.pop()
+            frame.stack.append(value)
+
+    # a return that has gone through a return with the same type passes every later check of that type unchanged,
+    # so the chain keeps only the innermost return of each type and stays short however many tail calls are made
+    @staticmethod
+    def __add_return(returns, new_return):
+        return_type = new_return[0]
+        return (new_return,) + tuple(pending for pending in returns if pending[0] is not return_type)
+
+    def __overflow(self):
+        raise RecursionError(f"maximum Brewin call depth of {self.max_depth} exceeded")
+
+
+class BytecodeCompiler:
+    def __init__(self, interpreter, class_def, method_def):
+        self.interpreter = interpreter
+        self.class_def = class_def
+        self.method_def = method_def
+        self.tracing = interpreter.tracing
+        self.field_index = class_def.field_index  # field name -> slot
+        self.local_names = collect_local_names(method_def)
+        self.code = []
+        self.lines = []
+        self.constants = []
+        self.constant_index = {}  # dedups hashable constant keys
+
+    def compile(self):
+        self.__compile_statement(self.method_def.code)
+        self.__emit(END, 0, self.method_def.line_num)
+        return CodeObject(
+            f"{self.class_def.get_name()}.{self.method_def.method_name}",
+            self.method_def.line_num,
+            self.code,
+            self.lines,
+            self.constants,
+        )
+
+    def __emit(self, op, arg, line_num):
+        self.code.append(op)
+        self.code.append(arg)
+        self.lines.append(line_num)
+        return len(self.code) - 2
+
+    def __patch(self, offset, target):
+        self.code[offset + 1] = target
+
+    def __here(self):
+        return len(self.code)
+
+    def __constant(self, value, key=None):
+        if key is not None:
+            index = self.constant_index.get(key)
+            if index is not None:
+                return index
+        self.constants.append(value)
+        index = len(self.constants) - 1
+        if key is not None:
+            self.constant_index[key] = index
+        return index
+
+    def __may_be_local(self, name):
+        return self.local_names is None or name in self.local_names
+
+    # emits code for a statement; malformed statements are rolled back and left to the tree walker
+    def __compile_statement(self, code):
+        start = self.__here()
+        if type(code) is list and code and isinstance(code[0], str) and hasattr(code[0], "line_num"):
+            try:
+                if self.__compile_statement_kind(code):
+                    return
+            except (IndexError, TypeError):
+                pass
+        del self.code[start:]
+        del self.lines[start // 2:]
+        line_num = getattr(code[0], "line_num", None) if type(code) is list and code else None
+        self.__emit(EXEC_TREE, self.__constant(code), line_num)
+
+    def __compile_statement_kind(self, code):
+        tok = code[0]
+        line_num = tok.line_num
+        if self.tracing:
+            self.__emit(TRACE, self.__constant(code), line_num)
+        if tok == InterpreterBase.BEGIN_DEF:
+            for statement in code[1:]:
+                self.__compile_statement(statement)
+        elif tok == InterpreterBase.SET_DEF:
+            return self.__compile_set(code, line_num)
+        elif tok == InterpreterBase.IF_DEF:
+            self.__compile_if(code, line_num)
+        elif tok == InterpreterBase.CALL_DEF:
+            self.__compile_call(code, line_num)
+            self.__emit(POP, 0, line_num)
+        elif tok == InterpreterBase.WHILE_DEF:
+            self.__compile_while(code, line_num)
+        elif tok == InterpreterBase.RETURN_DEF:
+            if len(code) == 1:
+                self.__emit(RETURN_NONE, 0, line_num)
+            else:
+                self.__compile_expression(code[1], line_num)
+                self.__emit(RETURN_VALUE, self.__constant((line_num, not self.__verified(code))), line_num)
+        elif tok == InterpreterBase.INPUT_STRING_DEF or tok == InterpreterBase.INPUT_INT_DEF:
+            target = self.__store_target(code[1], line_num)
+            if target is None:
+                return False
+            op = INPUT_STRING if tok == InterpreterBase.INPUT_STRING_DEF else INPUT_INT
+            self.__emit(op, 0, line_num)
+            self.__emit(STORE, target, line_num)
+        elif tok == InterpreterBase.PRINT_DEF:
+            for expr in code[1:]:
+                self.__compile_expression(expr, line_num)
+            self.__emit(PRINT, len(code) - 1, line_num)
+        elif tok == InterpreterBase.LET_DEF:
+            return self.__compile_let(code, line_num)
+        elif tok == InterpreterBase.TRY_DEF:
+            return self.__compile_try(code, line_num)
+        elif tok == InterpreterBase.THROW_DEF:
+            self.__compile_expression(code[1], line_num)
+            self.__emit(THROW, self.__constant(line_num), line_num)
+        else:
+            return False
+        return True
+
+    # checked is False if the TypeChecker proved the stored value always has a matching type
+    def __store_target(self, var_name, line_num, checked=True):
+        if not isinstance(var_name, str):
+            return None
+        return self.__constant(
+            (var_name, self.field_index.get(var_name), self.__may_be_local(var_name), line_num, checked)
+        )
+
+    def __verified(self, code):
+        return id(code) in self.class_def.verified_statements
+
+    # (set varname expression)
+    def __compile_set(self, code, line_num):
+        var_name, expr = code[1], code[2]
+        target = self.__store_target(var_name, line_num, not self.__verified(code))
+        if target is None:
+            return False
+        if not self.__compile_update(var_name, expr, target, line_num):
+            self.__compile_expression(expr, line_num)
+            self.__emit(STORE, target, line_num)
+        return True
+
+    # superinstruction for the (set x (op x constant)) shape, e.g. (set i (+ i 1))
+    def __compile_update(self, var_name, expr, target, line_num):
+        if (
+            type(expr) is not list
+            or len(expr) != 3
+            or expr[0] not in BINARY_OPERATORS
+            or expr[1] != var_name
+            or type(expr[2]) is list
+            or expr[2] in self.field_index
+            or self.__may_be_local(expr[2])
+        ):
+            return False
+        try:
+            constant = create_value(expr[2])
+            var_constant = create_value(var_name)
+        except ValueError:
+            return False
+        if constant is None or not self.__may_be_local(var_name) and var_name not in self.field_index:
+            return False
+        load = (var_name, self.field_index.get(var_name), var_constant, line_num)
+        operation = self.__operation(expr[0], line_num)
+        self.__emit(UPDATE_NAME, self.__constant((load, operation, constant, self.constants[target])), line_num)
+        return True
+
+    # (if expression (statement) (statement))
+    def __compile_if(self, code, line_num):
+        then_code = code[2]
+        self.__compile_condition(code[1], InterpreterBase.IF_DEF, line_num, self.__verified(code))
+        jump_to_else = self.__emit(POP_JUMP_IF_FALSE, 0, line_num)
+        self.__compile_statement(then_code)
+        if len(code) == 4:
+            jump_to_end = self.__emit(JUMP, 0, line_num)
+            self.__patch(jump_to_else, self.__here())
+            self.__compile_statement(code[3])
+            self.__patch(jump_to_end, self.__here())
+        else:
+            self.__patch(jump_to_else, self.__here())
+
+    # (while expression (statement))
+    def __compile_while(self, code, line_num):
+        body_code = code[2]
+        loop_start = self.__here()
+        self.__compile_condition(code[1], InterpreterBase.WHILE_DEF, line_num, self.__verified(code))
+        jump_to_end = self.__emit(POP_JUMP_IF_FALSE, 0, line_num)
+        self.__compile_statement(body_code)
+        self.__emit(JUMP_BACK, loop_start, line_num)
+        self.__patch(jump_to_end, self.__here())
+
+    # verified conditions were proved to always be bools by the TypeChecker
+    def __compile_condition(self, condition_expr, kind, line_num, verified=False):
+        self.__compile_expression(condition_expr, line_num)
+        if not verified:
+            self.__emit(CHECK_BOOL, self.__constant((kind, condition_expr, line_num)), line_num)
+
+    # (let ((type1 var1 defaultvalue1) ... (typen varn defaultvaluen)) (statement1) ... (statementn))
+    def __compile_let(self, code, line_num):
+        if type(code[1]) is not list:
+            return False
+        self.__emit(ENTER_LET, 0, line_num)
+        for var_def in code[1]:
+            self.__emit(DECLARE, self.__constant(self.__compile_local(var_def, line_num)), line_num)
+        for statement in code[2:]:
+            self.__compile_statement(statement)
+        self.__emit(EXIT_LET, 0, line_num)
+        return True
+
+    # primitive locals with literal defaults are resolved now; anything else is declared at run time by
+    # ObjectDef._add_locals_to_env
+    def __compile_local(self, var_def, line_num):
+        generic = (var_def, line_num, None)
+        if type(var_def) is not list or len(var_def) < 2:
+            return generic
+        type_name, var_name = var_def[0], var_def[1]
+        if type_name not in PRIMITIVE_DEFAULTS or not isinstance(var_name, str):
+            return generic
+        default_token = PRIMITIVE_DEFAULTS[type_name] if len(var_def) == 2 else var_def[2]
+        if not isinstance(default_token, str) or not default_token:
+            return generic
+        default_value = create_value(default_token)
+        var_type = Type(type_name)
+        if default_value is None or not self.interpreter.check_type_compatibility(
+            var_type, default_value.type(), True
+        ):
+            return generic
+        return (var_def, line_num, (var_name, var_type, default_value, default_token))
+
+    # (try (statement) (catch statement))
+    def __compile_try(self, code, line_num):
+        if len(code) < 3:
+            return False
+        body_code, handler_code = code[1], code[2]
+        setup = self.__emit(SETUP_TRY, 0, line_num)
+        self.__compile_statement(body_code)
+        self.__emit(POP_TRY, 0, line_num)
+        jump_to_end = self.__emit(JUMP, 0, line_num)
+        self.__patch(setup, self.__here())
+        self.__emit(BIND_EXCEPTION, self.__constant(line_num), line_num)
+        self.__compile_statement(handler_code)
+        self.__emit(END_CATCH, 0, line_num)
+        self.__patch(jump_to_end, self.__here())
+        return True
+
+    # pushes the value of expr
+    def __compile_expression(self, expr, line_num):
+        if type(expr) is not list:
+            self.__compile_name(expr, line_num)
+            return
+        start = self.__here()
+        try:
+            if self.__compile_operation(expr, line_num):
+                return
+        except (IndexError, TypeError):
+            pass
+        del self.code[start:]
+        del self.lines[start // 2:]
+        self.__emit(EVAL_TREE, self.__constant((expr, line_num)), line_num)
+
+    # identifiers resolve as locals/params, then fields, then constants, then me
+    def __compile_name(self, name, line_num):
+        try:
+            constant = create_value(name)
+        except ValueError:  # e.g. "--5"; the walker only fails if the name is actually evaluated
+            self.__emit(EVAL_TREE, self.__constant((name, line_num)), line_num)
+            return
+        field_index = self.field_index.get(name)
+        if self.__may_be_local(name):
+            load = (name, field_index, constant, line_num)
+            self.__emit(LOAD_NAME, self.__constant(load, ("name", name, line_num)), line_num)
+        elif field_index is not None:
+            self.__emit(LOAD_FIELD, self.__constant((name, field_index), ("field", name)), line_num)
+        elif constant is not None:
+            self.__emit(LOAD_CONST, self.__constant(constant, ("literal", name)), line_num)
+        elif name == InterpreterBase.ME_DEF:
+            self.__emit(LOAD_ME, 0, line_num)
+        else:
+            self.__emit(NAME_ERROR, self.__constant((name, line_num)), line_num)
+
+    def __operation(self, operator_name, line_num):
+        return (
+            operator_name,
+            BINARY_OPERATIONS[InterpreterBase.INT_DEF].get(operator_name),
+            BINARY_OPERATIONS[InterpreterBase.STRING_DEF].get(operator_name),
+            BINARY_OPERATIONS[InterpreterBase.BOOL_DEF].get(operator_name),
+            line_num,
+        )
+
+    def __compile_operation(self, expr, line_num):
+        operator_name = expr[0]
+        if operator_name in BINARY_OPERATORS:
+            left, right = expr[1], expr[2]
+            self.__compile_expression(left, line_num)
+            self.__compile_expression(right, line_num)
+            self.__emit(BINARY_OP, self.__constant(self.__operation(operator_name, line_num)), line_num)
+        elif operator_name in UNARY_OPERATORS:
+            self.__compile_expression(expr[1], line_num)
+            self.__emit(UNARY_NOT, self.__constant(line_num), line_num)
+        elif operator_name == InterpreterBase.CALL_DEF:
+            self.__compile_call(expr, line_num)
+        elif operator_name == InterpreterBase.NEW_DEF:
+            self.__emit(NEW, self.__constant((expr[1], line_num)), line_num)
+        else:
+            return False  # unknown operators are left to the walker, which reports them
+        return True
+
+    # (call object_ref/me/super methodname p1 p2 p3); pushes the returned value
+    def __compile_call(self, code, line_num):
+        obj_name, method_name, args = code[1], code[2], code[3:]
+        call_site = self.interpreter.get_call_site(line_num, method_name)
+        start_class = None
+        if obj_name == InterpreterBase.ME_DEF:
+            op = CALL_ME
+            start_class = self.class_def
+        elif obj_name == InterpreterBase.SUPER_DEF:
+            start_class = self.class_def.get_superclass()
+            if start_class is None:
+                self.__emit(CHECK_SUPER, self.__constant((self.class_def.get_name(), line_num)), line_num)
+            op = CALL_SUPER
+        else:
+            self.__compile_expression(obj_name, line_num)
+            self.__emit(CHECK_NULL, self.__constant(line_num), line_num)
+            op = CALL
+        for expr in args:
+            self.__compile_expression(expr, line_num)
+        self.__emit(op, self.__constant((method_name, len(args), line_num, call_site, start_class)), line_num)
+
+
+# returns a readable listing of a CodeObject
+def disassemble(code_object):
+    listing = [
+        f"{code_object.name} (line {code_object.line_num}): "
+        f"{len(code_object.code) // 2} instructions, {len(code_object.constants)} constants"
+    ]
+    code = code_object.code
+    jump_targets = {code[i + 1] for i in range(0, len(code), 2) if code[i] in JUMP_OPCODES}
+    for offset in range(0, len(code), 2):
+        op, arg = code[offset], code[offset + 1]
+        marker = ">>" if offset in jump_targets else "  "
+        line_num = code_object.lines[offset // 2]
+        if op in NO_ARG_OPCODES:
+            detail = ""
+        elif op in JUMP_OPCODES:
+            detail = f"{arg:>4} (to {arg})"
+        elif op in COUNT_OPCODES:
+            detail = f"{arg:>4}"
+        else:
+            detail = f"{arg:>4} ({_describe_constant(op, code_object.constants[arg])})"
+        listing.append(f"{str(line_num):>5} {marker} {offset:>5} {OPCODE_NAMES[op]:<18}{detail}".rstrip())
+    return "\n".join(listing)
+
+
+def _describe_constant(op, constant):
+    if isinstance(constant, Value):
+        return _describe_value(constant)
+    if op == RETURN_VALUE:
+        return f"line {constant[0]}" + ("" if constant[1] else ", unchecked")
+    if op in (THROW, CHECK_NULL, BIND_EXCEPTION, UNARY_NOT):
+        return f"line {constant}"
+    if op == CHECK_SUPER:
+        return f"{constant[0]}, line {constant[1]}"
+    if op in (LOAD_NAME, LOAD_FIELD, NAME_ERROR, STORE):
+        return constant[0]
+    if op == BINARY_OP:
+        return constant[0]
+    if op in (CALL, CALL_ME, CALL_SUPER):
+        return f"{constant[0]}, {constant[1]} args"
+    if op == NEW:
+        return constant[0]
+    if op == UPDATE_NAME:
+        load, operation, value, _ = constant
+        return f"{load[0]} = {load[0]} {operation[0]} {_describe_value(value)}"
+    if op == CHECK_BOOL:
+        return f"{constant[0]} condition"
+    if op == DECLARE:
+        var_def = constant[0]
+        return " ".join(str(token) for token in var_def) if type(var_def) is list else str(var_def)
+    if op in (TRACE, EXEC_TREE):
+        return _describe_source(constant)
+    if op == EVAL_TREE:
+        return _describe_source(constant[0])
+    return str(constant)
+
+
+def _describe_value(value):
+    if value.type() is STRING_TYPE_CONST:
+        return f'"{value.value()}"'
+    if value.type() is BOOL_TYPE_CONST:
+        return InterpreterBase.TRUE_DEF if value.value() else InterpreterBase.FALSE_DEF
+    if value.value() is None:
+        return InterpreterBase.NULL_DEF
+    return str(value.value())
+
+
+def _describe_source(code):
+    if type(code) is not list:
+        return str(code)
+    return "(" + " ".join(_describe_source(item) for item in code) + ")"
+
+
+# compiles every method of every class in a program, returning the listings
+def disassemble_program(program):
+    from interpreterv3 import Interpreter
+
+    interpreter = Interpreter(console_output=False, engine="bytecode")
+    interpreter.load(program)
+    listings = []
+    for class_def in list(interpreter.class_index.values()):
+        for method_def in class_def.get_methods():
+            listings.append(disassemble(interpreter.engine.compile_method(class_def, method_def)))
+    return "\n\n".join(listings)
+
+
+if __name__ == "__main__":
+    if len(sys.argv) != 2:
+        print("usage: python bytecode_engine.py program.br")
+        sys.exit(2)
+    with open(sys.argv[1]) as source:
+        print(disassemble_program(source.read().splitlines()))
@@ -37,7 +37,6 @@
 
 from intbase import InterpreterBase, ErrorType
 from type_valuev2 import Type, create_value
-import copy
 
 class VariableDef:
     # var_type is a Type() and value is a Value()
@@ -53,7 +52,9 @@ class VariableDef:
 # parses and holds the definition of a member method
 # [method return_type method_name [[type1 param1] [type2 param2] ...] [statement]]
 class MethodDef:
-    def __init__(self, method_source):
+    # class_def is the ClassDef the method is defined in
+    def __init__(self, method_source, class_def=None):
+        self.class_def = class_def
         self.line_num = method_source[0].line_num  # used for errors
         self.method_name = method_source[2]
         if method_source[1] == InterpreterBase.VOID_DEF:
@@ -62,6 +63,14 @@ class MethodDef:
             self.return_type = Type(method_source[1])
         self.formal_params = self.__parse_params(method_source[3])
         self.code = method_source[4]
+        self.source_code = None  # the code as written, once the Optimizer has replaced code
+        self.frame_layout = None  # the tree walker's frames.FrameLayout, made on the first call
+
+    # the layout refers to the code by id, so copies and pickles of the method resolve their own
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state["frame_layout"] = None
+        return state
 
     def get_method_name(self):
         return self.method_name
@@ -100,6 +109,11 @@ class ClassDef:
         )
         self.__create_field_list(class_source[fields_and_methods_start_index:])
         self.__create_method_list(class_source[fields_and_methods_start_index:])
+        self.__create_slot_layout()
+        self.vtable = None  # built by get_vtable() on first use
+        # ids of the statements in this class's methods whose runtime type checks the TypeChecker proved can't
+        # fail (see typechecker.py); the engines skip those checks
+        self.verified_statements = frozenset()
 
     # get the classname
     def get_name(self):
@@ -117,6 +131,33 @@ class ClassDef:
     def get_superclass(self):
         return self.super_class
 
+    # maps each method name to a tuple of the MethodDefs of every class in the inheritance chain that defines it,
+    # most derived first
+    def get_vtable(self):
+        if self.vtable is None:
+            vtable = {}
+            class_def = self
+            while class_def is not None:
+                for method_def in class_def.get_methods():
+                    vtable.setdefault(method_def.method_name, []).append(method_def)
+                class_def = class_def.get_superclass()
+            self.vtable = {name: tuple(method_defs) for name, method_defs in vtable.items()}
+        return self.vtable
+
+    # returns the most derived MethodDef named method_name whose formal parameters accept arguments of the given
+    # Types, or None if there isn't one
+    def find_method(self, method_name, arg_types):
+        for method_def in self.get_vtable().get(method_name, ()):
+            formal_params = method_def.formal_params
+            if len(formal_params) != len(arg_types):
+                continue
+            for formal, arg_type in zip(formal_params, arg_types):
+                if not self.interpreter.check_type_compatibility(formal.type, arg_type, True):
+                    break
+            else:
+                return method_def
+        return None
+
     def __check_for_inheritance_and_set_superclass_info(self, class_source):
         if class_source[2] != InterpreterBase.INHERITS_DEF:
             self.super_class = None
@@ -156,7 +197,7 @@ class ClassDef:
                 field_def.append('false')
             elif field_def[1] == 'string':
                 field_def.append('""')
-            elif field_def[1] in self.interpreter.class_index.keys() or field_def[1] == 'main':
+            elif self.interpreter.is_class_name(field_def[1]) or field_def[1] == 'main':
                 field_def.append('null')
             elif field_def[1].split('@')[0] in self.interpreter.template_class_index.keys():
                 field_def.append('null')
@@ -181,13 +222,29 @@ class ClassDef:
             )
         return var_def
 
+    # objects store the fields of their whole inheritance chain in one list of slots, superclass fields first, so
+    # a field has the same slot in every subclass. field_index maps the names of this class's own fields (the
+    # only ones its methods can see) to their slots; slot_types and slot_defaults cover every slot
+    def __create_slot_layout(self):
+        if self.super_class is None:
+            self.slot_types = []
+            self.slot_defaults = []
+        else:
+            self.slot_types = list(self.super_class.slot_types)
+            self.slot_defaults = list(self.super_class.slot_defaults)
+        self.field_index = {}
+        for var_def in self.fields:
+            self.field_index[var_def.name] = len(self.slot_types)
+            self.slot_types.append(var_def.type)
+            self.slot_defaults.append(var_def.value)
+
     def __create_method_list(self, class_body):
         self.methods = []
         self.method_map = {}
         methods_defined_so_far = set()
         for member in class_body:
             if member[0] == InterpreterBase.METHOD_DEF:
-                method_def = MethodDef(member)
+                method_def = MethodDef(member, self)
                 if method_def.method_name in methods_defined_so_far:  # redefinition
                     self.interpreter.error(
                         ErrorType.NAME_ERROR,
@@ -204,7 +261,7 @@ class ClassDef:
     def __check_method_names_and_types(self, method_def):
         if not self.interpreter.is_valid_type(
             method_def.return_type.type_name
-        ) and method_def.return_type != Type(InterpreterBase.NOTHING_DEF): #checks that return type isn't a defined type or void
+        ) and method_def.return_type is not Type(InterpreterBase.NOTHING_DEF): #checks that return type isn't a defined type or void
             self.interpreter.error(
                 ErrorType.TYPE_ERROR,
                 "invalid return type for method " + method_def.method_name,
@@ -225,54 +282,10 @@ class ClassDef:
                     method_def.line_num,
                 )
 
+    # builds (at most once) the class for a concrete template type such as node@int
     def _create_template_class(self, templated_class):
-        og = templated_class
-        templated_class = templated_class.split('@')
-        template_class_name = templated_class[0]
-        parametrized_types = templated_class[1:]
-        param_mapped_to_real_type = {}
-        #self.interpreter.template_class_index[template_class_name].parametrized_types = templated_class[1:] 
-        for field in self.interpreter.template_class_index[template_class_name].template_fields:
-            if field != 'int' and field != 'string' and field != 'bool' and field not in self.interpreter.template_class_index[template_class_name].parametrized_types:
-                if '@' in field and field.split('@')[0] != template_class_name:
-                    self.interpreter.error(ErrorType.TYPE_ERROR, "invalid type/type mismatch with field " + field)
-
-        template_class_source_og = self.interpreter.template_class_index[template_class_name].class_source
-        template_class_source = copy.deepcopy(template_class_source_og)
-
-        if len(parametrized_types) != len(template_class_source[2]):
-            self.interpreter.error(ErrorType.TYPE_ERROR, "incorrect number of parameters")
-        for i in range(len(parametrized_types)):
-            param_mapped_to_real_type[template_class_source[2][i]] = parametrized_types[i]
-
-        
-        for item in template_class_source[3:]:
-            if item[0] == InterpreterBase.FIELD_DEF:
-                for type in template_class_source[2]:
-                    if type == item[1]:
-                        item[1] = param_mapped_to_real_type[type]
-                    elif '@' in item[1]:
-                        item[1] = og
-            if item[0] == InterpreterBase.METHOD_DEF:
-                for return_type in template_class_source[2]:
-                    if return_type == item[1]:
-                        item[1] = param_mapped_to_real_type[return_type]
-                    elif '@' in item[1]:
-                        item[1] = og
-
-                for param in template_class_source[2]:
-                    for i in range(len(item[3])):
-                        if param == item[3][i][0]:
-                            item[3][i][0] = param_mapped_to_real_type[param]
-                        elif '@' in item[3][i][0]:
-                            item[3][i][0] = og
-
-        template_class_source[0] = 'class'
-        template_class_source[1] = og
-        template_class_source.pop(2)
-
-        self.interpreter.type_manager.add_class_type(og, None)
-        self.interpreter.class_index[og] = ClassDef(template_class_source, self.interpreter)
+        template_class_name = templated_class.split('@')[0]
+        self.interpreter.template_class_index[template_class_name].instantiate(templated_class, self.interpreter)
 
 # parses and holds the definition of a template member method
 # [method return_type method_name [[type1 param1] [type2 param2] ...] [statement]]
@@ -307,6 +320,8 @@ class TemplateClassDef:
         self.class_source = class_source
         self.parametrized_types = class_source[2]
 
+        self.instances = {}  # concrete type name (e.g. node@int) -> ClassDef, None while it is being built
+
         self.__create_template_field_list(class_source[3:])
         self.__create_template_method_list(class_source[3:])
 
@@ -321,6 +336,66 @@ class TemplateClassDef:
     # get a list of MethodDef objects for all methods in the template class
     def get_template_methods(self):
         return self.template_methods
+
+    # returns the ClassDef for the concrete type templated_class (e.g. node@int), building it and registering it
+    # in the interpreter's class_index the first time it's asked for. the instance's source only copies the
+    # member headers whose types get substituted; method bodies are shared with the template. errors are reported
+    # to interpreter, the one running the program, which defaults to the one that loaded the template
+    def instantiate(self, templated_class, interpreter=None):
+        if interpreter is None:
+            interpreter = self.interpreter
+        if templated_class in self.instances:
+            return self.instances[templated_class]  # None if it is still being built (a field of its own type)
+        og = templated_class
+        parametrized_types = templated_class.split('@')[1:]
+        param_mapped_to_real_type = {}
+        for field in self.template_fields:
+            if field != 'int' and field != 'string' and field != 'bool' and field not in self.parametrized_types:
+                if '@' in field and field.split('@')[0] != self.template_name:
+                    interpreter.error(ErrorType.TYPE_ERROR, "invalid type/type mismatch with field " + field)
+
+        if len(parametrized_types) != len(self.parametrized_types):
+            interpreter.error(ErrorType.TYPE_ERROR, "incorrect number of parameters")
+        for i in range(len(parametrized_types)):
+            param_mapped_to_real_type[self.parametrized_types[i]] = parametrized_types[i]
+
+        class_source = ['class', og]
+        for item in self.class_source[3:]:
+            if item[0] == InterpreterBase.FIELD_DEF:
+                item = list(item)
+                for type in self.parametrized_types:
+                    if type == item[1]:
+                        item[1] = param_mapped_to_real_type[type]
+                    elif '@' in item[1]:
+                        item[1] = og
+            if item[0] == InterpreterBase.METHOD_DEF:
+                item = list(item)
+                item[3] = [list(param) for param in item[3]]
+                for return_type in self.parametrized_types:
+                    if return_type == item[1]:
+                        item[1] = param_mapped_to_real_type[return_type]
+                    elif '@' in item[1]:
+                        item[1] = og
+
+                for param in self.parametrized_types:
+                    for i in range(len(item[3])):
+                        if param == item[3][i][0]:
+                            item[3][i][0] = param_mapped_to_real_type[param]
+                        elif '@' in item[3][i][0]:
+                            item[3][i][0] = og
+            class_source.append(item)
+
+        interpreter.type_manager.add_class_type(og, None)
+        self.instances[og] = None
+        try:
+            class_def = ClassDef(class_source, interpreter)
+        finally:
+            del self.instances[og]
+        self.instances[og] = class_def
+        interpreter.class_index[og] = class_def
+        if interpreter.optimizer is not None:  # instantiated while the program runs
+            interpreter.optimizer.optimize_class(class_def)
+        return class_def
     
     def __create_template_field_list(self, class_body):
         self.template_fields = []
@@ -0,0 +1,917 @@
+"""
+Closure-compiling execution engine, selected with Interpreter(engine="closure").
+
+Instead of re-dispatching on code[0] and re-resolving every identifier each time a statement runs, each
+MethodDef's code is compiled once (on its first call) into a tree of Python closures. Every node already
+knows its statement kind, literal values, operator function and line number. Compiled nodes keep the
+tree walker's protocol - statements and expressions return (status, value) - so a program produces exactly
+the same output and errors under either engine. Code with a shape the compiler doesn't specialize is handed
+back to the tree walker.
+
+Parameters and let locals are lexically addressed: each gets a fixed index in a per-call frame (a list of
+Values) when the method is compiled, so variable access is a list index and let blocks allocate nothing.
+Methods that use try, or that hand any code back to the walker, keep their locals in the walker's
+EnvironmentManager instead, because both depend on its block-by-block layout.
+"""
+
+from intbase import InterpreterBase, ErrorType
+from objectv2 import ObjectDef
+from classv2 import VariableDef
+from type_valuev2 import Type, Value, create_value, flatten
+
+STATUS_PROCEED = ObjectDef.STATUS_PROCEED
+STATUS_RETURN = ObjectDef.STATUS_RETURN
+STATUS_ERROR = ObjectDef.STATUS_ERROR
+
+INT_TYPE_CONST = ObjectDef.INT_TYPE_CONST
+STRING_TYPE_CONST = ObjectDef.STRING_TYPE_CONST
+BOOL_TYPE_CONST = ObjectDef.BOOL_TYPE_CONST
+
+PRIMITIVE_DEFAULTS = {
+    InterpreterBase.INT_DEF: "0",
+    InterpreterBase.BOOL_DEF: "false",
+    InterpreterBase.STRING_DEF: '""',
+}
+
+
+# every name that could ever be in a method's environment: params, let locals and the exception variable
+# bound by try. Identifiers outside this set can skip the environment entirely. Returns None if the method
+# is too irregular to tell, in which case every identifier has to consult the environment.
+def collect_local_names(method_def):
+    try:
+        names = {param.name for param in method_def.formal_params}
+        pending = [method_def.code]
+        while pending:
+            node = pending.pop()
+            if type(node) is not list or not node:
+                continue
+            if node[0] == InterpreterBase.LET_DEF and len(node) > 1 and type(node[1]) is list:
+                for var_def in node[1]:
+                    if type(var_def) is list and len(var_def) > 1:
+                        names.add(var_def[1])
+            elif node[0] == InterpreterBase.TRY_DEF:
+                names.add(InterpreterBase.EXCEPTION_VARIABLE_DEF)
+            pending.extend(node)
+        return names
+    except TypeError:  # unhashable name
+        return None
+
+
+class ClosureEngine:
+    def __init__(self, interpreter):
+        self.interpreter = interpreter
+        self.compiled = {}  # maps MethodDef -> compiled body
+
+    def execute_method(self, obj, env, method_def):
+        body = self.compiled.get(method_def)
+        if body is None:
+            body = MethodCompiler(self.interpreter, method_def).compile()
+            self.compiled[method_def] = body
+        return body(obj, env)
+
+
+# compiles the body of one MethodDef; fields are resolved to slots of the class that defines the method.
+# Compiled closures are called as fn(obj, env); for methods compiled with a frame, env is the frame
+class MethodCompiler:
+    def __init__(self, interpreter, method_def):
+        self.interpreter = interpreter
+        self.method_def = method_def
+        self.return_type = method_def.return_type
+        self.tracing = interpreter.tracing
+        self.binary_ops = ObjectDef.binary_ops
+        self.unary_ops = ObjectDef.unary_ops
+        self.binary_op_list = ObjectDef.binary_op_list
+        self.unary_op_list = ObjectDef.unary_op_list
+        self.class_def = method_def.class_def
+        self.local_names = collect_local_names(method_def)
+        # while compiling with a frame: a stack of {name: (frame index, declared Type)}, one per enclosing let
+        # with the parameters at the bottom
+        self.scopes = None
+        self.next_index = 0  # first free frame index in the current scope
+        self.frame_size = 0
+        self.needs_env = False  # set when the method turns out to need an EnvironmentManager
+
+    def compile(self):
+        if self.local_names is not None:
+            body = self.__compile_with_frame()
+            if body is not None:
+                return body
+        self.scopes = None
+        return self.__compile_statement(self.method_def.code)
+
+    # returns the method body bound to a new frame per call, or None if the method needs an environment
+    def __compile_with_frame(self):
+        param_names = []
+        parameters = {}
+        for index, param in enumerate(self.method_def.formal_params):
+            param_names.append(param.name)
+            parameters.setdefault(param.name, (index, param.type))  # duplicates never run; see call_method
+        self.scopes = [parameters]
+        self.next_index = self.frame_size = len(param_names)
+        statement = self.__compile_statement(self.method_def.code)
+        if self.needs_env:
+            return None
+        frame_size = self.frame_size
+
+        def run(obj, env):
+            frame = [None] * frame_size
+            for index, name in enumerate(param_names):
+                frame[index] = env.get(name).value
+            return statement(obj, frame)
+
+        return run
+
+    # returns (frame index, declared Type) of the innermost parameter or local named name, or None
+    def __frame_local(self, name):
+        if self.scopes is None:
+            return None
+        for scope in reversed(self.scopes):
+            local = scope.get(name)
+            if local is not None:
+                return local
+        return None
+
+    def __may_be_local(self, name):
+        if self.scopes is not None:
+            return False  # locals were already resolved to frame indexes
+        return self.local_names is None or name in self.local_names
+
+    # statements
+
+    def __compile_statement(self, code):
+        run = None
+        if type(code) is list and code and isinstance(code[0], str) and hasattr(code[0], "line_num"):
+            try:
+                run = self.__compile_statement_kind(code)
+            except (IndexError, TypeError):  # malformed statement; let the walker report it when it runs
+                run = None
+        if run is None:
+            return self.__fallback_statement(code)
+        if self.tracing:
+            untraced = run
+            trace_statement = self.interpreter.trace_statement
+
+            def run(obj, env):
+                trace_statement(obj, code)
+                return untraced(obj, env)
+
+        return run
+
+    def __compile_statement_kind(self, code):
+        tok = code[0]
+        if tok == InterpreterBase.BEGIN_DEF:
+            return self.__compile_begin(code)
+        elif tok == InterpreterBase.SET_DEF:
+            return self.__compile_set(code)
+        elif tok == InterpreterBase.IF_DEF:
+            return self.__compile_if(code)
+        elif tok == InterpreterBase.CALL_DEF:
+            return self.__compile_call_statement(code)
+        elif tok == InterpreterBase.WHILE_DEF:
+            return self.__compile_while(code)
+        elif tok == InterpreterBase.RETURN_DEF:
+            return self.__compile_return(code)
+        elif tok == InterpreterBase.INPUT_STRING_DEF:
+            return self.__compile_input(code, True)
+        elif tok == InterpreterBase.INPUT_INT_DEF:
+            return self.__compile_input(code, False)
+        elif tok == InterpreterBase.PRINT_DEF:
+            return self.__compile_print(code)
+        elif tok == InterpreterBase.LET_DEF:
+            return self.__compile_let(code)
+        elif tok == InterpreterBase.TRY_DEF:
+            return self.__compile_try(code)
+        elif tok == InterpreterBase.THROW_DEF:
+            return self.__compile_throw(code)
+        return None
+
+    def __fallback_statement(self, code):
+        self.needs_env = True
+        return_type = self.return_type
+
+        def run(obj, env):
+            return obj._execute_statement(env, return_type, code)
+
+        return run
+
+    # runs statements in order until one returns or throws
+    @staticmethod
+    def __run_block(statements, obj, env):
+        status = STATUS_PROCEED
+        return_value = None
+        for statement in statements:
+            status, return_value = statement(obj, env)
+            if status == STATUS_RETURN or status == STATUS_ERROR:
+                break
+        return status, return_value
+
+    # (begin (statement1) (statement2) ... (statementn))
+    def __compile_begin(self, code):
+        statements = [self.__compile_statement(statement) for statement in code[1:]]
+        run_block = MethodCompiler.__run_block
+
+        def run(obj, env):
+            return run_block(statements, obj, env)
+
+        return run
+
+    # (let ((type1 var1 defaultvalue1) ... (typen varn defaultvaluen)) (statement1) ... (statementn))
+    def __compile_let(self, code):
+        line_num = code[0].line_num
+        if type(code[1]) is not list:
+            return None
+        if self.scopes is not None:
+            return self.__compile_frame_let(code, line_num)
+        declarations = [self.__compile_local(var_def, line_num) for var_def in code[1]]
+        statements = [self.__compile_statement(statement) for statement in code[2:]]
+        run_block = MethodCompiler.__run_block
+
+        def run(obj, env):
+            env.block_nest()
+            for declare in declarations:
+                declare(obj, env)
+            status, return_value = run_block(statements, obj, env)
+            env.block_unnest()
+            return status, return_value
+
+        return run
+
+    # a let whose locals live in frame slots numbered after those of the enclosing scopes
+    def __compile_frame_let(self, code, line_num):
+        first_index = self.next_index
+        scope = {}
+        declarations = []
+        for var_def in code[1]:
+            if type(var_def) is not list or len(var_def) < 2:
+                self.needs_env = True
+                return None
+            type_name, var_name = var_def[0], var_def[1]
+            if not isinstance(type_name, str) or not isinstance(var_name, str):
+                self.needs_env = True
+                return None
+            if var_name in scope:
+                duplicate = True  # reported when the declaration runs, like EnvironmentManager.create_new_symbol
+            else:
+                duplicate = False
+                scope[var_name] = (first_index + len(scope), Type(type_name))
+            declarations.append(self.__compile_frame_local(var_def, scope[var_name][0], duplicate, line_num))
+        self.next_index = first_index + len(scope)
+        self.frame_size = max(self.frame_size, self.next_index)
+        self.scopes.append(scope)
+        statements = [self.__compile_statement(statement) for statement in code[2:]]
+        self.scopes.pop()
+        self.next_index = first_index  # sibling lets reuse the indexes
+        run_block = MethodCompiler.__run_block
+
+        def run(obj, frame):
+            for declare in declarations:
+                declare(obj, frame)
+            return run_block(statements, obj, frame)
+
+        return run
+
+    def __compile_frame_local(self, var_def, index, duplicate, line_num):
+        interpreter = self.interpreter
+        var_name = var_def[1]
+
+        def report_duplicate():
+            interpreter.error(
+                ErrorType.NAME_ERROR,
+                "duplicate local variable name " + var_name,
+                line_num,
+            )
+
+        primitive = self.__primitive_default(var_def)
+        if primitive is None:
+            def declare_generic(obj, frame):
+                default_value = obj._create_local(var_def, line_num).value
+                if duplicate:
+                    report_duplicate()
+                frame[index] = default_value
+
+            return declare_generic
+        default_token, default_value = primitive
+
+        def declare(obj, frame):
+            if len(var_def) == 2:  # the walker fills in the default on first use; keep traces identical
+                var_def.append(default_token)
+            if duplicate:
+                report_duplicate()
+            frame[index] = default_value
+
+        return declare
+
+    # (default token, default Value) for a primitive local whose default is a matching literal, else None
+    def __primitive_default(self, var_def):
+        type_name = var_def[0]
+        if type_name not in PRIMITIVE_DEFAULTS or not isinstance(var_def[1], str):
+            return None
+        default_token = PRIMITIVE_DEFAULTS[type_name] if len(var_def) == 2 else var_def[2]
+        if not isinstance(default_token, str) or not default_token:
+            return None
+        try:
+            default_value = create_value(default_token)
+        except ValueError:  # e.g. "--5"; raised by the walker when the declaration runs
+            return None
+        if default_value is None or not self.interpreter.check_type_compatibility(
+            Type(type_name), default_value.type(), True
+        ):
+            return None
+        return default_token, default_value
+
+    # primitive locals with literal defaults are resolved here; everything else (class and template types,
+    # malformed declarations) goes through ObjectDef._add_locals_to_env one variable at a time
+    def __compile_local(self, var_def, line_num):
+        def declare_generic(obj, env):
+            obj._add_locals_to_env(env, [var_def], line_num)
+
+        if type(var_def) is not list or len(var_def) < 2:
+            return declare_generic
+        primitive = self.__primitive_default(var_def)
+        if primitive is None:
+            return declare_generic
+        default_token, default_value = primitive
+        var_type = Type(var_def[0])
+        var_name = var_def[1]
+        interpreter = self.interpreter
+
+        def declare(obj, env):
+            if len(var_def) == 2:  # the walker fills in the default on first use; keep traces identical
+                var_def.append(default_token)
+            if not env.create_new_symbol(var_name):
+                interpreter.error(
+                    ErrorType.NAME_ERROR,
+                    "duplicate local variable name " + var_name,
+                    line_num,
+                )
+            env.set(var_name, VariableDef(var_type, var_name, default_value))
+
+        return declare
+
+    # (set varname expression)
+    def __compile_set(self, code):
+        line_num = code[0].line_num
+        evaluate = self.__compile_expression(code[2], line_num)
+        assign = self.__compile_assignment(code[1], line_num, id(code) not in self.class_def.verified_statements)
+
+        def run(obj, env):
+            status, val = evaluate(obj, env)
+            if status == STATUS_ERROR:
+                return status, val
+            assign(obj, env, val)
+            return STATUS_PROCEED, None
+
+        return run
+
+    # returns fn(obj, env, value) that stores value into a local/param or field; params shadow fields and
+    # locals shadow params. checked is False if the TypeChecker proved the value always has a matching type
+    def __compile_assignment(self, var_name, line_num, checked=True):
+        interpreter = self.interpreter
+
+        def check(var_type, value):
+            if not interpreter.check_type_compatibility(var_type, value.type(), True):
+                interpreter.error(
+                    ErrorType.TYPE_ERROR,
+                    f"type mismatch {var_type.type_name} and {value.type().type_name}",
+                    line_num,
+                )
+
+        def no_check(var_type, value):
+            pass
+
+        check_type = check if checked else no_check
+
+        def unknown(obj, env, value):
+            interpreter.error(
+                ErrorType.NAME_ERROR, "unknown field/variable " + var_name, line_num
+            )
+
+        if not isinstance(var_name, str):
+            self.needs_env = True
+
+            def assign_any(obj, env, value):
+                var_def = env.get(var_name)
+                if var_def is None:
+                    field_index = env.class_def.field_index.get(var_name)
+                    if field_index is None:
+                        unknown(obj, env, value)
+                    check_type(obj.class_def.slot_types[field_index], value)
+                    obj.slots[field_index] = value
+                    return
+                check_type(var_def.type, value)
+                var_def.set_value(value)
+
+            return assign_any
+
+        local = self.__frame_local(var_name)
+        if local is not None:
+            index, var_type = local
+
+            def assign_frame(obj, frame, value):
+                check_type(var_type, value)
+                frame[index] = value
+
+            def assign_frame_unchecked(obj, frame, value):
+                frame[index] = value
+
+            return assign_frame if checked else assign_frame_unchecked
+        field_index = self.class_def.field_index.get(var_name)
+        field_type = None if field_index is None else self.class_def.slot_types[field_index]
+        if self.__may_be_local(var_name):
+            def assign_local(obj, env, value):
+                var_def = env.get(var_name)
+                if var_def is None:
+                    if field_index is None:
+                        unknown(obj, env, value)
+                    check_type(field_type, value)
+                    obj.slots[field_index] = value
+                    return
+                check_type(var_def.type, value)
+                var_def.set_value(value)
+
+            return assign_local
+        if field_index is not None:
+            def assign_field(obj, env, value):
+                check_type(field_type, value)
+                obj.slots[field_index] = value
+
+            def assign_field_unchecked(obj, env, value):
+                obj.slots[field_index] = value
+
+            return assign_field if checked else assign_field_unchecked
+        return unknown
+
+    # (if expression (statement) (statement))
+    def __compile_if(self, code):
+        line_num = code[0].line_num
+        condition_expr = code[1]
+        evaluate = self.__compile_expression(condition_expr, line_num)
+        then_branch = self.__compile_statement(code[2])
+        else_branch = self.__compile_statement(code[3]) if len(code) == 4 else None
+        interpreter = self.interpreter
+        if id(code) in self.class_def.verified_statements:  # the condition is always a bool
+            def run_unchecked(obj, env):
+                status, condition = evaluate(obj, env)
+                if status == STATUS_ERROR:
+                    return status, condition
+                if condition.value():
+                    return then_branch(obj, env)
+                elif else_branch is not None:
+                    return else_branch(obj, env)
+                return STATUS_PROCEED, None
+
+            return run_unchecked
+
+        def run(obj, env):
+            status, condition = evaluate(obj, env)
+            if status == STATUS_ERROR:
+                return status, condition
+            if condition.type() is not BOOL_TYPE_CONST:
+                interpreter.error(
+                    ErrorType.TYPE_ERROR,
+                    "non-boolean if condition " + ' '.join(x for x in condition_expr),
+                    line_num,
+                )
+            if condition.value():
+                return then_branch(obj, env)
+            elif else_branch is not None:
+                return else_branch(obj, env)
+            return STATUS_PROCEED, None
+
+        return run
+
+    # (while expression (statement))
+    def __compile_while(self, code):
+        line_num = code[0].line_num
+        condition_expr = code[1]
+        evaluate = self.__compile_expression(condition_expr, line_num)
+        body = self.__compile_statement(code[2])
+        interpreter = self.interpreter
+        if id(code) in self.class_def.verified_statements:  # the condition is always a bool
+            def run_unchecked(obj, env):
+                governor = interpreter.governor
+                while True:
+                    status, condition = evaluate(obj, env)
+                    if status == STATUS_ERROR:
+                        return status, condition
+                    if not condition.value():
+                        return STATUS_PROCEED, None
+                    status, return_value = body(obj, env)
+                    if status == STATUS_RETURN or status == STATUS_ERROR:
+                        return status, return_value
+                    if governor is not None:
+                        governor.step()
+
+            return run_unchecked
+
+        def run(obj, env):
+            governor = interpreter.governor
+            while True:
+                status, condition = evaluate(obj, env)
+                if status == STATUS_ERROR:
+                    return status, condition
+                if condition.type() is not BOOL_TYPE_CONST:
+                    interpreter.error(
+                        ErrorType.TYPE_ERROR,
+                        "non-boolean while condition " + ' '.join(x for x in condition_expr),
+                        line_num,
+                    )
+                if not condition.value():
+                    return STATUS_PROCEED, None
+                status, return_value = body(obj, env)
+                if status == STATUS_RETURN or status == STATUS_ERROR:
+                    return status, return_value
+                if governor is not None:
+                    governor.step()
+
+        return run
+
+    # (return expression) or (return)
+    def __compile_return(self, code):
+        if len(code) == 1:
+            def run_empty(obj, env):
+                return STATUS_RETURN, None
+
+            return run_empty
+        line_num = code[0].line_num
+        evaluate = self.__compile_expression(code[1], line_num)
+        return_type = self.return_type
+        interpreter = self.interpreter
+
+        def check_type(result):
+            if not interpreter.check_type_compatibility(return_type, result.type(), True):
+                interpreter.error(
+                    ErrorType.TYPE_ERROR,
+                    f"type mismatch {return_type.type_name} and {result.type().type_name}",
+                    line_num,
+                )
+
+        if id(code) in self.class_def.verified_statements:  # the result always matches the return type
+            def run_unchecked(obj, env):
+                status, result = evaluate(obj, env)
+                if status == STATUS_ERROR:
+                    return status, result
+                if result.is_typeless_null():
+                    result = Value(return_type, None)
+                return STATUS_RETURN, result
+
+            return run_unchecked
+
+        def run(obj, env):
+            status, result = evaluate(obj, env)
+            if status == STATUS_ERROR:
+                return status, result
+            if result.is_typeless_null():
+                check_type(result)
+                result = Value(return_type, None)  # propagate return type to null
+            check_type(result)
+            return STATUS_RETURN, result
+
+        return run
+
+    # (print expression1 expression2 ...)
+    def __compile_print(self, code):
+        line_num = code[0].line_num
+        terms = [self.__compile_expression(expr, line_num) for expr in code[1:]]
+        interpreter = self.interpreter
+
+        def run(obj, env):
+            output = ""
+            for evaluate in terms:
+                status, term = evaluate(obj, env)
+                if status == STATUS_ERROR:
+                    return status, term
+                val = term.value()
+                if term.type() is BOOL_TYPE_CONST:
+                    val = "true" if val == True else "false"
+                output += str(val)
+            interpreter.output(output)
+            return STATUS_PROCEED, None
+
+        return run
+
+    # (inputs target_variable) or (inputi target_variable)
+    def __compile_input(self, code, get_string):
+        line_num = code[0].line_num
+        assign = self.__compile_assignment(code[1], line_num)
+        interpreter = self.interpreter
+
+        def run(obj, env):
+            inp = interpreter.get_input()
+            if get_string:
+                val = Value(STRING_TYPE_CONST, inp)
+            else:
+                val = Value(INT_TYPE_CONST, int(inp))
+            assign(obj, env, val)
+            return STATUS_PROCEED, None
+
+        return run
+
+    # (call object_ref/me methodname param1 param2 param3) as a statement
+    def __compile_call_statement(self, code):
+        call = self.__compile_call(code, code[0].line_num)
+
+        def run(obj, env):
+            status, return_value = call(obj, env)
+            if status == STATUS_ERROR:
+                return status, return_value
+            return STATUS_PROCEED, return_value
+
+        return run
+
+    # (try (statement) (catch statement)); the caught message is bound to the exception variable exactly
+    # the way ObjectDef.__execute_try_helper binds it
+    def __compile_try(self, code):
+        self.needs_env = True
+        line_num = code[0].line_num
+        body = self.__compile_statement(code[1])
+        handler = self.__compile_statement(code[2]) if len(code) > 2 else None
+        handler_code = code[2:]
+
+        def run(obj, env):
+            status, return_value = body(obj, env)
+            if status == STATUS_ERROR:
+                exception_def = ["string", "exception", '"' + return_value.value() + '"']
+                obj._add_locals_to_env(env, [exception_def], line_num)
+                if handler is None:
+                    handler_code[0]  # raises IndexError just like the walker
+                status, return_value = handler(obj, env)
+                if status == STATUS_ERROR:
+                    env.block_unnest()
+                env.block_unnest()
+            return status, return_value
+
+        return run
+
+    # (throw expression)
+    def __compile_throw(self, code):
+        line_num = code[0].line_num
+        evaluate = self.__compile_expression(code[1], line_num)
+        interpreter = self.interpreter
+
+        def run(obj, env):
+            obj.called_throw = True
+            _, exception = evaluate(obj, env)
+            if exception.type() is not STRING_TYPE_CONST:
+                interpreter.error(ErrorType.TYPE_ERROR, "exception is not a string", line_num)
+            return STATUS_ERROR, Value(STRING_TYPE_CONST, flatten(exception.value()))
+
+        return run
+
+    # expressions
+
+    def __compile_expression(self, expr, line_num):
+        if type(expr) is not list:
+            return self.__compile_name(expr, line_num)
+        try:
+            run = self.__compile_operation(expr, line_num)
+        except (IndexError, TypeError):  # malformed expression; let the walker report it when it runs
+            run = None
+        if run is None:
+            return self.__fallback_expression(expr, line_num)
+        return run
+
+    def __fallback_expression(self, expr, line_num):
+        self.needs_env = True
+
+        def run(obj, env):
+            return obj._evaluate_expression(env, expr, line_num)
+
+        return run
+
+    # identifiers resolve as locals/params, then fields, then constants, then me
+    def __compile_name(self, name, line_num):
+        interpreter = self.interpreter
+        field_index = self.class_def.field_index.get(name)
+        is_field = field_index is not None
+        try:
+            constant = create_value(name)
+        except ValueError:  # e.g. "--5"; the walker only fails if the name is actually evaluated
+            return self.__fallback_expression(name, line_num)
+
+        def read(var_def):
+            if var_def.value.is_null():
+                return Value(var_def.type, None)
+            return var_def.value
+
+        local = self.__frame_local(name)
+        if local is not None:
+            index, var_type = local
+
+            def run_frame(obj, frame):
+                value = frame[index]
+                if value.is_null():
+                    return STATUS_PROCEED, Value(var_type, None)
+                return STATUS_PROCEED, value
+
+            return run_frame
+        if self.__may_be_local(name):
+            def run_local(obj, env):
+                var_def = env.get(name)
+                if var_def is not None:
+                    return STATUS_PROCEED, read(var_def)
+                if is_field:
+                    return STATUS_PROCEED, obj._get_field(field_index)
+                if constant is not None:
+                    return STATUS_PROCEED, constant
+                if name == InterpreterBase.ME_DEF:
+                    return STATUS_PROCEED, obj.get_me_as_value()
+                interpreter.error(
+                    ErrorType.NAME_ERROR,
+                    "invalid field or parameter " + name,
+                    line_num,
+                )
+
+            return run_local
+        if is_field:
+            def run_field(obj, env):
+                return STATUS_PROCEED, obj._get_field(field_index)
+
+            return run_field
+        if constant is not None:
+            result = (STATUS_PROCEED, constant)
+
+            def run_constant(obj, env):
+                return result
+
+            return run_constant
+        if name == InterpreterBase.ME_DEF:
+            def run_me(obj, env):
+                return STATUS_PROCEED, obj.get_me_as_value()
+
+            return run_me
+
+        def run_unknown(obj, env):
+            interpreter.error(
+                ErrorType.NAME_ERROR,
+                "invalid field or parameter " + name,
+                line_num,
+            )
+
+        return run_unknown
+
+    def __compile_operation(self, expr, line_num):
+        operator = expr[0]
+        if operator in self.binary_op_list:
+            return self.__compile_binary_operation(expr, line_num)
+        if operator in self.unary_op_list:
+            return self.__compile_unary_operation(expr, line_num)
+        if operator == InterpreterBase.CALL_DEF:
+            return self.__compile_call(expr, line_num)
+        if operator == InterpreterBase.NEW_DEF:
+            return self.__compile_new(expr, line_num)
+
+        interpreter = self.interpreter
+
+        def run_unknown(obj, env):
+            interpreter.error(ErrorType.SYNTAX_ERROR, f"unknown operator {operator}", line_num)
+
+        return run_unknown
+
+    def __compile_binary_operation(self, expr, line_num):
+        operator = expr[0]
+        left = self.__compile_expression(expr[1], line_num)
+        right = self.__compile_expression(expr[2], line_num)
+        int_op = self.binary_ops[InterpreterBase.INT_DEF].get(operator)
+        string_op = self.binary_ops[InterpreterBase.STRING_DEF].get(operator)
+        bool_op = self.binary_ops[InterpreterBase.BOOL_DEF].get(operator)
+        class_ops = self.binary_ops[InterpreterBase.CLASS_DEF]
+        interpreter = self.interpreter
+
+        def run(obj, env):
+            status, operand1 = left(obj, env)
+            if status == STATUS_ERROR:
+                return status, operand1
+            status, operand2 = right(obj, env)
+            if status == STATUS_ERROR:
+                return status, operand2
+            type1 = operand1.type()
+            if type1 is operand2.type():
+                if type1 is INT_TYPE_CONST:
+                    if int_op is None:
+                        interpreter.error(
+                            ErrorType.TYPE_ERROR,
+                            "invalid operator applied to ints",
+                            line_num,
+                        )
+                    return STATUS_PROCEED, int_op(operand1, operand2)
+                if type1 is STRING_TYPE_CONST:
+                    if string_op is None:
+                        interpreter.error(
+                            ErrorType.TYPE_ERROR,
+                            "invalid operator applied to strings",
+                            line_num,
+                        )
+                    return STATUS_PROCEED, string_op(operand1, operand2)
+                if type1 is BOOL_TYPE_CONST:
+                    if bool_op is None:
+                        interpreter.error(
+                            ErrorType.TYPE_ERROR,
+                            "invalid operator applied to bool",
+                            line_num,
+                        )
+                    return STATUS_PROCEED, bool_op(operand1, operand2)
+            # handle object reference comparisons last
+            if interpreter.check_type_compatibility(type1, operand2.type(), False):
+                return STATUS_PROCEED, class_ops[operator](operand1, operand2)
+            interpreter.error(
+                ErrorType.TYPE_ERROR,
+                f"operator {operator} applied to two incompatible types",
+                line_num,
+            )
+
+        return run
+
+    def __compile_unary_operation(self, expr, line_num):
+        operator = expr[0]
+        evaluate = self.__compile_expression(expr[1], line_num)
+        bool_op = self.unary_ops[InterpreterBase.BOOL_DEF].get(operator)
+        interpreter = self.interpreter
+
+        def run(obj, env):
+            status, operand = evaluate(obj, env)
+            if status == STATUS_ERROR:
+                return status, operand
+            if operand.type() is BOOL_TYPE_CONST:
+                if bool_op is None:
+                    interpreter.error(
+                        ErrorType.TYPE_ERROR,
+                        "invalid unary operator applied to bool",
+                        line_num,
+                    )
+                return STATUS_PROCEED, bool_op(operand)
+            interpreter.error(
+                ErrorType.TYPE_ERROR,
+                "invalid unary operator applied to " + operand.type().type_name,
+                line_num,
+            )
+
+        return run
+
+    # (new classname)
+    def __compile_new(self, expr, line_num):
+        class_name = expr[1]
+        interpreter = self.interpreter
+
+        def run(obj, env):
+            new_obj = interpreter.instantiate(class_name, line_num)
+            return STATUS_PROCEED, Value(Type(class_name), new_obj)
+
+        return run
+
+    # (call object_ref/me/super methodname p1 p2 p3), shared by call statements and call expressions
+    def __compile_call(self, code, line_num):
+        obj_name = code[1]
+        method_name = code[2]
+        arguments = [self.__compile_expression(expr, line_num) for expr in code[3:]]
+        interpreter = self.interpreter
+        call_site = interpreter.get_call_site(line_num, method_name)
+        class_def = self.class_def
+
+        def evaluate_arguments(obj, env):
+            actual_args = []
+            for evaluate in arguments:
+                status, val = evaluate(obj, env)
+                if status == STATUS_ERROR:
+                    return status, val
+                actual_args.append(val)
+            return STATUS_PROCEED, actual_args
+
+        if obj_name == InterpreterBase.ME_DEF:
+            def run_me(obj, env):
+                status, actual_args = evaluate_arguments(obj, env)
+                if status == STATUS_ERROR:
+                    return status, actual_args
+                return obj.call_method(method_name, actual_args, False, line_num, call_site, class_def)
+
+            return run_me
+        if obj_name == InterpreterBase.SUPER_DEF:
+            superclass_def = class_def.get_superclass()
+
+            def run_super(obj, env):
+                if superclass_def is None:
+                    interpreter.error(
+                        ErrorType.TYPE_ERROR,
+                        "invalid call to super object by class " + class_def.get_name(),
+                        line_num,
+                    )
+                status, actual_args = evaluate_arguments(obj, env)
+                if status == STATUS_ERROR:
+                    return status, actual_args
+                return obj.call_method(method_name, actual_args, True, line_num, call_site, superclass_def)
+
+            return run_super
+        evaluate_target = self.__compile_expression(obj_name, line_num)
+
+        def run(obj, env):
+            status, obj_val = evaluate_target(obj, env)
+            if status == STATUS_ERROR:
+                return status, obj_val
+            if obj_val.is_null():
+                interpreter.error(ErrorType.FAULT_ERROR, "null dereference", line_num)
+            status, actual_args = evaluate_arguments(obj, env)
+            if status == STATUS_ERROR:
+                return status, actual_args
+            return obj_val.value().call_method(method_name, actual_args, False, line_num, call_site)
+
+        return run
@@ -0,0 +1,394 @@
+"""
+Interpreter daemon: keeps warm worker processes, each holding the loaded Programs of the sources it ran recently,
+and serves runs over a local Unix socket, so that a run costs neither starting Python and importing the
+interpreter nor loading the program.
+
+    python daemon.py serve [--socket PATH] [--workers N] [--engine E] [--timeout S] [--memory MB]
+                           [--max-steps N] [--max-seconds S] [--max-objects N] [--max-call-depth N]
+    python daemon.py run [--socket PATH] [--input FILE] [--max-steps N] ... program.br
+
+run is the client: it runs program.br on the daemon with the lines of FILE (default: stdin, unless it is a
+terminal) as its input, prints the program's output, and exits with status 1 if the program didn't finish
+normally, so it can stand in for running the interpreter in a shell pipeline. Being a new process itself, it
+only saves the interpreter's imports and the loading of the program; a Client that stays connected saves the
+whole start-up:
+
+    with Client() as client:
+        response = client.run(source_lines, inp=["3"], limits=ResourceLimits(steps=1_000_000))
+
+Protocol: a client connects and sends requests one at a time, reading each response before sending the next
+request. Every message, either way, is a 4-byte big-endian length followed by that many bytes of UTF-8 JSON:
+    request   {"source": [lines]} or {"hash": source_hash(lines)}, plus optionally "input": [lines] and
+              "limits": {"steps": N, "seconds": S, "objects": N, "call_depth": N}, which override the daemon's
+              own limits one by one
+    response  the result batch_runner gives for a job: status, output, error_type, error_line, exception,
+              seconds and usage, with "hash" (the hash of the source) in place of name
+A client can send the hash of a source instead of the source itself; the daemon remembers the last SOURCES
+sources it ran, and answers with status "unknown" if it doesn't have that one, so the client then sends the
+source. A request that isn't understood gets status "invalid". Requests run on the worker that most recently
+ran the same source, if it is idle, so that its Program is reused.
+"""
+
+import argparse
+import collections
+import hashlib
+import json
+import os
+import socket
+import socketserver
+import struct
+import sys
+import threading
+
+OK = "ok"  # batch_runner.OK; the client doesn't import batch_runner, to start quickly
+UNKNOWN = "unknown"
+INVALID = "invalid"
+
+# not tempfile.gettempdir(): importing tempfile would be a large part of the client's start-up time
+DEFAULT_SOCKET = os.path.join(os.environ.get("TMPDIR", "/tmp"), f"brewin-daemon-{os.getuid()}.sock")
+SOURCES = 1024  # sources the daemon keeps for requests by hash
+MAX_MESSAGE = 64 * 1024 * 1024  # bytes
+LIMIT_NAMES = ("steps", "seconds", "objects", "call_depth")
+
+_LENGTH = struct.Struct(">I")
+
+
+# the key a source (a list of lines) is known by
+def source_hash(source):
+    return hashlib.sha256("\n".join(source).encode()).hexdigest()
+
+
+# returns the next message from stream (a binary file), or None at the end of the stream
+def read_message(stream):
+    header = stream.read(_LENGTH.size)
+    if not header:
+        return None
+    if len(header) < _LENGTH.size:
+        raise ConnectionError("connection closed in the middle of a message")
+    (length,) = _LENGTH.unpack(header)
+    if length > MAX_MESSAGE:
+        raise ConnectionError(f"message of {length} bytes is longer than {MAX_MESSAGE}")
+    body = stream.read(length)
+    if len(body) < length:
+        raise ConnectionError("connection closed in the middle of a message")
+    return json.loads(body.decode())
+
+
+def write_message(stream, message):
+    body = json.dumps(message).encode()
+    stream.write(_LENGTH.pack(len(body)) + body)
+    stream.flush()
+
+
+class Daemon:
+    # limits is the ResourceLimits requests run with unless they give their own; the other parameters are as in
+    # batch_runner.run_batch
+    def __init__(self, path=DEFAULT_SOCKET, workers=None, engine="tree", timeout=None, memory_limit=None, limits=None):
+        import multiprocessing
+        from governor import ResourceLimits
+
+        self.path = path
+        self.engine = engine
+        self.timeout = timeout
+        self.memory_limit = memory_limit
+        self.limits = ResourceLimits() if limits is None else limits
+        # workers are replaced from request threads, where forking the daemon would be unsafe
+        self.context = multiprocessing.get_context("spawn")
+        self.sources = collections.OrderedDict()  # hash -> source lines, least recently run first
+        self.idle = []
+        self.condition = threading.Condition()  # guards sources and idle
+        self.server = None
+        for _ in range(workers or os.cpu_count() or 1):
+            self.idle.append(self.__start_worker())
+
+    # serves requests until shutdown() is called or the process is interrupted
+    def serve_forever(self):
+        self.__remove_stale_socket()
+        self.server = _Server(self.path, _Handler)
+        self.server.daemon = self
+        try:
+            self.server.serve_forever()
+        finally:
+            self.close()
+
+    def shutdown(self):
+        self.server.shutdown()
+
+    def close(self):
+        if self.server is not None:
+            self.server.server_close()
+            if os.path.exists(self.path):
+                os.unlink(self.path)
+        with self.condition:
+            for worker in self.idle:
+                worker.stop()
+            self.idle = []
+
+    # returns the response to a request
+    def handle(self, request):
+        from batch_runner import BatchJob
+
+        try:
+            key, source = self.__find_source(request)
+            if source is None:
+                return {"status": UNKNOWN, "hash": key}
+            inp = _lines(request.get("input", []), "input")
+            limits = self.__limits(request.get("limits", {}))
+        except (TypeError, ValueError, AttributeError) as error:
+            return {"status": INVALID, "exception": f"{type(error).__name__}: {error}"}
+
+        worker = self.__acquire(key)
+        result, alive = None, False
+        try:
+            worker.send(BatchJob(key, source, inp), limits)
+            result, alive = worker.receive(self.timeout)
+        finally:
+            self.__release(worker, key, result, alive)  # even if the request failed, so the pool keeps its size
+        result["hash"] = result.pop("name")
+        return result
+
+    # returns the hash and source lines of the request's program; the source is None if the hash is unknown
+    def __find_source(self, request):
+        if "source" in request:
+            source = _lines(request["source"], "source")
+            key = source_hash(source)
+        else:
+            key = request["hash"] if isinstance(request.get("hash"), str) else None
+            if key is None:
+                raise ValueError("request has neither a source nor a hash")
+            source = None
+        with self.condition:
+            if source is not None:
+                self.sources[key] = source
+                if len(self.sources) > SOURCES:
+                    self.sources.popitem(last=False)
+            elif key in self.sources:
+                source = self.sources[key]
+            if source is not None:
+                self.sources.move_to_end(key)
+        return key, source
+
+    # returns the ResourceLimits for a request's limits, or None if nothing is limited
+    def __limits(self, requested):
+        from governor import ResourceLimits
+
+        if not isinstance(requested, dict):
+            raise TypeError("limits must be an object")
+        limits = {name: getattr(self.limits, name) for name in LIMIT_NAMES}
+        for name, value in requested.items():
+            if name not in limits:
+                raise ValueError(f"unknown limit {name}")
+            if value is not None and (isinstance(value, bool) or not isinstance(value, (int, float))):
+                raise TypeError(f"limit {name} must be a number")
+            limits[name] = value
+        if all(value is None for value in limits.values()):
+            return None
+        return ResourceLimits(**limits)
+
+    # takes an idle worker, preferring one that ran the source recently
+    def __acquire(self, key):
+        with self.condition:
+            while not self.idle:
+                self.condition.wait()
+            chosen = self.idle[-1]
+            for worker in self.idle:
+                if key in worker.recent:
+                    chosen = worker
+                    break
+            self.idle.remove(chosen)
+            return chosen
+
+    # makes the worker (or its replacement, if it died, ran out of memory or didn't return a result) idle again
+    def __release(self, worker, key, result, alive):
+        from batch_runner import MEMORY, PROGRAMS_PER_WORKER
+
+        if alive and result["status"] != MEMORY:
+            worker.recent[key] = True
+            worker.recent.move_to_end(key)
+            if len(worker.recent) > PROGRAMS_PER_WORKER:
+                worker.recent.popitem(last=False)
+        else:
+            if alive:
+                worker.stop()
+            else:
+                worker.kill()
+            worker = self.__start_worker()
+        with self.condition:
+            self.idle.append(worker)
+            self.condition.notify()
+
+    def __start_worker(self):
+        from batch_runner import Worker
+
+        worker = Worker(self.context, self.engine, self.memory_limit, None)
+        worker.recent = collections.OrderedDict()  # hashes of the sources it ran, as its Program cache keeps them
+        return worker
+
+    # removes a socket left behind by a daemon that is no longer running
+    def __remove_stale_socket(self):
+        if not os.path.exists(self.path):
+            return
+        probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            probe.connect(self.path)
+        except (ConnectionRefusedError, FileNotFoundError):
+            os.unlink(self.path)
+            return
+        finally:
+            probe.close()
+        raise OSError(f"a daemon is already serving {self.path}")
+
+
+def _lines(value, what):
+    if isinstance(value, str):
+        return value.splitlines()
+    if not isinstance(value, list) or not all(isinstance(line, str) for line in value):
+        raise TypeError(f"{what} must be a list of lines")
+    return value
+
+
+class _Server(socketserver.ThreadingUnixStreamServer):
+    daemon_threads = True
+    block_on_close = False
+
+
+# serves one connection
+class _Handler(socketserver.StreamRequestHandler):
+    def handle(self):
+        daemon = self.server.daemon
+        while True:
+            try:
+                request = read_message(self.rfile)
+            except ConnectionError:
+                return
+            except ValueError as error:  # a whole message that isn't JSON
+                write_message(self.wfile, {"status": INVALID, "exception": f"{type(error).__name__}: {error}"})
+                continue
+            if request is None:
+                return
+            if not isinstance(request, dict):
+                response = {"status": INVALID, "exception": "a request must be an object"}
+            else:
+                response = daemon.handle(request)
+            write_message(self.wfile, response)
+
+
+class Client:
+    def __init__(self, path=DEFAULT_SOCKET):
+        self.socket = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.socket.connect(path)
+        self.reader = self.socket.makefile("rb")
+        self.writer = self.socket.makefile("wb")
+
+    # runs source (a list of lines) with the input lines inp; limits is an optional ResourceLimits. Returns the
+    # response; the source is only sent if the daemon doesn't already have it
+    def run(self, source, inp=None, limits=None):
+        request = {"hash": source_hash(source), "input": inp or []}
+        if limits is not None:
+            request["limits"] = {
+                name: getattr(limits, name) for name in LIMIT_NAMES if getattr(limits, name) is not None
+            }
+        response = self.request(request)
+        if response["status"] == UNKNOWN:
+            del request["hash"]
+            request["source"] = source
+            response = self.request(request)
+        return response
+
+    # sends one request (a dict) and returns the response
+    def request(self, request):
+        write_message(self.writer, request)
+        response = read_message(self.reader)
+        if response is None:
+            raise ConnectionError("the daemon closed the connection")
+        return response
+
+    def close(self):
+        self.reader.close()
+        self.writer.close()
+        self.socket.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def _add_limit_arguments(arg_parser):
+    arg_parser.add_argument("--max-steps", type=int, help="loop iterations and calls a program may make")
+    arg_parser.add_argument("--max-seconds", type=float, help="seconds a program may run before it is stopped")
+    arg_parser.add_argument("--max-objects", type=int, help="Brewin objects a program may have alive at once")
+    arg_parser.add_argument("--max-call-depth", type=int, help="how deeply a program's method calls may nest")
+
+
+def _serve(args):
+    import signal
+    from governor import ResourceLimits
+
+    limits = ResourceLimits(args.max_steps, args.max_seconds, args.max_objects, args.max_call_depth)
+    memory_limit = None if args.memory is None else args.memory * 1024 * 1024
+    daemon = Daemon(args.socket, args.workers, args.engine, args.timeout, memory_limit, limits)
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+    try:
+        daemon.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    except OSError as error:  # the socket is in use or can't be created
+        print(error, file=sys.stderr)
+        return 1
+    return 0
+
+
+def _run(args):
+    with open(args.program) as source:
+        program = source.read().splitlines()
+    if args.input is not None:
+        with open(args.input) as source:
+            inp = source.read().splitlines()
+    else:
+        inp = [] if sys.stdin.isatty() else sys.stdin.read().splitlines()
+    limits = None
+    if any(limit is not None for limit in (args.max_steps, args.max_seconds, args.max_objects, args.max_call_depth)):
+        from governor import ResourceLimits
+
+        limits = ResourceLimits(args.max_steps, args.max_seconds, args.max_objects, args.max_call_depth)
+    with Client(args.socket) as client:
+        response = client.run(program, inp, limits)
+    for line in response.get("output", []):
+        print(line)
+    if response["status"] == OK:
+        return 0
+    print(response.get("exception") or response["status"], file=sys.stderr)
+    return 1
+
+
+def main(argv):
+    arg_parser = argparse.ArgumentParser(description="Serve Brewin runs over a Unix socket, or run a program on it.")
+    commands = arg_parser.add_subparsers(dest="command", required=True)
+
+    serve = commands.add_parser("serve", help="run the daemon")
+    serve.add_argument("--socket", default=DEFAULT_SOCKET, help=f"socket path (default: {DEFAULT_SOCKET})")
+    serve.add_argument("--workers", type=int, help="worker processes (default: one per CPU)")
+    serve.add_argument("--engine", default="tree", help="engine the workers run programs with")
+    serve.add_argument("--timeout", type=float, help="seconds a program may run before its worker is killed")
+    serve.add_argument("--memory", type=int, help="megabytes of address space each worker may use")
+    _add_limit_arguments(serve)
+
+    run = commands.add_parser("run", help="run a program on the daemon")
+    run.add_argument("program")
+    run.add_argument("--socket", default=DEFAULT_SOCKET, help=f"socket path (default: {DEFAULT_SOCKET})")
+    run.add_argument("--input", help="file of input lines (default: stdin)")
+    _add_limit_arguments(run)
+
+    args = arg_parser.parse_args(argv)
+    if args.command == "serve":
+        from interpreterv3 import Interpreter
+
+        if args.engine not in Interpreter.ENGINES:
+            arg_parser.error(f"unknown engine {args.engine}; choose from {', '.join(sorted(Interpreter.ENGINES))}")
+    return _serve(args) if args.command == "serve" else _run(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
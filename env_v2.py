@@ -1,3 +1,6 @@
+from intbase import InterpreterBase
+
+
 class EnvironmentManager:
     """
     The EnvironmentManager class keeps a mapping between each variable name (aka symbol)
@@ -6,8 +9,11 @@ class EnvironmentManager:
     the variable, in the case of object references).
     """
 
-    def __init__(self):
+    # class_def is the class of the method this environment belongs to; its fields are in scope after the
+    # method's parameters and locals
+    def __init__(self, class_def=None):
         self.environment = [{}]
+        self.class_def = class_def
 
     # returns a VariableDef object
     def get(self, symbol):
@@ -45,4 +51,8 @@ class EnvironmentManager:
 
     # used when we exit a nested block to discard the environment for that block
     def block_unnest(self):
-        self.environment.pop()
\ No newline at end of file
+        self.environment.pop()
+
+    # the name (try ...) binds the caught exception to
+    def exception_name(self, code):
+        return InterpreterBase.EXCEPTION_VARIABLE_DEF
\ No newline at end of file
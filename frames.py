@@ -0,0 +1,193 @@
+"""
+Lexically addressed frames for the tree walker's parameters and let locals.
+
+The first time a method is called by the tree walker, resolve() gives each of its parameters and let locals
+(and the exception variable of each try) a fixed slot in a per-call frame, and rewrites every identifier in the
+method's code that names one of them into a LocalName holding its slot. The call then runs with a
+SlotEnvironment, a list of VariableDefs indexed by slot, in place of an EnvironmentManager: a variable is found
+by indexing instead of by searching a stack of dicts, a let allocates no dict, and identifiers that name no
+local (fields, literals, me) are passed over without a lookup. Sibling lets reuse the same slots.
+
+A LocalName is equal to the token it replaced, so the type checker, the trace output and the other engines see
+the same code, and it pickles and copies back to a plain token. SlotEnvironment keeps the EnvironmentManager
+interface and its block-by-block behavior, including what a caught exception does to the blocks (see
+ObjectDef.__execute_try): each block remembers the locals declared in it, and a block that is popped empties
+their slots, so a lookup falls through to an enclosing declaration of the name, or to the fields, exactly when
+EnvironmentManager's would. Duplicate parameters and locals are still reported when they're declared.
+
+Methods whose code is too irregular to resolve (e.g. a malformed statement, which reports its error when it
+runs) keep the EnvironmentManager.
+"""
+
+from bparser import StringWithLineNumber
+from intbase import InterpreterBase
+
+
+# an identifier resolved to frame slots: slots holds the slot of every declaration of the name that encloses
+# the identifier, innermost first, and slot is the innermost one
+class LocalName(StringWithLineNumber):
+    def __new__(cls, token, slots):
+        name = super().__new__(cls, token, getattr(token, "line_num", None))
+        name.slots = slots
+        name.slot = slots[0]
+        return name
+
+
+# the result of resolving one method: the number of slots its frame needs and the LocalName bound by each try
+# (keyed by the id of the try statement). code is the code that was resolved; regular is False if the method
+# keeps the EnvironmentManager
+class FrameLayout:
+    def __init__(self, code, regular, size=0, exception_names=None):
+        self.code = code
+        self.regular = regular
+        self.size = size
+        self.exception_names = exception_names
+
+
+# resolves method_def's parameters and locals to slots, rewriting its code and formal_params in place
+def resolve(method_def):
+    resolver = _Resolver()
+    try:
+        resolver.resolve(method_def)
+    except (TypeError, IndexError, AttributeError):
+        return FrameLayout(method_def.code, False)
+    return FrameLayout(method_def.code, True, resolver.size, resolver.exception_names)
+
+
+class _Resolver:
+    def __init__(self):
+        self.scopes = []  # stack of {name: LocalName}, with the parameters at the bottom
+        self.next_slot = 0
+        self.size = 0
+        self.exception_names = {}
+
+    def resolve(self, method_def):
+        self.scopes.append({})
+        for formal in method_def.formal_params:
+            formal.name = self.__declare(formal.name)
+        self.__statement(method_def.code)
+
+    # returns the LocalName for a declaration of name in the innermost scope; a duplicate gets the slot of the
+    # first declaration, and is reported when it runs
+    def __declare(self, name):
+        scope = self.scopes[-1]
+        local = scope.get(name)
+        if local is None:
+            outer = self.__lookup(name)
+            local = LocalName(name, (self.next_slot,) + (outer.slots if outer is not None else ()))
+            scope[name] = local
+            self.next_slot += 1
+            self.size = max(self.size, self.next_slot)
+        return local
+
+    def __lookup(self, name):
+        for scope in reversed(self.scopes):
+            local = scope.get(name)
+            if local is not None:
+                return local
+        return None
+
+    # returns the identifier as a LocalName if it names a parameter or local in scope, or else unchanged
+    def __identifier(self, token):
+        local = self.__lookup(token)
+        if local is None:
+            return token
+        return LocalName(token, local.slots)
+
+    def __nest(self):
+        self.scopes.append({})
+        return self.next_slot
+
+    def __unnest(self, next_slot):
+        self.scopes.pop()
+        self.next_slot = next_slot
+
+    def __statement(self, code):
+        tok = code[0]
+        if tok == InterpreterBase.BEGIN_DEF:
+            for statement in code[1:]:
+                self.__statement(statement)
+        elif tok == InterpreterBase.LET_DEF:
+            next_slot = self.__nest()
+            for var_def in code[1]:
+                var_def[1] = self.__declare(var_def[1])
+            for statement in code[2:]:
+                self.__statement(statement)
+            self.__unnest(next_slot)
+        elif tok == InterpreterBase.TRY_DEF:
+            self.__statement(code[1])
+            next_slot = self.__nest()
+            self.exception_names[id(code)] = self.__declare(InterpreterBase.EXCEPTION_VARIABLE_DEF)
+            self.__statement(code[2])
+            self.__unnest(next_slot)
+        elif tok in (InterpreterBase.IF_DEF, InterpreterBase.WHILE_DEF):
+            code[1] = self.__expression(code[1])
+            for statement in code[2:]:
+                self.__statement(statement)
+        elif tok == InterpreterBase.SET_DEF:
+            code[1] = self.__identifier(code[1])
+            code[2] = self.__expression(code[2])
+        elif tok in (InterpreterBase.INPUT_STRING_DEF, InterpreterBase.INPUT_INT_DEF):
+            code[1] = self.__identifier(code[1])
+        elif tok == InterpreterBase.CALL_DEF:
+            self.__call(code)
+        elif tok in (InterpreterBase.PRINT_DEF, InterpreterBase.RETURN_DEF, InterpreterBase.THROW_DEF):
+            code[1:] = [self.__expression(expr) for expr in code[1:]]
+
+    def __expression(self, expr):
+        if type(expr) is not list:
+            return self.__identifier(expr)
+        operator = expr[0]
+        if operator == InterpreterBase.CALL_DEF:
+            self.__call(expr)
+        elif operator != InterpreterBase.NEW_DEF:
+            expr[1:] = [self.__expression(operand) for operand in expr[1:]]
+        return expr
+
+    # (call target method_name argument1 ...); the method name isn't an identifier
+    def __call(self, code):
+        code[1] = self.__expression(code[1])
+        code[3:] = [self.__expression(expr) for expr in code[3:]]
+
+
+# EnvironmentManager's interface over a frame laid out by resolve(); see the module docstring
+class SlotEnvironment:
+    def __init__(self, class_def, layout):
+        self.class_def = class_def
+        self.layout = layout
+        self.slots = [None] * layout.size
+        self.blocks = [[]]  # the LocalNames declared in each block, innermost last
+
+    # returns a VariableDef object, or None if symbol isn't a parameter or local in scope
+    def get(self, symbol):
+        if type(symbol) is LocalName:
+            slots = self.slots
+            for slot in symbol.slots:
+                var_def = slots[slot]
+                if var_def is not None:
+                    return var_def
+        return None
+
+    # returns False if the most nested block already has a symbol with this name
+    def create_new_symbol(self, symbol):
+        block = self.blocks[-1]
+        if symbol in block:
+            return False
+        block.append(symbol)
+        return True
+
+    def set(self, symbol, value):
+        self.slots[symbol.slot] = value
+        return True
+
+    def block_nest(self):
+        self.blocks.append([])
+
+    def block_unnest(self):
+        slots = self.slots
+        for symbol in self.blocks.pop():
+            slots[symbol.slot] = None
+
+    # the name (try ...) binds the caught exception to
+    def exception_name(self, code):
+        return self.layout.exception_names[id(code)]
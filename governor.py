@@ -0,0 +1,145 @@
+"""
+Resource governor: limits on what a single Interpreter.run may consume.
+
+    limits = ResourceLimits(steps=10_000_000, seconds=5, objects=100_000, call_depth=1000)
+    try:
+        interpreter.run(program, limits=limits)
+    except ResourceLimitExceeded as exceeded:
+        print(exceeded.limit, exceeded.usage)   # e.g. "seconds", {"steps": ..., "seconds": ..., ...}
+
+Limits are checked where a program can keep running or keep growing, so that the checks stay off the paths of
+straight-line code:
+    steps       every while loop iteration (its back edge) and every method call is one step; a program can only
+                run an unbounded number of statements through loops and calls, so the step count bounds the
+                statements run to within a factor of the size of the program
+    seconds     wall-clock time since run() started; the clock is read every CLOCK_INTERVAL steps
+    objects     Brewin objects alive at once; objects are counted by Interpreter.instantiate and uncounted when
+                Python frees them, and the garbage collector runs once before the limit is reported, so objects
+                only kept alive by reference cycles don't count
+    call_depth  nesting of Brewin method calls
+
+Exceeding a limit raises ResourceLimitExceeded out of run(). It isn't a Brewin exception, so (try ...) can't
+catch it, and the interpreter is left as it was at that point. Interpreter.get_resource_usage() gives the same
+counts after any governed run.
+"""
+
+import gc
+import time
+
+from objectv2 import ObjectDef
+
+STEPS = "steps"
+SECONDS = "seconds"
+OBJECTS = "objects"
+CALL_DEPTH = "call_depth"
+
+
+class ResourceLimits:
+    # None leaves a resource unlimited
+    def __init__(self, steps=None, seconds=None, objects=None, call_depth=None):
+        self.steps = steps
+        self.seconds = seconds
+        self.objects = objects
+        self.call_depth = call_depth
+
+
+# raised out of Interpreter.run when a program exceeds one of its ResourceLimits; limit names the resource
+# (STEPS, SECONDS, OBJECTS or CALL_DEPTH) and usage is Governor.usage() at that point
+class ResourceLimitExceeded(Exception):
+    def __init__(self, limit, maximum, usage):
+        super().__init__(
+            f"{limit} limit of {maximum} exceeded: {usage[STEPS]} steps, {usage[SECONDS]:.3f} seconds,"
+            f" {usage[OBJECTS]} live objects (peak {usage['peak_objects']}), call depth {usage[CALL_DEPTH]}"
+        )
+        self.limit = limit
+        self.maximum = maximum
+        self.usage = usage
+
+
+# the counters of one governed run; engines call step() at loop back edges, enter()/leave() around calls and
+# allocate() for each new object
+class Governor:
+    CLOCK_INTERVAL = 1024  # steps between reads of the clock
+
+    def __init__(self, limits):
+        self.limits = limits
+        self.start = time.perf_counter()
+        self.deadline = None if limits.seconds is None else self.start + limits.seconds
+        self.max_steps = float("inf") if limits.steps is None else limits.steps
+        self.max_depth = float("inf") if limits.call_depth is None else limits.call_depth
+        self.max_objects = float("inf") if limits.objects is None else limits.objects
+        self.steps = 0
+        self.next_check = 0  # steps count at which step() next checks the step limit or the clock
+        self.depth = 0
+        self.peak_depth = 0
+        self.objects = 0
+        self.peak_objects = 0
+        self.__schedule_check()
+
+    def step(self):
+        self.steps += 1
+        if self.steps >= self.next_check:
+            self.__check()
+
+    # a method call is starting
+    def enter(self):
+        self.depth += 1
+        if self.depth > self.peak_depth:
+            self.peak_depth = self.depth
+            if self.depth > self.max_depth:
+                self.__exceeded(CALL_DEPTH, self.limits.call_depth)
+        self.step()
+
+    def leave(self):
+        self.depth -= 1
+
+    # returns the object to create for a new Brewin object of class_def
+    def allocate(self, interpreter, class_def, trace_output):
+        if self.objects >= self.max_objects:
+            gc.collect()  # frees objects that only reference cycles kept alive
+            if self.objects >= self.max_objects:
+                self.__exceeded(OBJECTS, self.limits.objects)
+        obj = GovernedObjectDef(interpreter, class_def, trace_output)
+        obj.governor = self
+        self.objects += 1
+        if self.objects > self.peak_objects:
+            self.peak_objects = self.objects
+        return obj
+
+    def release(self):
+        self.objects -= 1
+
+    def usage(self):
+        return {
+            STEPS: self.steps,
+            SECONDS: time.perf_counter() - self.start,
+            OBJECTS: self.objects,
+            "peak_objects": self.peak_objects,
+            CALL_DEPTH: self.peak_depth,
+        }
+
+    def __check(self):
+        if self.steps > self.max_steps:
+            self.__exceeded(STEPS, self.limits.steps)
+        if self.deadline is not None and time.perf_counter() > self.deadline:
+            self.__exceeded(SECONDS, self.limits.seconds)
+        self.__schedule_check()
+
+    def __schedule_check(self):
+        next_check = self.max_steps + 1
+        if self.deadline is not None:
+            next_check = min(next_check, self.steps + Governor.CLOCK_INTERVAL)
+        self.next_check = next_check
+
+    def __exceeded(self, limit, maximum):
+        raise ResourceLimitExceeded(limit, maximum, self.usage())
+
+
+# the objects of a governed run, which tell the governor when they are freed
+class GovernedObjectDef(ObjectDef):
+    __slots__ = ("governor",)
+
+    def __del__(self):
+        governor = getattr(self, "governor", None)  # not set if ObjectDef.__init__ failed
+        if governor is not None:
+            governor.release()
@@ -0,0 +1,214 @@
+"""
+Streaming input sources for inputi and inputs.
+
+    Interpreter(inp=FileInput("data.txt")).run(program)                   # buffered, chunked reads
+    Interpreter(inp=FileInput("data.txt", use_mmap=True, prefetch=4))     # memory mapped, read ahead by a thread
+    Interpreter(inp=IteratorInput(generate_lines())).run(program)
+
+An Interpreter's inp can be a list of lines, as before, or an InputSource, which hands out one line per
+inputi/inputs and reads more only when it runs out, so the input is never held in memory as a whole. Lines
+are returned without their line break. Once the input is exhausted every read returns None, just like reading
+past the end of an inp list.
+
+Sources read lines in batches. With prefetch=N a background thread reads up to N batches ahead of the program.
+
+Interpreter.reset() rewinds its source for the next run: a FileInput reads its file again from the start, and an
+IteratorInput iterates its lines again, unless they are a one-shot iterator (such as a generator or an open
+file), which can't go back and so carries on where it stopped.
+"""
+
+import mmap
+import queue
+import threading
+
+END = None  # marks the end of the batches in a prefetch queue
+
+
+# strips the line break that input() and str.splitlines() drop
+def _strip_line_break(line):
+    if line.endswith("\n"):
+        line = line[:-1]
+        if line.endswith("\r"):
+            line = line[:-1]
+    return line
+
+
+class InputSource:
+    def __init__(self, prefetch=0):
+        self.prefetch = prefetch
+        self.batch = []
+        self.position = 0
+        self.batches = None  # iterator over the lists of lines still to be read; started on the first read
+        self.exhausted = False
+        self.prefetched = None  # queue filled by the prefetch thread
+        self.stopping = None
+        self.reader = None
+
+    # returns the next line, or None at the end of the input
+    def read_line(self):
+        if self.position < len(self.batch):
+            line = self.batch[self.position]
+            self.position += 1
+            return line
+        while not self.exhausted:
+            batch = self.__next_batch()
+            if batch is END:
+                self.exhausted = True
+                self.batch = []
+            elif batch:
+                self.batch = batch
+                self.position = 1
+                return batch[0]
+        return None
+
+    # subclasses yield lists of lines
+    def _read_batches(self):
+        yield from ()
+
+    def __next_batch(self):
+        if self.batches is None and self.prefetched is None:
+            if self.prefetch:
+                self.__start_prefetch()
+            else:
+                self.batches = self._read_batches()
+        if self.prefetched is None:
+            return next(self.batches, END)
+        batch = self.prefetched.get()
+        if isinstance(batch, BaseException):
+            raise batch
+        return batch
+
+    def __start_prefetch(self):
+        self.prefetched = queue.Queue(maxsize=self.prefetch)
+        self.stopping = threading.Event()
+        self.reader = threading.Thread(target=self.__prefetch, name="brewin-input", daemon=True)
+        self.reader.start()
+
+    def __prefetch(self):
+        try:
+            for batch in self._read_batches():
+                if not self.__put(batch):
+                    return
+            self.__put(END)
+        except BaseException as error:  # re-raised in the interpreter's thread by __next_batch
+            self.__put(error)
+
+    # returns False once the source has been closed
+    def __put(self, item):
+        while not self.stopping.is_set():
+            try:
+                self.prefetched.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                pass
+        return False
+
+    def close(self):
+        self.exhausted = True
+        self.batch = []
+        if self.batches is not None:
+            self.batches.close()  # closes the file a generator of batches has open
+        if self.reader is not None:
+            self.stopping.set()
+            self.reader.join()
+            self.reader = None
+
+    # starts reading again from the beginning of the input
+    def rewind(self):
+        self.close()
+        self.batch = []
+        self.position = 0
+        self.batches = None
+        self.exhausted = False
+        self.prefetched = None
+        self.stopping = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+# reads the lines of a file chunk_size bytes at a time, either with buffered reads or through a memory map
+class FileInput(InputSource):
+    def __init__(self, path, encoding="utf-8", chunk_size=1 << 16, use_mmap=False, prefetch=0):
+        super().__init__(prefetch)
+        self.path = path
+        self.encoding = encoding
+        self.chunk_size = chunk_size
+        self.use_mmap = use_mmap
+
+    def _read_batches(self):
+        with open(self.path, "rb") as source:
+            if self.use_mmap:
+                yield from self.__mapped_batches(source)
+            else:
+                yield from self.__buffered_batches(source)
+
+    def __buffered_batches(self, source):
+        partial = b""
+        while True:
+            chunk = source.read(self.chunk_size)
+            if not chunk:
+                break
+            chunk = partial + chunk
+            end = chunk.rfind(b"\n") + 1
+            partial = chunk[end:]
+            if end:
+                yield self.__split(chunk[:end])
+        if partial:
+            yield self.__split(partial)
+
+    def __mapped_batches(self, source):
+        try:
+            mapped = mmap.mmap(source.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:  # empty files can't be mapped
+            return
+        with mapped:
+            start = 0
+            size = len(mapped)
+            while start < size:
+                end = start + self.chunk_size
+                if end >= size:
+                    end = size
+                else:
+                    newline = mapped.rfind(b"\n", start, end)
+                    if newline < 0:  # a line longer than a chunk
+                        newline = mapped.find(b"\n", end)
+                    end = size if newline < 0 else newline + 1
+                yield self.__split(mapped[start:end])
+                start = end
+
+    # chunks hold whole lines, so multi-byte characters are never split between chunks
+    def __split(self, data):
+        text = data.decode(self.encoding)
+        lines = text.split("\n")
+        if lines[-1] == "":
+            lines.pop()
+        if "\r" in text:
+            lines = [line[:-1] if line.endswith("\r") else line for line in lines]
+        return lines
+
+
+# reads lines from any iterable of strings, such as a generator or a file object, batch_size lines at a time
+class IteratorInput(InputSource):
+    def __init__(self, lines, batch_size=1024, prefetch=0):
+        super().__init__(prefetch)
+        self.lines = lines
+        self.batch_size = batch_size
+
+    # a one-shot iterator can't start over, so it just goes on being read
+    def rewind(self):
+        if iter(self.lines) is not self.lines:
+            super().rewind()
+
+    def _read_batches(self):
+        batch = []
+        for line in self.lines:
+            batch.append(_strip_line_break(line))
+            if len(batch) >= self.batch_size:
+                yield batch
+                batch = []
+        if batch:
+            yield batch
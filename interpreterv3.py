@@ -1,20 +1,162 @@
 from classv2 import ClassDef, TemplateClassDef
 from intbase import InterpreterBase, ErrorType
 from bparser import BParser
-from objectv2 import ObjectDef
+from objectv2 import CallSite, ObjectDef, Quickening, TreeEngine
+from closure_engine import ClosureEngine
+from bytecode_engine import BytecodeEngine, StacklessEngine
 from type_valuev2 import TypeManager
+from typechecker import Diagnostic, TypeChecker
+from output_sinks import StdoutSink
+from input_sources import InputSource
+from optimizer import Optimizer
+from governor import Governor
+from program import Program
 
 # need to document that each class has at least one method guaranteed
 
 # Main interpreter class
 class Interpreter(InterpreterBase):
-    def __init__(self, console_output=True, inp=None, trace_output=False):
+    # part of the key of every ProgramCache entry; bump when loading changes in a way the cache can't see
+    VERSION = "3.1"
+
+    # maps the engine= argument to the class that executes method bodies
+    ENGINES = {
+        "tree": TreeEngine,
+        "closure": ClosureEngine,
+        "bytecode": BytecodeEngine,
+        "stackless": StacklessEngine,
+    }
+
+    # program_cache is an optional ProgramCache; a cached program skips parsing and class loading
+    # type_check runs the static TypeChecker before main: the first error it finds is reported before anything
+    # runs, and the runtime type checks it proves redundant are skipped
+    # profiler is an optional Profiler that is told about every method call and allocation
+    # tracer is an optional Tracer that records calls, returns and statements as structured events, while
+    # trace_output prints every statement
+    # output_sink is the OutputSink printed lines are written to; by default they're written to stdout one at a
+    # time if console_output is set. output_log is True to keep every line for get_output(), False to keep none,
+    # or a log object such as RingLog or SpillLog
+    # inp is a list of input lines or an InputSource that reads them lazily
+    # optimize runs the Optimizer (constant folding, dead code removal, loop-invariant hoisting) on the loaded
+    # program before main. it is off by default because the rewritten statements are what trace_output prints
+    # max_call_depth limits how deeply the stackless engine, which doesn't use Python's stack for Brewin calls,
+    # lets calls nest; the other engines are limited by Python's recursion limit
+    # quicken lets the tree walker specialize its arithmetic and comparison operators on the operand types they see
+    # (see QuickOperator); get_quickening_stats() reports how that went
+    # lazy_classes makes load() register only the names and superclasses of the classes, and build each ClassDef
+    # the first time the class is instantiated, looked up or needed as a superclass; a class that is never used
+    # is never built, and the load errors of a class that is used are reported when it is first used. Type
+    # checking and the program cache still build every class
+    def __init__(
+        self,
+        console_output=True,
+        inp=None,
+        trace_output=False,
+        engine="tree",
+        program_cache=None,
+        type_check=False,
+        profiler=None,
+        tracer=None,
+        output_sink=None,
+        output_log=True,
+        max_call_depth=100000,
+        optimize=False,
+        quicken=True,
+        lazy_classes=False,
+    ):
         super().__init__(console_output, inp)
+        if output_sink is None and console_output:
+            output_sink = StdoutSink(batch_lines=1)
+        self.output_sink = output_sink
+        self.input_source = inp if isinstance(inp, InputSource) else None
+        self.output_log_setting = output_log  # what reset() restores
+        if output_log is not True:
+            self.output_log = None if output_log is False else output_log
         self.trace_output = trace_output
+        self.program_cache = program_cache
+        self.type_check = type_check
+        self.profiler = profiler
+        self.tracer = tracer
+        self.tracing = trace_output or tracer is not None  # engines call trace_statement before each statement
+        self.governor = None  # the Governor of the run in progress, if it has limits
+        # calls go through ObjectDef.call_method's observed path, which tells the profiler, tracer and governor
+        self.observing = profiler is not None or tracer is not None
+        self.max_call_depth = max_call_depth
+        self.optimize = optimize
+        self.optimizer = None  # the Optimizer, once run() has started optimizing
+        if engine not in Interpreter.ENGINES:
+            raise ValueError(f"unknown engine {engine}")
+        self.engine_name = engine
+        self.engine = Interpreter.ENGINES[engine](self)
+        self.tree_walking = engine == "tree"  # ObjectDef.call_method then runs method bodies itself
+        self.call_sites = {}  # (line number, method name) -> CallSite
+        self.quicken = quicken
+        self.quickening = Quickening()  # of the loaded code; load() and run(Program) replace it
+        self.lazy_classes = lazy_classes
+        self.unloaded_classes = {}  # class name -> source of each class lazy loading hasn't built yet
+        self.class_positions = {}  # class name -> index among the program's classes, with lazy loading
+        self.classes_being_loaded = []  # positions of the classes being built lazily, innermost last
+
+    # InterpreterBase.reset starts a new list for the output log; this keeps the log that was configured instead,
+    # emptied (with its clear(), if it has one), or none for output_log=False. like the cursor into an inp list,
+    # an InputSource is rewound
+    def reset(self):
+        super().reset()
+        if self.output_log_setting is False:
+            self.output_log = None
+        elif self.output_log_setting is not True:
+            self.output_log = self.output_log_setting
+            if hasattr(self.output_log, "clear"):
+                self.output_log.clear()
+        if self.input_source is not None:
+            self.input_source.rewind()
 
     # run a program, provided in an array of strings, one string per line of source code
     # usese the provided BParser class found in parser.py to parse the program into lists
-    def run(self, program):
+    # program can also be a Program, which has been loaded (and checked and optimized) already
+    # limits is an optional ResourceLimits; a run that exceeds one raises ResourceLimitExceeded
+    def run(self, program, limits=None):
+        self.governor = None if limits is None else Governor(limits)
+        self.observing = self.profiler is not None or self.tracer is not None or self.governor is not None
+        if isinstance(program, Program):
+            self.__adopt(program)
+        else:
+            self.load(program)
+            if self.type_check:
+                self.check_types()
+            if self.optimize:
+                self.optimize_program()
+
+        if self.profiler is not None:
+            self.profiler.start()
+        try:
+            # instantiate main class
+            invalid_line_num_of_caller = None
+            self.main_object = self.instantiate(
+                InterpreterBase.MAIN_CLASS_DEF, invalid_line_num_of_caller
+            )
+
+            # call main function in main class; return value is ignored from main
+            self.main_object.call_method(
+                InterpreterBase.MAIN_FUNC_DEF, [], False, invalid_line_num_of_caller
+            )
+        finally:
+            if self.profiler is not None:
+                self.profiler.stop()
+            if self.tracer is not None:
+                self.tracer.finish()
+            if self.output_sink is not None:
+                self.output_sink.flush()
+
+        # program terminates!
+
+    # parse a program and build its types and class definitions without running it
+    def load(self, program):
+        self.unloaded_classes = {}
+        self.class_positions = {}
+        self.quickening = Quickening()  # the code about to be parsed or unpickled is unquickened
+        if self.program_cache is not None and self.program_cache.load(program, self):
+            return
         status, parsed_program = BParser.parse(program)
         if not status:
             super().error(
@@ -23,45 +165,179 @@ class Interpreter(InterpreterBase):
         self.__add_all_class_types_to_type_manager(parsed_program)
         self.__map_template_class_names_to_template_class_defs(parsed_program)
         self.__map_class_names_to_class_defs(parsed_program)
-
-        # instantiate main class
-        invalid_line_num_of_caller = None
-        self.main_object = self.instantiate(
-            InterpreterBase.MAIN_CLASS_DEF, invalid_line_num_of_caller
-        )
-
-        # call main function in main class; return value is ignored from main
-        self.main_object.call_method(
-            InterpreterBase.MAIN_FUNC_DEF, [], False, invalid_line_num_of_caller
-        )
-
-        # program terminates!
+        if self.program_cache is not None:
+            self.load_all_classes()  # an image holds every class
+            self.program_cache.store(program, self)
+
+    # builds every class lazy loading hasn't built yet, in source order, reporting the first load error
+    def load_all_classes(self):
+        for class_name in list(self.unloaded_classes):
+            if class_name in self.unloaded_classes:
+                self.__load_class(class_name)
+
+    # takes over the loaded program of a Program, reporting its load error if it has one
+    def __adopt(self, program):
+        self.quickening = program.quickening
+        if program.error is not None:
+            super().error(*program.error)
+        self.type_manager = program.type_manager
+        self.template_class_index = program.template_class_index
+        self.class_index = program.class_index
+        self.optimizer = program.optimizer
+        self.unloaded_classes = {}
+        self.class_positions = {}
+
+    # runs the Optimizer over the loaded program; classes instantiated from templates later are optimized as
+    # they are built
+    def optimize_program(self):
+        self.optimizer = Optimizer(self)
+        self.optimizer.optimize_program()
+
+    # statically type checks the loaded program, reporting the first error found; if there is none, the
+    # engines skip the runtime checks the checker proved redundant
+    def check_types(self):
+        self.load_all_classes()
+        checker = TypeChecker(self)
+        diagnostics = checker.check()
+        if diagnostics:
+            super().error(diagnostics[0].error_type, diagnostics[0].description, diagnostics[0].line_num)
+        checker.install()
+
+    # returns the description of an error raised by error(), e.g. "unknown method foo" from
+    # "ErrorType.NAME_ERROR on line 3: unknown method foo"; "" if it was raised without one
+    @staticmethod
+    def error_description(error):
+        message = str(error)
+        return message.split(": ", 1)[1] if ": " in message else ""
+
+    # validate-only mode: loads and type checks a program without running it. Returns the list of Diagnostics,
+    # which is empty if the program passed; syntax and class-loading errors are returned as a single Diagnostic
+    def validate(self, program):
+        try:
+            self.load(program)
+            self.load_all_classes()
+        except RuntimeError as error:
+            return [Diagnostic(self.error_type, self.error_description(error), self.error_line)]
+        return TypeChecker(self).check()
 
     # user passes in the line number of the statement that performed the new command so we can generate an error
     # if the user tries to new an class name that does not exist. This will report the line number of the statement
     # with the new command
     def instantiate(self, class_name, line_num_of_statement):
-        if class_name not in self.class_index:
-            super().error(
-                ErrorType.TYPE_ERROR,
-                f"No class named {class_name} found",
-                line_num_of_statement,
-            )
-        class_def = self.class_index[class_name]
+        class_def = self.class_index.get(class_name)
+        if class_def is None:
+            class_def = self.__find_class(class_name, line_num_of_statement)
+        if self.profiler is not None:
+            self.profiler.allocation(class_name)
+        if self.governor is not None:
+            return self.governor.allocate(self, class_def, self.tracing)
         obj = ObjectDef(
-            self, class_def, None, self.trace_output
+            self, class_def, self.tracing
         )  # Create an object based on this class definition
         return obj
 
+    # called by every engine before it runs a statement of obj while tracing is on
+    def trace_statement(self, obj, code):
+        if self.trace_output:
+            print(f"{code[0].line_num}: {code}")
+        if self.tracer is not None:
+            self.tracer.statement(obj, code)
+
+    # replaces InterpreterBase.output: lines go to the output sink and the output log, either of which may be off
+    def output(self, val):
+        if self.output_sink is not None:
+            self.output_sink.write(val)
+        if self.output_log is not None:
+            self.output_log.append(val)
+
+    def get_output(self):
+        if self.output_log is None:
+            return []
+        if type(self.output_log) is list:
+            return self.output_log
+        return list(self.output_log)
+
+    # batched output must be on screen before the program waits for the keyboard
+    def get_input(self):
+        if self.input_source is not None:
+            return self.input_source.read_line()
+        if not self.inp and self.output_sink is not None:
+            self.output_sink.flush()
+        return super().get_input()
+
+    # returns the CallSite (inline method cache) for calls of method_name made by the statement on line_num
+    def get_call_site(self, line_num, method_name):
+        key = (line_num, method_name)
+        call_site = self.call_sites.get(key)
+        if call_site is None:
+            call_site = CallSite(line_num, method_name)
+            self.call_sites[key] = call_site
+        return call_site
+
+    # hit/miss counts and polymorphism of every call site used so far, most misses first
+    def get_call_site_stats(self):
+        stats = [call_site.get_stats() for call_site in self.call_sites.values()]
+        stats.sort(key=lambda site: (-site["misses"], -site["hits"], str(site["line"]), site["method"]))
+        return stats
+
+    # specializations and deoptimizations of the tree walker's quickened operators, plus the hits and state of each
+    # operator, most hits first. the counts belong to the loaded code, so for a Program they cover every run of it
+    # so far, whichever interpreter made them
+    def get_quickening_stats(self):
+        return self.quickening.get_stats()
+
+    # steps, seconds, live and peak objects, and call depth of the last run made with limits, or None
+    def get_resource_usage(self):
+        if self.governor is None:
+            return None
+        return self.governor.usage()
+
     # returns a ClassDef object
     def get_class_def(self, class_name, line_number_of_statement):
-        if class_name not in self.class_index:
+        class_def = self.class_index.get(class_name)
+        if class_def is None or self.classes_being_loaded:
+            class_def = self.__find_class(class_name, line_number_of_statement)
+        return class_def
+
+    # returns a bool: whether class_name names a class (or a template instance) that fields and locals can have
+    # as their type, whether or not lazy loading has built it
+    def is_class_name(self, class_name):
+        return (class_name in self.class_index or class_name in self.unloaded_classes) and self.__visible(class_name)
+
+    # returns the ClassDef named class_name, building it if lazy loading hasn't yet
+    def __find_class(self, class_name, line_num):
+        class_def = None
+        if self.__visible(class_name):
+            class_def = self.class_index.get(class_name)
+            if class_def is None and class_name in self.unloaded_classes:
+                class_def = self.__load_class(class_name)
+        if class_def is None:
             super().error(
                 ErrorType.TYPE_ERROR,
                 f"No class named {class_name} found",
-                line_number_of_statement,
+                line_num,
             )
-        return self.class_index[class_name]
+        return class_def
+
+    # while a class is being built lazily, it can only see the classes declared before it, just as when every
+    # class is built at load time in source order
+    def __visible(self, class_name):
+        if not self.classes_being_loaded:
+            return True
+        position = self.class_positions.get(class_name)
+        return position is None or position < self.classes_being_loaded[-1]
+
+    def __load_class(self, class_name):
+        class_source = self.unloaded_classes.pop(class_name)
+        self.classes_being_loaded.append(self.class_positions[class_name])
+        try:
+            class_def = ClassDef(class_source, self)
+        finally:
+            self.classes_being_loaded.pop()
+        self.class_index[class_name] = class_def
+        if self.optimizer is not None:  # built while the program runs
+            self.optimizer.optimize_class(class_def)
+        return class_def
 
     # returns a bool
     def is_valid_type(self, typename):
@@ -81,13 +357,17 @@ class Interpreter(InterpreterBase):
         self.class_index = {}
         for item in program:
             if item[0] == InterpreterBase.CLASS_DEF:
-                if item[1] in self.class_index:
+                if item[1] in self.class_index or item[1] in self.unloaded_classes:
                     super().error(
                         ErrorType.TYPE_ERROR,
                         f"Duplicate class name {item[1]}",
                         item[0].line_num,
                     )
-                self.class_index[item[1]] = ClassDef(item, self)
+                if self.lazy_classes:
+                    self.class_positions[item[1]] = len(self.class_positions)
+                    self.unloaded_classes[item[1]] = item
+                else:
+                    self.class_index[item[1]] = ClassDef(item, self)
 
     def __map_template_class_names_to_template_class_defs(self, program):
         self.template_class_index = {}
@@ -1,128 +1,343 @@
-from classv2 import VariableDef,ClassDef
-import copy
+import operator
+
+from bparser import StringWithLineNumber
+from classv2 import VariableDef
 from env_v2 import EnvironmentManager
+from frames import SlotEnvironment, resolve
 from intbase import InterpreterBase, ErrorType
 from type_valuev2 import create_value, create_default_value
-from type_valuev2 import Type, Value
+from type_valuev2 import Type, Value, BOOL_TYPE, INT_TYPE, STRING_TYPE, concatenate, flatten
+
+
+# a Brewin exception on its way to the nearest (try ...): raised by (throw expression), value is the thrown Value
+class BrewinException(Exception):
+    def __init__(self, value):
+        super().__init__(value)
+        self.value = value
+
+
+# (operator, operand type) -> (function of the operands' Python values, result type) for the operations a
+# QuickOperator can specialize on; anything else (e.g. comparing object references) stays on the generic path
+QUICK_OPERATIONS = {}
+for _name, _function in (("+", operator.add), ("-", operator.sub), ("*", operator.mul), ("/", operator.floordiv),
+                         ("%", operator.mod)):
+    QUICK_OPERATIONS[_name, INT_TYPE] = (_function, INT_TYPE)
+for _name, _function in (("==", operator.eq), ("!=", operator.ne), ("<", operator.lt), ("<=", operator.le),
+                         (">", operator.gt), (">=", operator.ge)):
+    QUICK_OPERATIONS[_name, INT_TYPE] = (_function, BOOL_TYPE)
+    QUICK_OPERATIONS[_name, STRING_TYPE] = (_function, BOOL_TYPE)
+QUICK_OPERATIONS["+", STRING_TYPE] = (concatenate, STRING_TYPE)
+for _name, _function in (("==", operator.eq), ("!=", operator.ne), ("&", lambda a, b: a and b),
+                         ("|", lambda a, b: a or b), ("!", operator.not_)):
+    QUICK_OPERATIONS[_name, BOOL_TYPE] = (_function, BOOL_TYPE)
+
+
+# an operator token of a parsed expression that the walker has quickened: the first time the expression is
+# evaluated its operator token is replaced by a QuickOperator guarding on the type of the operands, and while the
+# operands keep that type the walker computes the result straight from their Python values. an operand of another
+# type deoptimizes the operator, which re-specializes on the new type until it has been deoptimized
+# MAX_DEOPTIMIZATIONS times and then stays generic. a QuickOperator is equal to the token it replaced, so other
+# engines, the trace output and the type checker see the same code, and it pickles back to a plain token
+class QuickOperator(StringWithLineNumber):
+    MAX_DEOPTIMIZATIONS = 4
+
+    def __new__(cls, token, arity, operand_type):
+        quick = super().__new__(cls, token, token.line_num)
+        quick.arity = arity
+        quick.guard = None  # the operand type the operator is specialized on; None while generic
+        quick.function = None
+        quick.result_type = None
+        quick.hits = 0
+        quick.deoptimizations = 0
+        quick.specialize(operand_type)
+        return quick
+
+    # returns False, leaving the operator as it was, if there is no specialization for operand_type
+    def specialize(self, operand_type):
+        specialization = QUICK_OPERATIONS.get((str(self), operand_type))
+        if specialization is None:
+            return False
+        self.guard = operand_type
+        self.function, self.result_type = specialization
+        return True
+
+    def state(self):
+        if self.guard is not None:
+            return "specialized"
+        if self.deoptimizations >= QuickOperator.MAX_DEOPTIMIZATIONS:
+            return "deoptimized"
+        return "generic"
+
+    def get_stats(self):
+        return {
+            "line": self.line_num,
+            "operator": str(self),
+            "type": None if self.guard is None else self.guard.type_name,
+            "hits": self.hits,
+            "deoptimizations": self.deoptimizations,
+            "state": self.state(),
+        }
+
+
+# the QuickOperators the tree walker has put into one loaded copy of a program's code, and the specializations and
+# deoptimizations they have made. it is kept with the code rather than with an interpreter: every interpreter that
+# runs the code (e.g. the runs of a Program) quickens the same operators, so each run counts into the same record
+class Quickening:
+    def __init__(self):
+        self.operators = []
+        self.specializations = 0
+        self.deoptimizations = 0
+
+    def get_stats(self):
+        operators = [quick.get_stats() for quick in self.operators]
+        operators.sort(key=lambda site: (-site["hits"], str(site["line"]), site["operator"]))
+        return {
+            "specializations": self.specializations,
+            "deoptimizations": self.deoptimizations,
+            "hits": sum(site["hits"] for site in operators),
+            "operators": operators,
+        }
 
 
 class ObjectDef:
-    # statement execution results
+    # (status, value) results of methods and of the _execute_statement/_evaluate_expression entry points
     STATUS_PROCEED = 0
     STATUS_RETURN = 1
     STATUS_ERROR = 2
 
+    # what the walker's statements return for (return) with no expression; other statements return None unless
+    # they executed a return, in which case they return the returned Value
+    EMPTY_RETURN = object()
+
     # type constants
     INT_TYPE_CONST = Type(InterpreterBase.INT_DEF)
     STRING_TYPE_CONST = Type(InterpreterBase.STRING_DEF)
     BOOL_TYPE_CONST = Type(InterpreterBase.BOOL_DEF)
 
+    # maps to facilitate binary and unary operations, e.g., (+ 5 6); shared by all objects
+    binary_op_list = [
+        "+",
+        "-",
+        "*",
+        "/",
+        "%",
+        "==",
+        "!=",
+        "<",
+        "<=",
+        ">",
+        ">=",
+        "&",
+        "|",
+    ]
+    unary_op_list = ["!"]
+    binary_ops = {}
+    binary_ops[InterpreterBase.INT_DEF] = {
+        "+": lambda a, b: Value(ObjectDef.INT_TYPE_CONST, a.value() + b.value()),
+        "-": lambda a, b: Value(ObjectDef.INT_TYPE_CONST, a.value() - b.value()),
+        "*": lambda a, b: Value(ObjectDef.INT_TYPE_CONST, a.value() * b.value()),
+        "/": lambda a, b: Value(
+            ObjectDef.INT_TYPE_CONST, a.value() // b.value()
+        ),  # // for integer ops
+        "%": lambda a, b: Value(ObjectDef.INT_TYPE_CONST, a.value() % b.value()),
+        "==": lambda a, b: Value(ObjectDef.BOOL_TYPE_CONST, a.value() == b.value()),
+        "!=": lambda a, b: Value(ObjectDef.BOOL_TYPE_CONST, a.value() != b.value()),
+        ">": lambda a, b: Value(ObjectDef.BOOL_TYPE_CONST, a.value() > b.value()),
+        "<": lambda a, b: Value(ObjectDef.BOOL_TYPE_CONST, a.value() < b.value()),
+        ">=": lambda a, b: Value(ObjectDef.BOOL_TYPE_CONST, a.value() >= b.value()),
+        "<=": lambda a, b: Value(ObjectDef.BOOL_TYPE_CONST, a.value() <= b.value()),
+    }
+    binary_ops[InterpreterBase.STRING_DEF] = {
+        "+": lambda a, b: Value(ObjectDef.STRING_TYPE_CONST, concatenate(a.value(), b.value())),
+        "==": lambda a, b: Value(ObjectDef.BOOL_TYPE_CONST, a.value() == b.value()),
+        "!=": lambda a, b: Value(ObjectDef.BOOL_TYPE_CONST, a.value() != b.value()),
+        ">": lambda a, b: Value(ObjectDef.BOOL_TYPE_CONST, a.value() > b.value()),
+        "<": lambda a, b: Value(ObjectDef.BOOL_TYPE_CONST, a.value() < b.value()),
+        ">=": lambda a, b: Value(ObjectDef.BOOL_TYPE_CONST, a.value() >= b.value()),
+        "<=": lambda a, b: Value(ObjectDef.BOOL_TYPE_CONST, a.value() <= b.value()),
+    }
+    binary_ops[InterpreterBase.BOOL_DEF] = {
+        "&": lambda a, b: Value(ObjectDef.BOOL_TYPE_CONST, a.value() and b.value()),
+        "|": lambda a, b: Value(ObjectDef.BOOL_TYPE_CONST, a.value() or b.value()),
+        "==": lambda a, b: Value(ObjectDef.BOOL_TYPE_CONST, a.value() == b.value()),
+        "!=": lambda a, b: Value(ObjectDef.BOOL_TYPE_CONST, a.value() != b.value()),
+    }
+    binary_ops[InterpreterBase.CLASS_DEF] = {
+        "==": lambda a, b: Value(ObjectDef.BOOL_TYPE_CONST, a.value() == b.value()),
+        "!=": lambda a, b: Value(ObjectDef.BOOL_TYPE_CONST, a.value() != b.value()),
+    }
+
+    unary_ops = {}
+    unary_ops[InterpreterBase.BOOL_DEF] = {
+        "!": lambda a: Value(ObjectDef.BOOL_TYPE_CONST, not a.value()),
+    }
+
+    # an object is a single instance covering its whole inheritance chain: the fields of every class in the chain
+    # live in one list of slots, laid out by the ClassDef (see ClassDef.field_index). methods, operators and field
+    # layouts are shared by all objects of a class
+    __slots__ = ("interpreter", "class_def", "trace_output", "slots", "called_throw")
+
     # class_def is a ClassDef object
-    def __init__(self, interpreter, class_def, anchor_object=None, trace_output=False):
+    def __init__(self, interpreter, class_def, trace_output=False):
         self.interpreter = interpreter  # objref to interpreter object. used to report errors, get input, produce output
         self.class_def = class_def
-
-        if anchor_object is None:
-            self.anchor_object = self
-        else:
-            self.anchor_object = anchor_object
         self.trace_output = trace_output
-        self.__instantiate_fields()
-        self.__map_method_names_to_method_definitions()
-        self.__create_map_of_operations_to_lambdas()  # sets up maps to facilitate binary and unary operations, e.g., (+ 5 6)
-        self.__init_superclass_if_any()  # construct default values for superclass fields all the way to the base class
-
-    def __get_obj_with_method(self, start_obj, method_name, actual_params):
-        cur_obj = start_obj
-        while cur_obj is not None:
-            if method_name not in cur_obj.methods:
-                cur_obj = cur_obj.super_object
-                continue
-            method_def = cur_obj.methods[method_name]
-            if len(actual_params) == len(
-                method_def.formal_params
-            ) and self.__compatible_param_types(
-                actual_params, method_def.formal_params
-            ):
-                break
-
-            cur_obj = cur_obj.super_object
-
-        return cur_obj
+        self.slots = list(class_def.slot_defaults)  # default values for the fields of all classes in the chain
 
     # actual_params is a list of Value objects; all parameters are passed by value
     # the caller passes in its line number so if there's an error (e.g., mismatched # of parameters or unknown
     # method name) we can generate an error at the source (where the call is initiated) for better context
-    def call_method(self, method_name, actual_params, super_only, line_num_of_caller):
-        # check to see if we have a method in this class or its base class(es) matching this signature
-        if self.__get_obj_with_method(self, method_name, actual_params) is None:
-            self.interpreter.error(
-                ErrorType.NAME_ERROR,
-                "unknown method " + method_name,
-                line_num_of_caller,
-            )
+    # call_site is the CallSite of the calling code, if any; it caches the method resolved for each combination
+    # of classes and argument types seen there
+    # class_def is the class the method search starts from: the class of the calling method for calls on me, its
+    # superclass for calls on super, and the object's own class (the default) for calls through a reference
+    def call_method(self, method_name, actual_params, super_only, line_num_of_caller, call_site=None, class_def=None):
+        method_def, env = self._prepare_call(
+            method_name, actual_params, super_only, line_num_of_caller, call_site, class_def
+        )
+        interpreter = self.interpreter
+        observing = interpreter.observing
+        if observing:
+            self.__enter_observed(method_def, actual_params, line_num_of_caller)
+        status = return_value = None
+        try:
+            # since each method has a single top-level statement, execute it. the tree walker's is run right here
+            # rather than through TreeEngine.execute_method, so that a Brewin call costs no more Python frames
+            # (and so no more of Python's recursion limit) than it must
+            if interpreter.tree_walking:
+                try:
+                    result = self.__execute_statement(env, method_def.return_type, method_def.code)
+                except BrewinException as exception:
+                    status, return_value = ObjectDef.STATUS_ERROR, exception.value
+                else:
+                    if result is None:
+                        status = ObjectDef.STATUS_PROCEED
+                    elif result is ObjectDef.EMPTY_RETURN:
+                        status = ObjectDef.STATUS_RETURN
+                    else:
+                        status, return_value = ObjectDef.STATUS_RETURN, result
+            else:
+                status, return_value = interpreter.engine.execute_method(self, env, method_def)
+        finally:
+            if observing:
+                self.__exit_observed(status, return_value)
+        # if the method explicitly used the (return expression) statement to return a value, then return that
+        # value back to the caller
+        if status == ObjectDef.STATUS_ERROR or (status == ObjectDef.STATUS_RETURN and return_value is not None):
+            return status, return_value
+        # The method didn't explicitly return a value, so return the default return type for the method
+        return status, create_default_value(method_def.get_return_type())
 
-        # Yes, we have a method with the right name/parameters known to this class or its base classes...
-        # So now find the proper version of the method in the most-derived class, which may be in a derived class
-        # of this class!  Start from the anchor object (most derived part of the object) and search for the most
-        # derived object part that has this method.
+    # resolves the method a call runs and binds its parameters; returns (method_def, env). Engines that run
+    # calls without call_method (the stackless engine's heap frames) start from here
+    def _prepare_call(self, method_name, actual_params, super_only, line_num_of_caller, call_site, class_def):
+        start_class = self.class_def if class_def is None else class_def
+        # the most derived version of the method is found starting from the object's own class, which may be a
+        # derived class of start_class! super calls only look at start_class and its superclasses
         if super_only:
-            anchor = self
+            anchor_class = start_class
         else:
-            anchor = self.anchor_object
-        obj_to_call_on = self.__get_obj_with_method(anchor, method_name, actual_params)
-
-        method_def = obj_to_call_on.methods[method_name]
-
-        # handle the call in the object
-        env = (
-            EnvironmentManager()
-        )  # maintains lexical environment for function; just params for now
+            anchor_class = self.class_def
+        arg_types = tuple(actual.t for actual in actual_params)
+        if call_site is None:
+            method_def = self.__resolve_method(start_class, anchor_class, method_name, arg_types, line_num_of_caller)
+        else:
+            key = (start_class, anchor_class, arg_types)
+            method_def = call_site.lookup(key, self.interpreter.type_manager.generation)
+            if method_def is None:
+                method_def = self.__resolve_method(
+                    start_class, anchor_class, method_name, arg_types, line_num_of_caller
+                )
+                call_site.store(key, method_def)
+
+        # handle the call in the object. the tree walker keeps params and locals in frame slots (see frames.py)
+        if self.interpreter.tree_walking:
+            layout = method_def.frame_layout
+            if layout is None or layout.code is not method_def.code:
+                layout = method_def.frame_layout = resolve(method_def)
+            if layout.regular:
+                env = SlotEnvironment(method_def.class_def, layout)
+            else:
+                env = EnvironmentManager(method_def.class_def)
+        else:
+            env = EnvironmentManager(
+                method_def.class_def
+            )  # maintains lexical environment for function; just params for now
         for formal, actual in zip(method_def.formal_params, actual_params):
-            formal_copy = copy.copy(formal)  # VariableDef obj.
-            formal_copy.set_value(actual)  # actual is a Value obj.
-            if not env.create_new_symbol(formal_copy.name):
+            if not env.create_new_symbol(formal.name):
                 self.interpreter.error(
                     ErrorType.NAME_ERROR,
                     "duplicate formal param name " + formal.name,
                     method_def.line_num,
                 )
-            env.set(formal_copy.name, formal_copy)
-        # since each method has a single top-level statement, execute it.
-        status, return_value = obj_to_call_on.__execute_statement(
-            env, method_def.return_type, method_def.code
-        )
-        # if the method explicitly used the (return expression) statement to return a value, then return that
-        # value back to the caller
-        if status == ObjectDef.STATUS_ERROR or (status == ObjectDef.STATUS_RETURN and return_value is not None):
-            return status, return_value
-        # The method didn't explicitly return a value, so return the default return type for the method
-        return status, create_default_value(method_def.get_return_type())
+            env.set(formal.name, VariableDef(formal.type, formal.name, actual))  # actual is a Value obj.
+        return method_def, env
+
+    # tells the profiler, tracer and governor that call_method is starting to run method_def
+    def __enter_observed(self, method_def, actual_params, line_num_of_caller):
+        interpreter = self.interpreter
+        if interpreter.governor is not None:
+            interpreter.governor.enter()
+        if interpreter.profiler is not None:
+            interpreter.profiler.enter(method_def, line_num_of_caller)
+        if interpreter.tracer is not None:
+            interpreter.tracer.enter(self, method_def, actual_params, line_num_of_caller)
+
+    # tells them that the method finished (status is None if it ended with a Python exception)
+    def __exit_observed(self, status, return_value):
+        interpreter = self.interpreter
+        if interpreter.tracer is not None:
+            interpreter.tracer.exit(status, return_value)
+        if interpreter.profiler is not None:
+            interpreter.profiler.exit()
+        if interpreter.governor is not None:
+            interpreter.governor.leave()
+
+    # returns the MethodDef to run for a call
+    def __resolve_method(self, start_class, anchor_class, method_name, arg_types, line_num_of_caller):
+        # check to see if we have a method in this class or its base class(es) matching this signature
+        method_def = start_class.find_method(method_name, arg_types)
+        if method_def is None:
+            self.interpreter.error(
+                ErrorType.NAME_ERROR,
+                "unknown method " + method_name,
+                line_num_of_caller,
+            )
+        if anchor_class is not start_class:
+            method_def = anchor_class.find_method(method_name, arg_types)
+        return method_def
 
     # def get_me_as_value(self):
     #     return Value(Type(self.class_def.name), self)
 
     def get_me_as_value(self):
-        anchor = self.anchor_object
-        return Value(Type(anchor.class_def.name), anchor)
-
-    # checks whether each formal parameter has a compatible type with the actual parameter
-    def __compatible_param_types(self, actual_params, formal_params):
-        for formal, actual in zip(formal_params, actual_params):
-            if not self.interpreter.check_type_compatibility(
-                formal.type, actual.type(), True
-            ):
-                return False
-        return True
+        return Value(Type(self.class_def.name), self)
+
+    # entry points for the engines (including TreeEngine for method bodies): they report results as (status, value)
+    # pairs, with a Brewin exception that escapes the code as (STATUS_ERROR, thrown value)
+    def _execute_statement(self, env, return_type, code):
+        try:
+            result = self.__execute_statement(env, return_type, code)
+        except BrewinException as exception:
+            return ObjectDef.STATUS_ERROR, exception.value
+        if result is None:
+            return ObjectDef.STATUS_PROCEED, None
+        if result is ObjectDef.EMPTY_RETURN:
+            return ObjectDef.STATUS_RETURN, None
+        return ObjectDef.STATUS_RETURN, result
+
+    def _evaluate_expression(self, env, expr, line_num_of_statement):
+        try:
+            return ObjectDef.STATUS_PROCEED, self.__evaluate_expression(env, expr, line_num_of_statement)
+        except BrewinException as exception:
+            return ObjectDef.STATUS_ERROR, exception.value
 
-    # returns (status_code, return_value) where:
-    # - status_code indicates whether the statement (or one of its sub-statements) executed a return command and thus
-    #   the current method needs to terminate immediately, or whether the statement simply ran but didn't execute a
-    #   return statement, and thus the next statement in the method should run normally
-    # - return value is a value of type Value which is the returned value from the function
+    # returns None if the statement ran to completion, or, if it (or one of its sub-statements) executed a return
+    # command and thus the current method needs to terminate immediately, the returned Value (EMPTY_RETURN for a
+    # return without a value). a throw raises BrewinException, which unwinds to the nearest try
     def __execute_statement(self, env, return_type, code):
         if self.trace_output:
-            print(f"{code[0].line_num}: {code}")
+            self.interpreter.trace_statement(self, code)
              
         tok = code[0]
         if tok == InterpreterBase.BEGIN_DEF:
@@ -149,10 +364,10 @@ class ObjectDef:
             return self.__execute_try(env, return_type, code)
         elif tok == InterpreterBase.THROW_DEF:
             self.called_throw = True
-            _, exception = self.__evaluate_expression(env, code[1], code[0].line_num)
-            if exception.type() != ObjectDef.STRING_TYPE_CONST:
+            exception = self.__evaluate_expression(env, code[1], code[0].line_num)
+            if exception.type() is not ObjectDef.STRING_TYPE_CONST:
                 self.interpreter.error(ErrorType.TYPE_ERROR, "exception is not a string", code[0].line_num)
-            return ObjectDef.STATUS_ERROR, exception
+            raise BrewinException(Value(ObjectDef.STRING_TYPE_CONST, flatten(exception.value())))
         else:
             # Report error via interpreter
             self.interpreter.error(
@@ -166,112 +381,78 @@ class ObjectDef:
         if has_vardef: #handles the let case
             code_start = 2
             env.block_nest()
-            self.__add_locals_to_env(env, code[1], code[0].line_num)
+            self._add_locals_to_env(env, code[1], code[0].line_num)
         else: #handles the begin case
             code_start = 1
 
-        status = ObjectDef.STATUS_PROCEED
-        return_value = None
-        for statement in code[code_start:]:
-            status, return_value = self.__execute_statement(env, return_type, statement)
-            if status == ObjectDef.STATUS_RETURN or status == ObjectDef.STATUS_ERROR:
-                break
-        # if we run through the entire block without a return, then just return proceed
-        # we don't want the enclosing block to exit with a return
+        result = None
         if has_vardef:
+            # the let's block goes away on a return or a throw too (but not on an interpreter error)
+            try:
+                for statement in code[code_start:]:
+                    result = self.__execute_statement(env, return_type, statement)
+                    if result is not None:
+                        break
+            except BrewinException:
+                env.block_unnest()
+                raise
             env.block_unnest()
-        return status, return_value  # could be a valid return of a value or an error
+            return result
+        for statement in code[code_start:]:
+            result = self.__execute_statement(env, return_type, statement)
+            if result is not None:
+                return result
+        return None
 
     # add all local variables defined in a let to the environment
-    def __add_locals_to_env(self, env, var_defs, line_number):
+    def _add_locals_to_env(self, env, var_defs, line_number):
         for var_def in var_defs:
-            already_called = False
-            # vardef in the form of (typename varname defvalue)
-            if len(var_def) == 2:
-                if var_def[0] == 'int':
-                    var_def.append('0')
-                elif var_def[0] == 'bool':
-                    var_def.append('false')
-                elif var_def[0] == 'string':
-                    var_def.append('""')
-                elif var_def[0] in self.interpreter.class_index.keys():
-                    var_def.append('null')
-                elif '@' in var_def[0]:
-                    self._create_template_class(var_def[0])
-                    already_called = True
-                    var_def.append('null')
-                else:
-                    self.interpreter.error(ErrorType.TYPE_ERROR, 'invalid field type')
-
-            if '@' in var_def[0] and already_called == False:
-                self._create_template_class(var_def[0])
-
-            var_type = Type(var_def[0])
-            var_name = var_def[1]
-            default_value = create_value(var_def[2])
-            # make sure default value for each local is of a matching type
-            self.__check_type_compatibility(
-                var_type, default_value.type(), True, line_number
-            )
-            if not env.create_new_symbol(var_name):
+            var_def = self._create_local(var_def, line_number)
+            if not env.create_new_symbol(var_def.name):
                 self.interpreter.error(
                     ErrorType.NAME_ERROR,
-                    "duplicate local variable name " + var_name,
+                    "duplicate local variable name " + var_def.name,
                     line_number,
                 )
-            var_def = VariableDef(var_type, var_name, default_value)
-            env.set(var_name, var_def)
+            env.set(var_def.name, var_def)
+
+    # returns a VariableDef for a let declaration, with its default value if none was given
+    def _create_local(self, var_def, line_number):
+        already_called = False
+        # vardef in the form of (typename varname defvalue)
+        if len(var_def) == 2:
+            if var_def[0] == 'int':
+                var_def.append('0')
+            elif var_def[0] == 'bool':
+                var_def.append('false')
+            elif var_def[0] == 'string':
+                var_def.append('""')
+            elif self.interpreter.is_class_name(var_def[0]):
+                var_def.append('null')
+            elif '@' in var_def[0]:
+                self._create_template_class(var_def[0])
+                already_called = True
+                var_def.append('null')
+            else:
+                self.interpreter.error(ErrorType.TYPE_ERROR, 'invalid field type')
+
+        if '@' in var_def[0] and already_called == False:
+            self._create_template_class(var_def[0])
+
+        var_type = Type(var_def[0])
+        var_name = var_def[1]
+        default_value = create_value(var_def[2])
+        # make sure default value for each local is of a matching type
+        self.__check_type_compatibility(
+            var_type, default_value.type(), True, line_number
+        )
+        return VariableDef(var_type, var_name, default_value)
 
 
+    # builds (at most once) the class for a concrete template type such as node@int
     def _create_template_class(self, templated_class):
-        og = templated_class
-        templated_class = templated_class.split('@')
-        template_class_name = templated_class[0]
-        parametrized_types = templated_class[1:]
-        param_mapped_to_real_type = {}
-        #self.interpreter.template_class_index[template_class_name].parametrized_types = templated_class[1:] 
-        for field in self.interpreter.template_class_index[template_class_name].template_fields:
-            if field != 'int' and field != 'string' and field != 'bool' and field not in self.interpreter.template_class_index[template_class_name].parametrized_types:
-                if '@' in field and field.split('@')[0] != template_class_name:
-                    self.interpreter.error(ErrorType.TYPE_ERROR, "invalid type/type mismatch with field " + field)
-
-        template_class_source_og = self.interpreter.template_class_index[template_class_name].class_source
-        template_class_source = copy.deepcopy(template_class_source_og)
-
-        if len(parametrized_types) != len(template_class_source[2]):
-            self.interpreter.error(ErrorType.TYPE_ERROR, "incorrect number of parameters")
-        for i in range(len(parametrized_types)):
-            param_mapped_to_real_type[template_class_source[2][i]] = parametrized_types[i]
-
-        
-        for item in template_class_source[3:]:
-            if item[0] == InterpreterBase.FIELD_DEF:
-                for type in template_class_source[2]:
-                    if type == item[1]:
-                        item[1] = param_mapped_to_real_type[type]
-                    elif '@' in item[1]:
-                        item[1] = og  
-            if item[0] == InterpreterBase.METHOD_DEF:
-                for return_type in template_class_source[2]:
-                    if return_type == item[1]:
-                        item[1] = param_mapped_to_real_type[return_type]
-                    elif '@' in item[1]:
-                        item[1] = og
-
-                for param in template_class_source[2]:
-                    for i in range(len(item[3])):
-                        if param == item[3][i][0]:
-                            item[3][i][0] = param_mapped_to_real_type[param]
-                        elif '@' in item[3][i][0]:
-                            item[3][i][0] = og
-
-        template_class_source[0] = 'class'
-        template_class_source[1] = og
-        template_class_source.pop(2)
-
-        self.interpreter.type_manager.add_class_type(og, None)
-        self.interpreter.class_index[og] = ClassDef(template_class_source, self.interpreter)
-                            
+        template_class_name = templated_class.split('@')[0]
+        self.interpreter.template_class_index[template_class_name].instantiate(templated_class, self.interpreter)
 
     # (let ((type1 var1 defval1) (type2 var2 defval2)) (statement1) (statement2) ...)
     # uses helper function __execute_begin to implement its functionality
@@ -282,33 +463,29 @@ class ObjectDef:
     # where params are expressions, and expresion could be a value, or a (+ ...)
     # statement version of a method call; there's also an expression version of a method call below
     def __execute_call(self, env, code):
-        status, return_value = self.__execute_call_aux(
-            env, code, code[0].line_num
-        )
-        if status == ObjectDef.STATUS_ERROR:
-            return status, return_value
-        return ObjectDef.STATUS_PROCEED, return_value
+        self.__execute_call_aux(env, code, code[0].line_num)
 
     # (set varname expression), where expression could be a value, or a (+ ...)
     def __execute_set(self, env, code):
-        status, val = self.__evaluate_expression(env, code[2], code[0].line_num)
-        if status == ObjectDef.STATUS_ERROR:
-            return status, val
+        val = self.__evaluate_expression(env, code[2], code[0].line_num)
+        verified = env.class_def.verified_statements  # empty unless the program was type checked
         self.__set_variable_aux(
-            env, code[1], val, code[0].line_num
+            env, code[1], val, code[0].line_num, not verified or id(code) not in verified
         )  # checks/reports type and name errors
-        return ObjectDef.STATUS_PROCEED, None
 
     # (return expression) where expresion could be a value, or a (+ ...)
     def __execute_return(self, env, return_type, code):
         # if len(code) == 1 or self.called_throw == True:
         if len(code) == 1:
             # [return] with no return value; return default value for type
-            return ObjectDef.STATUS_RETURN, None
+            return ObjectDef.EMPTY_RETURN
         else:
-            status, result = self.__evaluate_expression(env, code[1], code[0].line_num)
-            if status == ObjectDef.STATUS_ERROR:
-                return status, result
+            result = self.__evaluate_expression(env, code[1], code[0].line_num)
+            verified = env.class_def.verified_statements
+            if verified and id(code) in verified:  # the TypeChecker proved the return type matches
+                if result.is_typeless_null():
+                    result = Value(return_type, None)
+                return result
             # CAREY FIX
             if result.is_typeless_null():
                 self.__check_type_compatibility(return_type, result.type(), True, code[0].line_num) 
@@ -316,7 +493,7 @@ class ObjectDef:
         self.__check_type_compatibility(
             return_type, result.type(), True, code[0].line_num
         )
-        return ObjectDef.STATUS_RETURN, result
+        return result
 
     # (print expression1 expression2 ...) where expresion could be a variable, value, or a (+ ...)
     def __execute_print(self, env, code):
@@ -326,12 +503,10 @@ class ObjectDef:
             # if expr == 'exception' and self.called_try == True:
             #     output += str(self.exception)
             #     continue
-            status, term = self.__evaluate_expression(env, expr, code[0].line_num)
-            if status == ObjectDef.STATUS_ERROR:
-                return status,term
+            term = self.__evaluate_expression(env, expr, code[0].line_num)
             val = term.value()
             typ = term.type()
-            if typ == ObjectDef.BOOL_TYPE_CONST:
+            if typ is ObjectDef.BOOL_TYPE_CONST:
                 if val == True:
                     val = "true"
                 else:
@@ -339,7 +514,6 @@ class ObjectDef:
             # document will never print out an obj ref
             output += str(val)
         self.interpreter.output(output)
-        return ObjectDef.STATUS_PROCEED, None
 
     # (inputs target_variable) or (inputi target_variable) sets target_variable to input string/int
     def __execute_input(self, env, code, get_string):
@@ -350,17 +524,16 @@ class ObjectDef:
             val = Value(ObjectDef.INT_TYPE_CONST, int(inp))
 
         self.__set_variable_aux(env, code[1], val, code[0].line_num)
-        return ObjectDef.STATUS_PROCEED, None
 
     # helper method used to set either parameter variables or member fields; parameters currently shadow
-    # member fields
-    def __set_variable_aux(self, env, var_name, value, line_num):
+    # member fields. checked is False for statements whose type the TypeChecker already proved
+    def __set_variable_aux(self, env, var_name, value, line_num, checked=True):
         # parameters shadows fields, locals shadow parameters (and outer-block locals)
         if self.__set_local_or_param(
-            env, var_name, value, line_num
+            env, var_name, value, line_num, checked
         ):  # may report a type error
             return
-        if self.__set_field(var_name, value, line_num):  # may report a type error
+        if self.__set_field(env, var_name, value, line_num, checked):  # may report a type error
             return
         self.interpreter.error(
             ErrorType.NAME_ERROR, "unknown field/variable " + var_name, line_num
@@ -369,63 +542,73 @@ class ObjectDef:
     # (if expression (statement) (statement) ) where expresion could be a boolean constant (e.g., true), member
     # variable without ()s, or a boolean expression in parens, like (> 5 a)
     def __execute_if(self, env, return_type, code):
-        status, condition = self.__evaluate_expression(env, code[1], code[0].line_num)
-        if status == ObjectDef.STATUS_ERROR:
-            return status, condition
-        if condition.type() != ObjectDef.BOOL_TYPE_CONST:
+        condition = self.__evaluate_expression(env, code[1], code[0].line_num)
+        if condition.type() is not ObjectDef.BOOL_TYPE_CONST:
             self.interpreter.error(
                 ErrorType.TYPE_ERROR,
                 "non-boolean if condition " + ' '.join(x for x in code[1]),
                 code[0].line_num,
             )
         if condition.value():
-            status, return_value = self.__execute_statement(
-                env, return_type, code[2]
-            )  # if condition was true
-            return status, return_value
+            return self.__execute_statement(env, return_type, code[2])  # if condition was true
         elif len(code) == 4:
-            status, return_value = self.__execute_statement(
-                env, return_type, code[3]
-            )  # if condition was false, do else
-            return status, return_value
-        else:
-            return ObjectDef.STATUS_PROCEED, None
+            return self.__execute_statement(env, return_type, code[3])  # if condition was false, do else
+        return None
 
     # (while expression (statement) ) where expresion could be a boolean value, boolean member variable,
     # or a boolean expression in parens, like (> 5 a)
     def __execute_while(self, env, return_type, code):
+        governor = self.interpreter.governor
         while True:
-            status, condition = self.__evaluate_expression(env, code[1], code[0].line_num)
-            if status == ObjectDef.STATUS_ERROR:
-                return status, condition
-            if condition.type() != ObjectDef.BOOL_TYPE_CONST:
+            condition = self.__evaluate_expression(env, code[1], code[0].line_num)
+            if condition.type() is not ObjectDef.BOOL_TYPE_CONST:
                 self.interpreter.error(
                     ErrorType.TYPE_ERROR,
                     "non-boolean while condition " + ' '.join(x for x in code[1]),
                     code[0].line_num,
                 )
             if not condition.value():  # condition is false, exit loop immediately
-                return ObjectDef.STATUS_PROCEED, None
+                return None
             # condition is true, run body of while loop
-            status, return_value = self.__execute_statement(env, return_type, code[2])
-            if status == ObjectDef.STATUS_RETURN or status == ObjectDef.STATUS_ERROR:
-                return (
-                    status,
-                    return_value,
-                )  # could be a valid return of a value or an error
-            
-    def __execute_try_helper(self,env,return_type,code,block_nest):
-        status, return_value = self.__execute_statement(env, return_type, code[1])
-        if status == ObjectDef.STATUS_ERROR:
-            if block_nest == 1:
-                new_code = code[:1] + code[2:]
-                self.__add_locals_to_env(env, [["string", "exception", '"'+ return_value.value() + '"']], code[0].line_num)
-                status,return_value = self.__execute_try_helper(env,return_type,new_code,0)
-            env.block_unnest()
-        return status,return_value
-
+            result = self.__execute_statement(env, return_type, code[2])
+            if result is not None:
+                return result  # a return in the loop body
+            if governor is not None:
+                governor.step()
+
+    # (try statement catch_statement): if statement throws, catch_statement runs with the thrown string bound to
+    # exception in the innermost block, which is popped when the catch finishes (and once more if the catch
+    # throws in turn)
     def __execute_try(self, env, return_type, code):
-        return self.__execute_try_helper(env, return_type, code,1)
+        try:
+            return self.__execute_statement(env, return_type, code[1])
+        except BrewinException as thrown:
+            exception = thrown.value
+        line_num = code[0].line_num
+        name = env.exception_name(code)
+        if not env.create_new_symbol(name):
+            self.interpreter.error(
+                ErrorType.NAME_ERROR,
+                "duplicate local variable name " + InterpreterBase.EXCEPTION_VARIABLE_DEF,
+                line_num,
+            )
+        # surrounding quotes are dropped, as when the exception used to be rebound through a string literal
+        env.set(
+            name,
+            VariableDef(
+                ObjectDef.STRING_TYPE_CONST,
+                name,
+                Value(ObjectDef.STRING_TYPE_CONST, exception.value().strip('"')),
+            ),
+        )
+        try:
+            result = self.__execute_statement(env, return_type, code[2])
+        except BrewinException:
+            env.block_unnest()
+            env.block_unnest()
+            raise
+        env.block_unnest()
+        return result
 
     # var_def is a VariableDef
     # this method checks to see if a variable holds a null value, and if so, changes the type of the null value
@@ -443,19 +626,16 @@ class ObjectDef:
             # locals shadow member variables
             var_def = env.get(expr)
             if var_def is not None:
-                return ObjectDef.STATUS_PROCEED, self.__propagate_type_to_null(var_def)
-            elif expr in self.fields:
-                return ObjectDef.STATUS_PROCEED, self.__propagate_type_to_null(
-                    self.fields[expr]
-                )  # return the Value object
+                return self.__propagate_type_to_null(var_def)
+            field_index = env.class_def.field_index.get(expr)
+            if field_index is not None:
+                return self._get_field(field_index)  # return the Value object
             # need to check for variable name and get its value too
             value = create_value(expr)
             if value is not None:
-                return ObjectDef.STATUS_PROCEED, value
+                return value
             if expr == InterpreterBase.ME_DEF:
-                return ObjectDef.STATUS_PROCEED, (
-                    self.get_me_as_value()
-                )  # create Value object for current object with right type
+                return self.get_me_as_value()  # create Value object for current object with right type
             self.interpreter.error(
                 ErrorType.NAME_ERROR,
                 "invalid field or parameter " + expr,
@@ -463,84 +643,140 @@ class ObjectDef:
             )
 
         operator = expr[0]
+        if type(operator) is QuickOperator:
+            guard = operator.guard
+            if operator.arity == 2:
+                operand1 = self.__evaluate_expression(env, expr[1], line_num_of_statement)
+                operand2 = self.__evaluate_expression(env, expr[2], line_num_of_statement)
+                if operand1.t is guard and operand2.t is guard:
+                    operator.hits += 1
+                    return Value(operator.result_type, operator.function(operand1.v, operand2.v))
+                self.__deoptimize(operator, operand1.t if operand1.t is operand2.t else None)
+                return self.__binary_operation(operator, operand1, operand2, line_num_of_statement)
+            operand = self.__evaluate_expression(env, expr[1], line_num_of_statement)
+            if operand.t is guard:
+                operator.hits += 1
+                return Value(operator.result_type, operator.function(operand.v))
+            self.__deoptimize(operator, operand.t)
+            return self.__unary_operation(operator, operand, line_num_of_statement)
         if operator in self.binary_op_list:
-            status1,operand1 = self.__evaluate_expression(env, expr[1], line_num_of_statement)
-            if status1 == ObjectDef.STATUS_ERROR:
-                return status1,operand1
-            status2,operand2 = self.__evaluate_expression(env, expr[2], line_num_of_statement)
-            if status2 == ObjectDef.STATUS_ERROR:
-                return status2,operand2
-            if (
-                operand1.type() == operand2.type()
-                and operand1.type() == ObjectDef.INT_TYPE_CONST
-            ):
-                if operator not in self.binary_ops[InterpreterBase.INT_DEF]:
-                    self.interpreter.error(
-                        ErrorType.TYPE_ERROR,
-                        "invalid operator applied to ints",
-                        line_num_of_statement,
-                    )
-                return ObjectDef.STATUS_PROCEED, self.binary_ops[InterpreterBase.INT_DEF][operator](
-                    operand1, operand2
-                )
-            if (
-                operand1.type() == operand2.type()
-                and operand1.type() == ObjectDef.STRING_TYPE_CONST
-            ):
-                if operator not in self.binary_ops[InterpreterBase.STRING_DEF]:
-                    self.interpreter.error(
-                        ErrorType.TYPE_ERROR,
-                        "invalid operator applied to strings",
-                        line_num_of_statement,
-                    )
-                return ObjectDef.STATUS_PROCEED, self.binary_ops[InterpreterBase.STRING_DEF][operator](
-                    operand1, operand2
-                )
-            if (
-                operand1.type() == operand2.type()
-                and operand1.type() == ObjectDef.BOOL_TYPE_CONST
-            ):
-                if operator not in self.binary_ops[InterpreterBase.BOOL_DEF]:
-                    self.interpreter.error(
-                        ErrorType.TYPE_ERROR,
-                        "invalid operator applied to bool",
-                        line_num_of_statement,
-                    )
-                return ObjectDef.STATUS_PROCEED, self.binary_ops[InterpreterBase.BOOL_DEF][operator](
-                    operand1, operand2
-                )
-            # handle object reference comparisons last
-            if self.interpreter.check_type_compatibility(
-                operand1.type(), operand2.type(), False
-            ):
-                return ObjectDef.STATUS_PROCEED, self.binary_ops[InterpreterBase.CLASS_DEF][operator](
-                    operand1, operand2
-                )
-            self.interpreter.error(
-                ErrorType.TYPE_ERROR,
-                f"operator {operator} applied to two incompatible types",
-                line_num_of_statement,
-            )
+            operand1 = self.__evaluate_expression(env, expr[1], line_num_of_statement)
+            operand2 = self.__evaluate_expression(env, expr[2], line_num_of_statement)
+            result = self.__binary_operation(operator, operand1, operand2, line_num_of_statement)
+            self.__quicken(expr, 2, operand1.t if operand1.t is operand2.t else None)
+            return result
         if operator in self.unary_op_list:
-            status, operand = self.__evaluate_expression(env, expr[1], line_num_of_statement)
-            if status == ObjectDef.STATUS_ERROR:
-                return status, operand
-            if operand.type() == ObjectDef.BOOL_TYPE_CONST:
-                if operator not in self.unary_ops[InterpreterBase.BOOL_DEF]:
-                    self.interpreter.error(
-                        ErrorType.TYPE_ERROR,
-                        "invalid unary operator applied to bool",
-                        line_num_of_statement,
-                    )
-                return ObjectDef.STATUS_PROCEED, self.unary_ops[InterpreterBase.BOOL_DEF][operator](operand)
+            operand = self.__evaluate_expression(env, expr[1], line_num_of_statement)
+            result = self.__unary_operation(operator, operand, line_num_of_statement)
+            self.__quicken(expr, 1, operand.t)
+            return result
 
         # handle call expression: (call objref methodname p1 p2 p3)
         if operator == InterpreterBase.CALL_DEF:
-            status, value = self.__execute_call_aux(env, expr, line_num_of_statement)
-            return status,value
+            return self.__execute_call_aux(env, expr, line_num_of_statement)
         # handle new expression: (new classname)
         if operator == InterpreterBase.NEW_DEF:
-            return ObjectDef.STATUS_PROCEED, self.__execute_new_aux(env, expr, line_num_of_statement)
+            return self.__execute_new_aux(env, expr, line_num_of_statement)
+        # anything else used to fall off the end here, and the caller crashed unpacking the None it got back
+        self.interpreter.error(
+            ErrorType.SYNTAX_ERROR,
+            f"unknown operator {operator}",
+            line_num_of_statement,
+        )
+
+    # applies binary operator to two evaluated operands
+    def __binary_operation(self, operator, operand1, operand2, line_num_of_statement):
+        if (
+            operand1.type() is operand2.type()
+            and operand1.type() is ObjectDef.INT_TYPE_CONST
+        ):
+            if operator not in self.binary_ops[InterpreterBase.INT_DEF]:
+                self.interpreter.error(
+                    ErrorType.TYPE_ERROR,
+                    "invalid operator applied to ints",
+                    line_num_of_statement,
+                )
+            return self.binary_ops[InterpreterBase.INT_DEF][operator](
+                operand1, operand2
+            )
+        if (
+            operand1.type() is operand2.type()
+            and operand1.type() is ObjectDef.STRING_TYPE_CONST
+        ):
+            if operator not in self.binary_ops[InterpreterBase.STRING_DEF]:
+                self.interpreter.error(
+                    ErrorType.TYPE_ERROR,
+                    "invalid operator applied to strings",
+                    line_num_of_statement,
+                )
+            return self.binary_ops[InterpreterBase.STRING_DEF][operator](
+                operand1, operand2
+            )
+        if (
+            operand1.type() is operand2.type()
+            and operand1.type() is ObjectDef.BOOL_TYPE_CONST
+        ):
+            if operator not in self.binary_ops[InterpreterBase.BOOL_DEF]:
+                self.interpreter.error(
+                    ErrorType.TYPE_ERROR,
+                    "invalid operator applied to bool",
+                    line_num_of_statement,
+                )
+            return self.binary_ops[InterpreterBase.BOOL_DEF][operator](
+                operand1, operand2
+            )
+        # handle object reference comparisons last
+        if self.interpreter.check_type_compatibility(
+            operand1.type(), operand2.type(), False
+        ):
+            return self.binary_ops[InterpreterBase.CLASS_DEF][operator](
+                operand1, operand2
+            )
+        self.interpreter.error(
+            ErrorType.TYPE_ERROR,
+            f"operator {operator} applied to two incompatible types",
+            line_num_of_statement,
+        )
+
+    # applies unary operator to an evaluated operand
+    def __unary_operation(self, operator, operand, line_num_of_statement):
+        if operand.type() is ObjectDef.BOOL_TYPE_CONST:
+            if operator not in self.unary_ops[InterpreterBase.BOOL_DEF]:
+                self.interpreter.error(
+                    ErrorType.TYPE_ERROR,
+                    "invalid unary operator applied to bool",
+                    line_num_of_statement,
+                )
+            return self.unary_ops[InterpreterBase.BOOL_DEF][operator](operand)
+        self.interpreter.error(
+            ErrorType.TYPE_ERROR,
+            "invalid unary operator applied to " + operand.type().type_name,
+            line_num_of_statement,
+        )
+
+    # replaces the operator token of expr, which has just been evaluated, by a QuickOperator specialized on
+    # operand_type (None if the operands differed in type); operators with no specialization for it stay generic
+    def __quicken(self, expr, arity, operand_type):
+        if not self.interpreter.quicken:
+            return
+        quick = QuickOperator(expr[0], arity, operand_type)
+        expr[0] = quick
+        quickening = self.interpreter.quickening
+        quickening.operators.append(quick)
+        if quick.guard is not None:
+            quickening.specializations += 1
+
+    # a specialized operator's guard failed on operands of type operand_type (None if they differed in type)
+    def __deoptimize(self, operator, operand_type):
+        if operator.guard is None:
+            return
+        operator.deoptimizations += 1
+        quickening = self.interpreter.quickening
+        quickening.deoptimizations += 1
+        if operator.deoptimizations >= QuickOperator.MAX_DEOPTIMIZATIONS:
+            operator.guard = None
+        elif operator.specialize(operand_type):
+            quickening.specializations += 1
 
     # (new classname)
     def __execute_new_aux(self, env, code, line_num_of_statement):
@@ -551,26 +787,27 @@ class ObjectDef:
     # this method is a helper used by call statements and call expressions
     # (call object_ref/me methodname p1 p2 p3)
     def __execute_call_aux(self, env, code, line_num_of_statement):
-        # determine which object we want to call the method on
+        # determine which object we want to call the method on, and the class to start looking for the method in
         super_only = False
+        start_class = None
         obj_name = code[1]
         if obj_name == InterpreterBase.ME_DEF:
             obj = self
+            start_class = env.class_def
         elif obj_name == InterpreterBase.SUPER_DEF:
-            if not self.super_object:
+            start_class = env.class_def.get_superclass()
+            if start_class is None:
                 self.interpreter.error(
                     ErrorType.TYPE_ERROR,
                     "invalid call to super object by class "
-                    + self.class_def.get_name(),
+                    + env.class_def.get_name(),
                     line_num_of_statement,
                 )
-            obj = self.super_object
+            obj = self
             super_only = True
         else:
             # return a Value() object which has a type and a value
-            status, obj_val = self.__evaluate_expression(env, obj_name, line_num_of_statement)
-            if status == ObjectDef.STATUS_ERROR:
-                return status, obj_val
+            obj_val = self.__evaluate_expression(env, obj_name, line_num_of_statement)
             if obj_val.is_null():
                 self.interpreter.error(
                     ErrorType.FAULT_ERROR, "null dereference", line_num_of_statement
@@ -579,36 +816,37 @@ class ObjectDef:
         # prepare the actual arguments for passing
         actual_args = []
         for expr in code[3:]:
-            status, val =  self.__evaluate_expression(env, expr, line_num_of_statement)
-            if status == ObjectDef.STATUS_ERROR:
-                return status, val
-            actual_args.append(val)
-        return obj.call_method(code[2], actual_args, super_only, line_num_of_statement)
-
-    def __map_method_names_to_method_definitions(self):
-        self.methods = {}
-        for method in self.class_def.get_methods():
-            self.methods[method.method_name] = method
-
-    def __instantiate_fields(self):
-        self.fields = {}
-        # get_fields() returns a set of VariableDefs
-        for vardef in self.class_def.get_fields():
-            self.fields[vardef.name] = copy.copy(vardef)
-
-    def __set_field(self, field_name, value, line_num):
-        if field_name not in self.fields:
+            actual_args.append(self.__evaluate_expression(env, expr, line_num_of_statement))
+        call_site = self.interpreter.get_call_site(line_num_of_statement, code[2])
+        status, value = obj.call_method(
+            code[2], actual_args, super_only, line_num_of_statement, call_site, start_class
+        )
+        if status == ObjectDef.STATUS_ERROR:
+            raise BrewinException(value)  # the exception escaped the called method
+        return value
+
+    # returns the value of the field in slot field_index; a null value takes on the field's declared type
+    def _get_field(self, field_index):
+        value = self.slots[field_index]
+        if value.is_null():
+            return Value(self.class_def.slot_types[field_index], None)
+        return value
+
+    def __set_field(self, env, field_name, value, line_num, checked):
+        field_index = env.class_def.field_index.get(field_name)
+        if field_index is None:
             return False
-        var_def = self.fields[field_name]
-        self.__check_type_compatibility(var_def.type, value.type(), True, line_num)
-        var_def.set_value(value)
+        if checked:
+            self.__check_type_compatibility(self.class_def.slot_types[field_index], value.type(), True, line_num)
+        self.slots[field_index] = value
         return True
 
-    def __set_local_or_param(self, env, var_name, value, line_num):
+    def __set_local_or_param(self, env, var_name, value, line_num, checked):
         var_def = env.get(var_name)
         if var_def is None:
             return False
-        self.__check_type_compatibility(var_def.type, value.type(), True, line_num)
+        if checked:
+            self.__check_type_compatibility(var_def.type, value.type(), True, line_num)
         var_def.set_value(value)
         return True
 
@@ -624,70 +862,62 @@ class ObjectDef:
                 line_num,
             )
 
-    def __create_map_of_operations_to_lambdas(self):
-        self.binary_op_list = [
-            "+",
-            "-",
-            "*",
-            "/",
-            "%",
-            "==",
-            "!=",
-            "<",
-            "<=",
-            ">",
-            ">=",
-            "&",
-            "|",
-        ]
-        self.unary_op_list = ["!"]
-        self.binary_ops = {}
-        self.binary_ops[InterpreterBase.INT_DEF] = {
-            "+": lambda a, b: Value(ObjectDef.INT_TYPE_CONST, a.value() + b.value()),
-            "-": lambda a, b: Value(ObjectDef.INT_TYPE_CONST, a.value() - b.value()),
-            "*": lambda a, b: Value(ObjectDef.INT_TYPE_CONST, a.value() * b.value()),
-            "/": lambda a, b: Value(
-                ObjectDef.INT_TYPE_CONST, a.value() // b.value()
-            ),  # // for integer ops
-            "%": lambda a, b: Value(ObjectDef.INT_TYPE_CONST, a.value() % b.value()),
-            "==": lambda a, b: Value(ObjectDef.BOOL_TYPE_CONST, a.value() == b.value()),
-            "!=": lambda a, b: Value(ObjectDef.BOOL_TYPE_CONST, a.value() != b.value()),
-            ">": lambda a, b: Value(ObjectDef.BOOL_TYPE_CONST, a.value() > b.value()),
-            "<": lambda a, b: Value(ObjectDef.BOOL_TYPE_CONST, a.value() < b.value()),
-            ">=": lambda a, b: Value(ObjectDef.BOOL_TYPE_CONST, a.value() >= b.value()),
-            "<=": lambda a, b: Value(ObjectDef.BOOL_TYPE_CONST, a.value() <= b.value()),
-        }
-        self.binary_ops[InterpreterBase.STRING_DEF] = {
-            "+": lambda a, b: Value(ObjectDef.STRING_TYPE_CONST, a.value() + b.value()),
-            "==": lambda a, b: Value(ObjectDef.BOOL_TYPE_CONST, a.value() == b.value()),
-            "!=": lambda a, b: Value(ObjectDef.BOOL_TYPE_CONST, a.value() != b.value()),
-            ">": lambda a, b: Value(ObjectDef.BOOL_TYPE_CONST, a.value() > b.value()),
-            "<": lambda a, b: Value(ObjectDef.BOOL_TYPE_CONST, a.value() < b.value()),
-            ">=": lambda a, b: Value(ObjectDef.BOOL_TYPE_CONST, a.value() >= b.value()),
-            "<=": lambda a, b: Value(ObjectDef.BOOL_TYPE_CONST, a.value() <= b.value()),
-        }
-        self.binary_ops[InterpreterBase.BOOL_DEF] = {
-            "&": lambda a, b: Value(ObjectDef.BOOL_TYPE_CONST, a.value() and b.value()),
-            "|": lambda a, b: Value(ObjectDef.BOOL_TYPE_CONST, a.value() or b.value()),
-            "==": lambda a, b: Value(ObjectDef.BOOL_TYPE_CONST, a.value() == b.value()),
-            "!=": lambda a, b: Value(ObjectDef.BOOL_TYPE_CONST, a.value() != b.value()),
-        }
-        self.binary_ops[InterpreterBase.CLASS_DEF] = {
-            "==": lambda a, b: Value(ObjectDef.BOOL_TYPE_CONST, a.value() == b.value()),
-            "!=": lambda a, b: Value(ObjectDef.BOOL_TYPE_CONST, a.value() != b.value()),
-        }
+# inline cache of method resolutions for one call site, keyed by the receiver's classes and the argument types
+class CallSite:
+    # receiver/argument type combinations cached before the site is considered megamorphic and stops caching
+    MAX_ENTRIES = 4
+
+    def __init__(self, line_num, method_name):
+        self.line_num = line_num
+        self.method_name = method_name
+        self.entries = {}
+        self.generation = None  # TypeManager generation the entries were resolved under
+        self.megamorphic = False
+        self.hits = 0
+        self.misses = 0
+
+    def lookup(self, key, generation):
+        if generation != self.generation:
+            self.entries.clear()
+            self.megamorphic = False
+            self.generation = generation
+        target = self.entries.get(key)
+        if target is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return target
 
-        self.unary_ops = {}
-        self.unary_ops[InterpreterBase.BOOL_DEF] = {
-            "!": lambda a: Value(ObjectDef.BOOL_TYPE_CONST, not a.value()),
+    def store(self, key, target):
+        if len(self.entries) < CallSite.MAX_ENTRIES:
+            self.entries[key] = target
+        else:
+            self.megamorphic = True
+
+    def state(self):
+        if self.megamorphic:
+            return "megamorphic"
+        if len(self.entries) > 1:
+            return "polymorphic"
+        if self.entries:
+            return "monomorphic"
+        return "uninitialized"
+
+    def get_stats(self):
+        return {
+            "line": self.line_num,
+            "method": str(self.method_name),
+            "hits": self.hits,
+            "misses": self.misses,
+            "receivers": len(self.entries),
+            "state": self.state(),
         }
 
-    def __init_superclass_if_any(self):
-        superclass_def = self.class_def.get_superclass()
-        if superclass_def is None:
-            self.super_object = None
-            return
 
-        self.super_object = ObjectDef(
-            self.interpreter, superclass_def, self.anchor_object, self.trace_output
-        )
\ No newline at end of file
+# default execution engine: runs each method body by walking its parsed lists directly
+class TreeEngine:
+    def __init__(self, interpreter):
+        self.interpreter = interpreter
+
+    def execute_method(self, obj, env, method_def):
+        return obj._execute_statement(env, method_def.return_type, method_def.code)
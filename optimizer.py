@@ -0,0 +1,441 @@
+"""
+Optimizing pass over the loaded program, run by Interpreter.run after loading (and type checking) and before
+main when it's turned on with Interpreter(optimize=True); by default the code runs as written.
+
+    python optimizer.py program.br    # print every method as written and as optimized
+
+Optimizer rewrites the code of every MethodDef, keeping the original in method_def.source_code:
+- constant folding: an operator whose operands are all literals becomes a literal of its result, e.g.
+  (* 60 60) becomes 3600 and (+ "a" "b") becomes "ab". Operations that would fail (mismatched types, an
+  operator the type doesn't have, division by zero) are left alone, so they fail at run time as before
+- dead code: an if or while whose condition is the literal true or false keeps only the code that can run,
+  and the statements of a begin or let after a return or a throw are dropped
+- loop-invariant hoisting: the largest subexpressions of a while loop (condition and body) that only use
+  literals and int, string and bool locals and parameters the loop never assigns, and that can't fail, are
+  computed once before the loop into temporary locals:
+      (let ((int %inv0 0)) (set %inv0 (* n 60)) (while ... %inv0 ...))
+
+Rewritten statements keep the line numbers of the source, so errors are reported on the same lines;
+trace_output and tracers show the optimized statements, which is why the pass is opt-in. Statements the TypeChecker verified stay verified.
+Hoisting is skipped in methods that use try, since a caught exception can remove blocks from the
+environment (see typechecker.py). Classes instantiated from templates while the program runs are optimized
+when they're built.
+"""
+
+import sys
+
+from bparser import StringWithLineNumber
+from closure_engine import collect_local_names
+from intbase import InterpreterBase
+from objectv2 import ObjectDef
+from type_valuev2 import create_value, flatten
+
+PRIMITIVE_TYPE_NAMES = (InterpreterBase.INT_DEF, InterpreterBase.STRING_DEF, InterpreterBase.BOOL_DEF)
+COMPARISONS = ("==", "!=", "<", "<=", ">", ">=")
+DEFAULT_LITERALS = {InterpreterBase.INT_DEF: "0", InterpreterBase.STRING_DEF: '""', InterpreterBase.BOOL_DEF: "false"}
+TEMP_PREFIX = "%inv"  # not a token BParser can produce, so temporaries never clash with the program's names
+
+
+class Optimizer:
+    def __init__(self, interpreter):
+        self.interpreter = interpreter
+        self.stats = {"folded": 0, "pruned": 0, "hoisted": 0}
+        # per-class state
+        self.origins = None  # (new node, node it replaces) for every node built, which also keeps them alive
+        # per-method state
+        self.reserved = None  # names that aren't literals in this method: its locals, parameters and fields
+        self.scopes = None  # stack of {name: type name} for the primitive locals and parameters in scope
+        self.hoisting = False
+        self.temp_count = 0
+
+    def optimize_program(self):
+        for class_def in list(self.interpreter.class_index.values()):
+            self.optimize_class(class_def)
+
+    # optimizes the methods of class_def that haven't been optimized yet
+    def optimize_class(self, class_def):
+        self.origins = []
+        optimized = []
+        for method_def in class_def.get_methods():
+            if method_def.source_code is None:
+                self.__optimize_method(class_def, method_def)
+                optimized.append(method_def)
+        # verification is by statement id: a rewritten statement has the same static types as the one it
+        # replaces, so it's verified if that one was. the ids are unique because the sources and every node
+        # built are still alive
+        verified = class_def.verified_statements
+        if verified and optimized:
+            live = set()
+            pending = [method_def.code for method_def in optimized]
+            while pending:
+                node = pending.pop()
+                if type(node) is list:
+                    live.add(id(node))
+                    pending.extend(node)
+            added = {id(new) for new, old in self.origins if id(old) in verified and id(new) in live}
+            class_def.verified_statements = verified | added
+        self.origins = None
+
+    def __optimize_method(self, class_def, method_def):
+        local_names = collect_local_names(method_def)
+        if local_names is None:  # malformed declarations; leave the method as written
+            method_def.source_code = method_def.code
+            return
+        self.reserved = local_names | set(class_def.field_index)
+        self.scopes = [
+            {
+                param.name: param.type.type_name
+                for param in method_def.formal_params
+                if param.type.type_name in PRIMITIVE_TYPE_NAMES
+            }
+        ]
+        self.hoisting = not Optimizer.__uses_try(method_def.code)
+        self.temp_count = 0
+        method_def.source_code = method_def.code
+        method_def.code = self.__statement(method_def.code)
+
+    @staticmethod
+    def __uses_try(code):
+        pending = [code]
+        while pending:
+            node = pending.pop()
+            if type(node) is list:
+                if node and node[0] == InterpreterBase.TRY_DEF:
+                    return True
+                pending.extend(node)
+        return False
+
+    # records that new replaces old and returns new
+    def __rebuilt(self, old, new):
+        if len(new) == len(old) and all(a is b for a, b in zip(new, old)):
+            return old
+        self.origins.append((new, old))
+        return new
+
+    # statements
+
+    # returns the optimized statement, which is code itself if nothing changed; malformed statements are left
+    # as written, for the engines to report
+    def __statement(self, code):
+        if type(code) is not list or not code or not isinstance(code[0], str):
+            return code
+        scope_depth = len(self.scopes)
+        try:
+            return self.__statement_kind(code)
+        except (IndexError, TypeError, AttributeError):
+            return code
+        finally:
+            del self.scopes[scope_depth:]
+
+    def __statement_kind(self, code):
+        tok = code[0]
+        if tok == InterpreterBase.BEGIN_DEF:
+            return self.__block(code, 1)
+        if tok == InterpreterBase.LET_DEF:
+            scope = {}
+            for var_def in code[1]:
+                if var_def[0] in PRIMITIVE_TYPE_NAMES:
+                    scope[var_def[1]] = var_def[0]
+                else:
+                    scope[var_def[1]] = None  # shadows any primitive of the same name
+            self.scopes.append(scope)
+            return self.__block(code, 2)
+        if tok == InterpreterBase.IF_DEF:
+            return self.__if(code)
+        if tok == InterpreterBase.WHILE_DEF:
+            return self.__while(code)
+        if tok == InterpreterBase.TRY_DEF:
+            return self.__rebuilt(code, [tok] + [self.__statement(statement) for statement in code[1:]])
+        if tok in (InterpreterBase.SET_DEF, InterpreterBase.CALL_DEF):
+            # (set name expression) and (call target name arguments...)
+            first = 2 if tok == InterpreterBase.SET_DEF else 3
+            new = code[:first] + [self.__expression(expr) for expr in code[first:]]
+            if tok == InterpreterBase.CALL_DEF:
+                new[1] = self.__expression(code[1])
+            return self.__rebuilt(code, new)
+        if tok in (InterpreterBase.RETURN_DEF, InterpreterBase.THROW_DEF, InterpreterBase.PRINT_DEF):
+            return self.__rebuilt(code, [tok] + [self.__expression(expr) for expr in code[1:]])
+        return code
+
+    # the statements of a begin (start 1) or let (start 2), up to the first return or throw
+    def __block(self, code, start):
+        statements = []
+        for position, statement in enumerate(code[start:], start):
+            statement = self.__statement(statement)
+            if Optimizer.__is_empty(statement) and statement is not code[position]:
+                continue  # a statement that was optimized away
+            statements.append(statement)
+            if type(statement) is list and statement and statement[0] in (
+                InterpreterBase.RETURN_DEF,
+                InterpreterBase.THROW_DEF,
+            ):
+                if position + 1 < len(code):
+                    self.stats["pruned"] += len(code) - position - 1
+                break
+        return self.__rebuilt(code, code[:start] + statements)
+
+    def __if(self, code):
+        condition = self.__expression(code[1])
+        known = self.__literal(condition)
+        if known is not None and known.type() is ObjectDef.BOOL_TYPE_CONST and len(code) in (3, 4):
+            self.stats["pruned"] += 1
+            if known.value():
+                return self.__statement(code[2])
+            if len(code) == 4:
+                return self.__statement(code[3])
+            return self.__empty(code[0])
+        return self.__rebuilt(code, [code[0], condition] + [self.__statement(statement) for statement in code[2:]])
+
+    def __while(self, code):
+        condition = self.__expression(code[1])
+        known = self.__literal(condition)
+        if known is not None and known.type() is ObjectDef.BOOL_TYPE_CONST and not known.value():
+            self.stats["pruned"] += 1
+            return self.__empty(code[0])
+        loop = self.__rebuilt(code, [code[0], condition] + [self.__statement(statement) for statement in code[2:]])
+        if self.hoisting and len(loop) == 3:
+            return self.__hoist(loop)
+        return loop
+
+    # (begin) on the line of token, standing in for a statement that never does anything
+    def __empty(self, token):
+        return [StringWithLineNumber(InterpreterBase.BEGIN_DEF, token.line_num)]
+
+    @staticmethod
+    def __is_empty(code):
+        return type(code) is list and len(code) == 1 and code[0] == InterpreterBase.BEGIN_DEF
+
+    # expressions
+
+    def __expression(self, expr):
+        if type(expr) is not list or not expr:
+            return expr
+        operator = expr[0]
+        if operator in ObjectDef.binary_op_list and len(expr) == 3:
+            new = [operator, self.__expression(expr[1]), self.__expression(expr[2])]
+            folded = self.__fold(new)
+            if folded is not None:
+                return folded
+            return self.__rebuilt(expr, new)
+        if operator in ObjectDef.unary_op_list and len(expr) == 2:
+            new = [operator, self.__expression(expr[1])]
+            folded = self.__fold(new)
+            if folded is not None:
+                return folded
+            return self.__rebuilt(expr, new)
+        if operator == InterpreterBase.CALL_DEF and len(expr) >= 3:
+            return self.__rebuilt(
+                expr, [operator, self.__expression(expr[1]), expr[2]] + [self.__expression(arg) for arg in expr[3:]]
+            )
+        return expr
+
+    # the Value of a literal token, or None; names of locals, parameters and fields shadow literals
+    def __literal(self, token):
+        if type(token) is list or not isinstance(token, str) or not token or token in self.reserved:
+            return None
+        return create_value(token)
+
+    # returns the literal an operation on literals evaluates to, or None if it can't be folded
+    def __fold(self, expr):
+        operands = [self.__literal(operand) for operand in expr[1:]]
+        if any(operand is None for operand in operands):  # Value's == doesn't take None
+            return None
+        result_type = Optimizer.__result_type(expr[0], [operand.type().type_name for operand in operands])
+        if result_type is None or (expr[0] in ("/", "%") and operands[1].value() == 0):
+            return None
+        if len(operands) == 2:
+            result = ObjectDef.binary_ops[operands[0].type().type_name][expr[0]](*operands)
+        else:
+            result = ObjectDef.unary_ops[InterpreterBase.BOOL_DEF][expr[0]](*operands)
+        self.stats["folded"] += 1
+        return StringWithLineNumber(Optimizer.__to_literal(result), getattr(expr[0], "line_num", None))
+
+    # the type name of an operation on operands of the given type names, or None if it would fail
+    @staticmethod
+    def __result_type(operator, operand_types):
+        if len(operand_types) == 1:
+            if operand_types[0] == InterpreterBase.BOOL_DEF and operator in ObjectDef.unary_ops[InterpreterBase.BOOL_DEF]:
+                return InterpreterBase.BOOL_DEF
+            return None
+        type1, type2 = operand_types
+        if type1 != type2 or type1 not in PRIMITIVE_TYPE_NAMES or operator not in ObjectDef.binary_ops[type1]:
+            return None
+        return InterpreterBase.BOOL_DEF if operator in COMPARISONS else type1
+
+    @staticmethod
+    def __to_literal(value):
+        if value.type() is ObjectDef.STRING_TYPE_CONST:
+            return '"' + flatten(value.value()) + '"'
+        if value.type() is ObjectDef.BOOL_TYPE_CONST:
+            return InterpreterBase.TRUE_DEF if value.value() else InterpreterBase.FALSE_DEF
+        return str(value.value())
+
+    # loop-invariant hoisting
+
+    # loop is an optimized (while condition statement)
+    def __hoist(self, loop):
+        assigned = set()
+        pending = [loop]
+        while pending:
+            node = pending.pop()
+            if type(node) is not list or not node:
+                continue
+            if node[0] in (InterpreterBase.SET_DEF, InterpreterBase.INPUT_INT_DEF, InterpreterBase.INPUT_STRING_DEF):
+                assigned.add(node[1])
+            elif node[0] == InterpreterBase.LET_DEF:
+                assigned.update(var_def[1] for var_def in node[1])  # shadowed inside the loop
+            pending.extend(node)
+        invariants = {}
+        for scope in self.scopes:
+            invariants.update(scope)
+        invariants = {
+            name: type_name
+            for name, type_name in invariants.items()
+            if type_name is not None and name not in assigned
+        }
+        if not invariants:
+            return loop
+        temps = {}  # expression key -> (temporary name, type name, expression)
+        hoisted = [loop[0], self.__hoist_expression(loop[1], invariants, temps), self.__hoist_statement(loop[2], invariants, temps)]
+        if not temps:
+            return loop
+        line_num = loop[0].line_num
+        token = lambda text: StringWithLineNumber(text, line_num)
+        declarations = []
+        statements = []
+        for name, type_name, expr in temps.values():
+            declarations.append([token(type_name), token(name), token(DEFAULT_LITERALS[type_name])])
+            statements.append([token(InterpreterBase.SET_DEF), token(name), expr])
+        self.stats["hoisted"] += len(temps)
+        self.origins.append((hoisted, loop))
+        return [token(InterpreterBase.LET_DEF), declarations] + statements + [hoisted]
+
+    def __hoist_statement(self, code, invariants, temps):
+        if type(code) is not list or not code or not isinstance(code[0], str):
+            return code
+        tok = code[0]
+        if tok in (InterpreterBase.BEGIN_DEF, InterpreterBase.LET_DEF):
+            start = 1 if tok == InterpreterBase.BEGIN_DEF else 2
+            new = code[:start] + [self.__hoist_statement(statement, invariants, temps) for statement in code[start:]]
+        elif tok in (InterpreterBase.IF_DEF, InterpreterBase.WHILE_DEF):
+            new = [tok, self.__hoist_expression(code[1], invariants, temps)] + [
+                self.__hoist_statement(statement, invariants, temps) for statement in code[2:]
+            ]
+        elif tok == InterpreterBase.SET_DEF:
+            new = code[:2] + [self.__hoist_expression(expr, invariants, temps) for expr in code[2:]]
+        elif tok in (InterpreterBase.RETURN_DEF, InterpreterBase.THROW_DEF, InterpreterBase.PRINT_DEF):
+            new = [tok] + [self.__hoist_expression(expr, invariants, temps) for expr in code[1:]]
+        elif tok == InterpreterBase.CALL_DEF:
+            new = self.__hoist_expression(code, invariants, temps)
+        else:
+            return code
+        return self.__rebuilt(code, new)
+
+    def __hoist_expression(self, expr, invariants, temps):
+        if type(expr) is not list or not expr:
+            return expr
+        type_name = self.__invariant_type(expr, invariants)
+        if type_name is not None:
+            key = Optimizer.__key(expr)
+            if key not in temps:
+                temps[key] = (f"{TEMP_PREFIX}{self.temp_count}", type_name, expr)
+                self.temp_count += 1
+            return StringWithLineNumber(temps[key][0], getattr(expr[0], "line_num", None))
+        operator = expr[0]
+        if operator in ObjectDef.binary_op_list or operator in ObjectDef.unary_op_list:
+            new = [operator] + [self.__hoist_expression(operand, invariants, temps) for operand in expr[1:]]
+        elif operator == InterpreterBase.CALL_DEF and len(expr) >= 3:
+            new = [operator, self.__hoist_expression(expr[1], invariants, temps), expr[2]] + [
+                self.__hoist_expression(arg, invariants, temps) for arg in expr[3:]
+            ]
+        else:
+            return expr
+        return self.__rebuilt(expr, new)
+
+    # the type name of an operation that gives the same result on every iteration and can't fail, or None
+    def __invariant_type(self, expr, invariants):
+        if type(expr) is not list:
+            value = self.__literal(expr)
+            if value is not None:
+                type_name = value.type().type_name
+                return type_name if type_name in PRIMITIVE_TYPE_NAMES else None
+            return invariants.get(expr)
+        if not expr or not (
+            (expr[0] in ObjectDef.binary_op_list and len(expr) == 3)
+            or (expr[0] in ObjectDef.unary_op_list and len(expr) == 2)
+        ):
+            return None
+        operand_types = [self.__invariant_type(operand, invariants) for operand in expr[1:]]
+        if None in operand_types:
+            return None
+        if expr[0] in ("/", "%"):
+            divisor = self.__literal(expr[2])
+            if divisor is None or divisor.value() == 0:
+                return None
+        return Optimizer.__result_type(expr[0], operand_types)
+
+    @staticmethod
+    def __key(expr):
+        if type(expr) is list:
+            return tuple(Optimizer.__key(item) for item in expr)
+        return str(expr)
+
+
+# formats code with one statement per line, nested statements indented
+def format_code(code, indent=0):
+    pad = "  " * indent
+    if type(code) is not list or not code:
+        return pad + _format_expression(code)
+    tok = code[0]
+    if tok in (InterpreterBase.BEGIN_DEF, InterpreterBase.LET_DEF, InterpreterBase.WHILE_DEF,
+               InterpreterBase.IF_DEF, InterpreterBase.TRY_DEF):
+        head = {
+            InterpreterBase.BEGIN_DEF: 1,
+            InterpreterBase.LET_DEF: 2,
+            InterpreterBase.WHILE_DEF: 2,
+            InterpreterBase.IF_DEF: 2,
+            InterpreterBase.TRY_DEF: 1,
+        }[tok]
+        lines = [pad + "(" + " ".join(_format_expression(item) for item in code[:head])]
+        lines.extend(format_code(statement, indent + 1) for statement in code[head:])
+        return "\n".join(lines) + ")"
+    return pad + _format_expression(code)
+
+
+def _format_expression(expr):
+    if type(expr) is not list:
+        return str(expr)
+    return "(" + " ".join(_format_expression(item) for item in expr) + ")"
+
+
+# loads and optimizes a program, returning every method as written and as optimized
+def dump_program(program):
+    from interpreterv3 import Interpreter
+
+    interpreter = Interpreter(console_output=False)
+    interpreter.load(program)
+    optimizer = Optimizer(interpreter)
+    optimizer.optimize_program()
+    listings = []
+    for class_def in list(interpreter.class_index.values()):
+        for method_def in class_def.get_methods():
+            listings.append(
+                f"{class_def.get_name()}.{method_def.method_name}, as written:\n"
+                + format_code(method_def.source_code, 1)
+                + "\noptimized:\n"
+                + format_code(method_def.code, 1)
+            )
+    stats = optimizer.stats
+    listings.append(
+        f"{stats['folded']} operations folded, {stats['pruned']} statements pruned, "
+        f"{stats['hoisted']} expressions hoisted"
+    )
+    return "\n\n".join(listings)
+
+
+if __name__ == "__main__":
+    if len(sys.argv) != 2:
+        print("usage: python optimizer.py program.br")
+        sys.exit(2)
+    with open(sys.argv[1]) as source:
+        print(dump_program(source.read().splitlines()))
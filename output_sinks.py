@@ -0,0 +1,182 @@
+"""
+Output sinks and output logs for the Interpreter.
+
+    Interpreter(output_sink=StdoutSink(batch_lines=4096))              # batched console output
+    Interpreter(output_sink=FileSink("out.txt"), output_log=RingLog(100))
+    Interpreter(output_sink=NullSink(), output_log=False)               # nothing is written or kept
+
+Every line a program prints goes to the interpreter's output sink (if any) and is appended to its output log
+(if any), which get_output() returns.
+
+Sinks have write(line), flush() and close(). Interpreter.run flushes its sink when the program ends, even if it
+fails, and before it reads from the keyboard. The batching sinks keep up to batch_lines lines and write them
+with a single call; with batch_lines=1 every line is written as soon as it is printed, which is what print()
+does and what the interpreter uses when it's given console_output=True and no sink. Batched console output can
+interleave differently with anything else written to stdout, such as trace_output.
+
+The output log is a list that keeps every line by default (output_log=True). output_log=False keeps nothing;
+otherwise it is any object with append() that can be iterated, such as RingLog (the last N lines) or SpillLog
+(every line, spilling to a temporary file). Interpreter.reset() keeps the same log for the next run, emptied by
+its clear() if it has one.
+"""
+
+import collections
+import json
+import os
+import sys
+import tempfile
+
+
+class OutputSink:
+    def write(self, line):
+        pass
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.flush()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+# batches lines for a text stream; stream=None writes to whatever sys.stdout is when a batch is written
+class StreamSink(OutputSink):
+    # flush_stream also flushes the stream after every batch, for output that must show up right away
+    def __init__(self, stream=None, batch_lines=1024, flush_stream=False):
+        if batch_lines < 1:
+            raise ValueError("batch_lines must be at least 1")
+        self.stream = stream
+        self.batch_lines = batch_lines
+        self.flush_stream = flush_stream
+        self.pending = []
+
+    def write(self, line):
+        if self.batch_lines == 1:
+            self.__write_text(line + "\n")
+            return
+        self.pending.append(line)
+        if len(self.pending) >= self.batch_lines:
+            self.__write_pending()
+
+    def flush(self):
+        self.__write_pending()
+        stream = sys.stdout if self.stream is None else self.stream
+        stream.flush()
+
+    def __write_pending(self):
+        if self.pending:
+            self.pending.append("")
+            self.__write_text("\n".join(self.pending))
+            self.pending = []
+
+    def __write_text(self, text):
+        stream = sys.stdout if self.stream is None else self.stream
+        stream.write(text)
+        if self.flush_stream:
+            stream.flush()
+
+
+class StdoutSink(StreamSink):
+    def __init__(self, batch_lines=1024, flush_stream=False):
+        super().__init__(None, batch_lines, flush_stream)
+
+
+# writes to a file the sink opens (path) and closes
+class FileSink(StreamSink):
+    def __init__(self, path, batch_lines=1024, encoding="utf-8"):
+        super().__init__(open(path, "w", encoding=encoding), batch_lines)
+
+    def close(self):
+        self.flush()
+        self.stream.close()
+
+
+class NullSink(OutputSink):
+    pass
+
+
+# calls callback(line) for every line
+class CallbackSink(OutputSink):
+    def __init__(self, callback):
+        self.callback = callback
+
+    def write(self, line):
+        self.callback(line)
+
+
+# output log that keeps only the last limit lines
+class RingLog:
+    def __init__(self, limit):
+        self.lines = collections.deque(maxlen=limit)
+        self.total = 0  # lines appended, including the ones that were dropped
+
+    def append(self, line):
+        self.lines.append(line)
+        self.total += 1
+
+    def dropped(self):
+        return self.total - len(self.lines)
+
+    def clear(self):
+        self.lines.clear()
+        self.total = 0
+
+    def __len__(self):
+        return len(self.lines)
+
+    def __iter__(self):
+        return iter(self.lines)
+
+
+# output log that keeps every line but at most memory_lines of them in memory; the rest go to a temporary file
+# (in directory, if given) that close() deletes
+class SpillLog:
+    def __init__(self, memory_lines=10000, directory=None):
+        if memory_lines < 1:
+            raise ValueError("memory_lines must be at least 1")
+        self.memory_lines = memory_lines
+        self.directory = directory
+        self.lines = []
+        self.spill = None
+        self.spilled = 0
+
+    def append(self, line):
+        self.lines.append(line)
+        if len(self.lines) >= self.memory_lines:
+            self.__spill()
+
+    # lines are stored as JSON strings, so lines containing newlines read back intact
+    def __spill(self):
+        if self.spill is None:
+            self.spill = tempfile.TemporaryFile("w+", encoding="utf-8", dir=self.directory)
+        self.spill.write("\n".join(map(json.dumps, self.lines)) + "\n")
+        self.spilled += len(self.lines)
+        self.lines = []
+
+    def __len__(self):
+        return self.spilled + len(self.lines)
+
+    def __iter__(self):
+        if self.spill is not None:
+            self.spill.flush()
+            self.spill.seek(0)
+            for _ in range(self.spilled):
+                yield json.loads(self.spill.readline())
+            self.spill.seek(0, os.SEEK_END)
+        yield from list(self.lines)
+
+    def close(self):
+        if self.spill is not None:
+            self.spill.close()
+            self.spill = None
+        self.lines = []
+        self.spilled = 0
+
+    # empties the log, deleting its file; a later append starts a new one
+    def clear(self):
+        self.close()
@@ -0,0 +1,245 @@
+"""
+Brewin-level profiler.
+
+    profiler = Profiler()                      # or Profiler(mode="sampling", interval=0.001)
+    Interpreter(profiler=profiler).run(program)
+    print(profiler.report())                   # methods sorted by exclusive time, hot call lines, allocations
+    profiler.write_collapsed("out.folded")     # for flamegraph.pl / speedscope
+
+    python profiler.py [--sampling] [--interval S] [--collapsed FILE] program.br
+
+The interpreter reports every method call (ObjectDef.call_method, whichever engine runs the body) and every
+object allocation (Interpreter.instantiate) to the profiler, which keeps a call tree of Brewin methods.
+Calls and allocations are always counted exactly: calls per method and per calling line, allocations per
+class and per allocating method.
+
+In deterministic mode every call is timed, giving exact inclusive and exclusive times. In sampling mode calls
+aren't timed; a timer thread periodically reads the node of the method currently running and charges it the
+time since the previous sample. That is much cheaper per call, and the times are estimates.
+
+Recursive calls are only counted once in a method's inclusive time.
+"""
+
+import argparse
+import sys
+import threading
+import time
+
+DETERMINISTIC = "deterministic"
+SAMPLING = "sampling"
+
+
+# one node per distinct Brewin call stack; children are keyed by MethodDef
+class CallNode:
+    __slots__ = (
+        "label",
+        "parent",
+        "children",
+        "calls",
+        "inclusive",
+        "exclusive",
+        "samples",
+        "allocations",
+    )
+
+    def __init__(self, label, parent):
+        self.label = label  # class.method, for the class that defines the method
+        self.parent = parent
+        self.children = {}
+        self.calls = 0
+        self.inclusive = 0.0  # seconds, including callees
+        self.exclusive = 0.0  # seconds spent in the method itself
+        self.samples = 0
+        self.allocations = 0
+
+    # labels from the outermost call down to this node
+    def stack(self):
+        labels = []
+        node = self
+        while node.parent is not None:
+            labels.append(node.label)
+            node = node.parent
+        labels.reverse()
+        return labels
+
+
+class Profiler:
+    MODES = (DETERMINISTIC, SAMPLING)
+
+    # interval is the time between samples, in seconds, in sampling mode
+    def __init__(self, mode=DETERMINISTIC, interval=0.001):
+        if mode not in Profiler.MODES:
+            raise ValueError(f"unknown profiler mode {mode}")
+        self.mode = mode
+        self.interval = interval
+        self.root = CallNode("<interpreter>", None)
+        self.current = self.root
+        self.frames = []  # deterministic mode: [start time, time spent in callees] per active call
+        self.line_calls = {}  # (caller line, callee label) -> calls
+        self.allocations_by_class = {}  # class name -> objects created
+        self.elapsed = 0.0
+        self.started_at = None
+        self.sampler = None
+        self.stopping = None
+
+    # called by Interpreter.run around the program
+    def start(self):
+        self.started_at = time.perf_counter()
+        if self.mode == SAMPLING:
+            self.stopping = threading.Event()
+            self.sampler = threading.Thread(target=self.__sample, name="brewin-profiler", daemon=True)
+            self.sampler.start()
+
+    def stop(self):
+        if self.started_at is None:
+            return
+        if self.sampler is not None:
+            self.stopping.set()
+            self.sampler.join()
+            self.sampler = None
+        self.elapsed += time.perf_counter() - self.started_at
+        self.started_at = None
+        # a Python error can unwind past calls that never exited
+        self.current = self.root
+        del self.frames[:]
+
+    def __sample(self):
+        last = time.perf_counter()
+        while not self.stopping.wait(self.interval):
+            now = time.perf_counter()
+            node = self.current
+            node.samples += 1
+            node.exclusive += now - last
+            last = now
+
+    # hooks
+
+    def enter(self, method_def, line_num_of_caller):
+        parent = self.current
+        node = parent.children.get(method_def)
+        if node is None:
+            node = CallNode(f"{method_def.class_def.get_name()}.{method_def.method_name}", parent)
+            parent.children[method_def] = node
+        node.calls += 1
+        key = (line_num_of_caller, node.label)
+        self.line_calls[key] = self.line_calls.get(key, 0) + 1
+        self.current = node
+        if self.mode == DETERMINISTIC:
+            self.frames.append([time.perf_counter(), 0.0])
+
+    def exit(self):
+        node = self.current
+        if self.mode == DETERMINISTIC and self.frames:
+            start, callee_time = self.frames.pop()
+            elapsed = time.perf_counter() - start
+            node.inclusive += elapsed
+            node.exclusive += elapsed - callee_time
+            if self.frames:
+                self.frames[-1][1] += elapsed
+        if node.parent is not None:
+            self.current = node.parent
+
+    def allocation(self, class_name):
+        self.allocations_by_class[class_name] = self.allocations_by_class.get(class_name, 0) + 1
+        self.current.allocations += 1
+
+    # results
+
+    # {label: {"calls", "inclusive", "exclusive", "samples", "allocations"}}; times in seconds
+    def method_stats(self):
+        stats = {}
+        self.__collect(self.root, stats, {})
+        return stats
+
+    # returns the subtree's sampled time; active counts the calls of each method on the path to node
+    def __collect(self, node, stats, active):
+        subtree_time = node.exclusive
+        for child in node.children.values():
+            active[child.label] = active.get(child.label, 0) + 1
+            child_time = self.__collect(child, stats, active)
+            active[child.label] -= 1
+            subtree_time += child_time
+            entry = stats.setdefault(
+                child.label, {"calls": 0, "inclusive": 0.0, "exclusive": 0.0, "samples": 0, "allocations": 0}
+            )
+            entry["calls"] += child.calls
+            entry["exclusive"] += child.exclusive
+            entry["samples"] += child.samples
+            entry["allocations"] += child.allocations
+            if active[child.label] == 0:  # outermost call of a recursive method
+                entry["inclusive"] += child.inclusive if self.mode == DETERMINISTIC else child_time
+        return subtree_time
+
+    # collapsed stacks ("main.main;node.walk 42"), one per distinct call stack: exclusive microseconds in
+    # deterministic mode, samples in sampling mode
+    def collapsed(self):
+        lines = []
+        pending = list(self.root.children.values())
+        while pending:
+            node = pending.pop()
+            pending.extend(node.children.values())
+            weight = round(node.exclusive * 1e6) if self.mode == DETERMINISTIC else node.samples
+            if weight > 0:
+                lines.append(f"{';'.join(node.stack())} {weight}")
+        lines.sort()
+        return lines
+
+    def write_collapsed(self, path):
+        with open(path, "w") as output:
+            for line in self.collapsed():
+                output.write(line + "\n")
+
+    # text report: methods by exclusive time, then the busiest call lines and allocations by class
+    def report(self, limit=20):
+        stats = self.method_stats()
+        total_calls = sum(entry["calls"] for entry in stats.values())
+        lines = [f"{self.mode} profile: {self.elapsed * 1000:.1f} ms, {total_calls} calls"]
+        if self.mode == SAMPLING:
+            lines[0] += f", {sum(entry['samples'] for entry in stats.values())} samples (times are estimates)"
+        lines.append("")
+        lines.append(f"{'method':<32} {'calls':>9} {'incl ms':>10} {'excl ms':>10} {'excl %':>7} {'allocs':>8}")
+        total_time = sum(entry["exclusive"] for entry in stats.values()) or 1.0
+        ranked = sorted(stats.items(), key=lambda item: (-item[1]["exclusive"], -item[1]["calls"], item[0]))
+        for label, entry in ranked[:limit]:
+            lines.append(
+                f"{label:<32} {entry['calls']:>9} {entry['inclusive'] * 1000:>10.2f} "
+                f"{entry['exclusive'] * 1000:>10.2f} {100 * entry['exclusive'] / total_time:>6.1f}% "
+                f"{entry['allocations']:>8}"
+            )
+        lines.append("")
+        lines.append(f"{'line':>6}  {'calls to':<32} {'calls':>9}")
+        hot_lines = sorted(self.line_calls.items(), key=lambda item: (-item[1], str(item[0][0]), item[0][1]))
+        for (line_num, label), calls in hot_lines[:limit]:
+            lines.append(f"{str(line_num if line_num is not None else '-'):>6}  {label:<32} {calls:>9}")
+        lines.append("")
+        lines.append(f"{'class':<32} {'allocations':>11}")
+        for class_name, count in sorted(self.allocations_by_class.items(), key=lambda item: (-item[1], item[0])):
+            lines.append(f"{class_name:<32} {count:>11}")
+        return "\n".join(lines)
+
+
+def main(argv):
+    from interpreterv3 import Interpreter
+
+    arg_parser = argparse.ArgumentParser(description="Profile a Brewin program.")
+    arg_parser.add_argument("program")
+    arg_parser.add_argument("--sampling", action="store_true", help="sample instead of timing every call")
+    arg_parser.add_argument("--interval", type=float, default=0.001, help="seconds between samples")
+    arg_parser.add_argument("--engine", default="tree", choices=sorted(Interpreter.ENGINES))
+    arg_parser.add_argument("--collapsed", metavar="FILE", help="also write collapsed stacks to FILE")
+    args = arg_parser.parse_args(argv)
+
+    with open(args.program) as source:
+        program = source.read().splitlines()
+    profiler = Profiler(SAMPLING if args.sampling else DETERMINISTIC, args.interval)
+    try:
+        Interpreter(engine=args.engine, profiler=profiler).run(program)
+    finally:
+        print(profiler.report(), file=sys.stderr)
+        if args.collapsed:
+            profiler.write_collapsed(args.collapsed)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,57 @@
+"""
+Compile-once Brewin programs, for running the same program many times with different inputs.
+
+    program = Program(source_lines, type_check=True)       # parses, loads, checks and optimizes, once
+    for inputs in input_sets:
+        interpreter = Interpreter(console_output=False, inp=inputs)
+        interpreter.run(program)                            # no parsing or class loading
+        results.append((interpreter.get_output(), interpreter.get_error_type_and_line()))
+
+A Program holds what Interpreter.run builds before calling main: the TypeManager and the class and template
+class indexes, with every template instantiation the program names already built (by a TypeChecker pass),
+the type checker's verified statements installed if type_check is set, and the methods optimized if optimize
+is set. After construction nothing adds to or changes it, so any number of interpreters can run it one after
+another, each with its own inputs, output, engine, limits and error state; an interpreter given a Program
+just adopts those tables, and the type_check and optimize settings of the Program apply rather than its own.
+
+A program that fails to load (a syntax error, an invalid class) still makes a Program: its error is kept, and
+every interpreter that runs it reports that error, with the same error type and line, just as running the
+source would.
+
+Interpreters running a Program share its parsed code, so the tree walker's quickened operators (see
+QuickOperator) carry over from one run to the next. Their counters are shared too: get_quickening_stats() on
+any interpreter that ran the Program reports every specialization, deoptimization and hit made on its code.
+"""
+
+from objectv2 import Quickening
+from typechecker import TypeChecker
+
+
+class Program:
+    # source is a list of source lines; program_cache is an optional ProgramCache used to load it
+    def __init__(self, source, type_check=False, optimize=False, program_cache=None):
+        from interpreterv3 import Interpreter
+
+        loader = Interpreter(
+            console_output=False, type_check=type_check, optimize=optimize, program_cache=program_cache
+        )
+        self.type_check = type_check
+        self.optimize = optimize
+        self.error = None  # (error type, description, line number) if the program failed to load
+        self.quickening = Quickening()
+        try:
+            loader.load(source)
+            if type_check:
+                loader.check_types()
+            else:
+                TypeChecker(loader).check()  # only for the template instantiations it makes
+            if optimize:
+                loader.optimize_program()
+        except RuntimeError as error:
+            self.error = (loader.error_type, loader.error_description(error), loader.error_line)
+            return
+        self.type_manager = loader.type_manager
+        self.template_class_index = loader.template_class_index
+        self.class_index = loader.class_index
+        self.optimizer = loader.optimizer
+        self.quickening = loader.quickening
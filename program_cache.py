@@ -0,0 +1,220 @@
+"""
+On-disk cache of loaded program images, so re-running the same source skips BParser.parse and the
+class-loading passes.
+
+Usage:
+    cache = ProgramCache("/tmp/brewin-cache", max_bytes=64 * 1024 * 1024)
+    Interpreter(program_cache=cache).run(program)
+
+An image is the interpreter state built by Interpreter.load(): the TypeManager, template_class_index and
+class_index. Entries are content addressed: the file name is a hash of the source lines, the interpreter
+version and a fingerprint of the modules whose objects make up the image, so editing either the program
+or the interpreter can never produce a stale hit. Each file is a small versioned header (magic, format
+version, payload length and SHA-256) followed by a pickled payload; entries that fail any check are
+deleted and treated as misses. Least recently used entries are evicted once the directory grows past
+max_bytes.
+
+Entries are unpickled, so the cache directory must be as trusted as the interpreter's own source.
+"""
+
+import hashlib
+import io
+import os
+import pickle
+import struct
+import sys
+import tempfile
+
+MAGIC = b"BRWNIMG\0"
+FORMAT_VERSION = 1
+HEADER = struct.Struct(">8sHQ32s")  # magic, format version, payload length, payload sha256
+ENTRY_SUFFIX = ".img"
+
+# modules whose classes are stored in an image; their source is part of every key
+IMAGE_MODULES = ("bparser", "intbase", "type_valuev2", "classv2", "interpreterv3", "program_cache")
+INTERPRETER_PLACEHOLDER = "interpreter"
+
+
+class ProgramCache:
+    def __init__(self, directory, max_bytes=256 * 1024 * 1024):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalid = 0  # corrupt or stale entries that were discarded
+        os.makedirs(directory, exist_ok=True)
+
+    # restores a cached image of program into interpreter; returns False on a miss
+    def load(self, program, interpreter):
+        path = self.__path(self.key(program, interpreter))
+        try:
+            with open(path, "rb") as entry:
+                data = entry.read()
+        except OSError:
+            self.misses += 1
+            return False
+        image = self.__decode(data, interpreter)
+        if image is None:
+            self.invalid += 1
+            self.misses += 1
+            self.__remove(path)
+            return False
+        interpreter.type_manager = image["type_manager"]
+        interpreter.template_class_index = image["template_class_index"]
+        interpreter.class_index = image["class_index"]
+        self.hits += 1
+        try:
+            os.utime(path)  # mark as recently used
+        except OSError:
+            pass
+        return True
+
+    # saves the image interpreter just loaded for program; images that can't be pickled are skipped
+    def store(self, program, interpreter):
+        image = {
+            "type_manager": interpreter.type_manager,
+            "template_class_index": interpreter.template_class_index,
+            "class_index": interpreter.class_index,
+        }
+        try:
+            payload = self.__encode(image, interpreter)
+        except (pickle.PicklingError, RecursionError, TypeError, AttributeError):
+            return False
+        header = HEADER.pack(MAGIC, FORMAT_VERSION, len(payload), hashlib.sha256(payload).digest())
+        if len(header) + len(payload) > self.max_bytes:
+            return False
+        path = self.__path(self.key(program, interpreter))
+        fd, temp_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as entry:
+                entry.write(header)
+                entry.write(payload)
+            os.replace(temp_path, path)  # readers never see a partially written entry
+        except OSError:
+            self.__remove(temp_path)
+            return False
+        self.__evict()
+        return True
+
+    def key(self, program, interpreter):
+        digest = hashlib.sha256()
+        digest.update(f"{FORMAT_VERSION}\0{interpreter.VERSION}\0{code_fingerprint()}\0".encode())
+        for line in program:
+            encoded = line.encode("utf-8", "surrogatepass")
+            digest.update(struct.pack(">Q", len(encoded)))
+            digest.update(encoded)
+        return digest.hexdigest()
+
+    def clear(self):
+        for path, _, _ in self.__entries():
+            self.__remove(path)
+
+    def __path(self, key):
+        return os.path.join(self.directory, key + ENTRY_SUFFIX)
+
+    # (path, size, last use) for every entry, least recently used first
+    def __entries(self):
+        entries = []
+        try:
+            names = os.listdir(self.directory)
+        except OSError:
+            return entries
+        for name in names:
+            if not name.endswith(ENTRY_SUFFIX):
+                continue
+            path = os.path.join(self.directory, name)
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            entries.append((path, stat.st_size, stat.st_mtime))
+        entries.sort(key=lambda entry: entry[2])
+        return entries
+
+    def __evict(self):
+        entries = self.__entries()
+        total = sum(size for _, size, _ in entries)
+        for path, size, _ in entries:
+            if total <= self.max_bytes:
+                break
+            self.__remove(path)
+            total -= size
+            self.evictions += 1
+
+    @staticmethod
+    def __remove(path):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+    @staticmethod
+    def __encode(image, interpreter):
+        buffer = io.BytesIO()
+        pickler = _ImagePickler(buffer, interpreter)
+        pickler.dump(image)
+        return buffer.getvalue()
+
+    # returns the image, or None if the entry is truncated, corrupt or from another format version
+    @staticmethod
+    def __decode(data, interpreter):
+        if len(data) < HEADER.size:
+            return None
+        magic, version, length, checksum = HEADER.unpack_from(data)
+        payload = data[HEADER.size:]
+        if magic != MAGIC or version != FORMAT_VERSION or length != len(payload):
+            return None
+        if hashlib.sha256(payload).digest() != checksum:
+            return None
+        try:
+            image = _ImageUnpickler(io.BytesIO(payload), interpreter).load()
+        except Exception:  # pylint: disable=broad-except
+            return None
+        if not isinstance(image, dict) or set(image) != {"type_manager", "template_class_index", "class_index"}:
+            return None
+        return image
+
+
+# class definitions hold a reference to their interpreter; it is written as a placeholder and re-bound to
+# the loading interpreter
+class _ImagePickler(pickle.Pickler):
+    def __init__(self, file, interpreter):
+        super().__init__(file, protocol=pickle.HIGHEST_PROTOCOL)
+        self.interpreter = interpreter
+
+    def persistent_id(self, obj):
+        if obj is self.interpreter:
+            return INTERPRETER_PLACEHOLDER
+        return None
+
+
+class _ImageUnpickler(pickle.Unpickler):
+    def __init__(self, file, interpreter):
+        super().__init__(file)
+        self.interpreter = interpreter
+
+    def persistent_load(self, pid):
+        if pid != INTERPRETER_PLACEHOLDER:
+            raise pickle.UnpicklingError(f"unknown persistent id {pid!r}")
+        return self.interpreter
+
+
+_fingerprint = None
+
+
+# hash of the source of IMAGE_MODULES, computed once per process
+def code_fingerprint():
+    global _fingerprint
+    if _fingerprint is None:
+        digest = hashlib.sha256()
+        for name in IMAGE_MODULES:
+            module = sys.modules.get(name)
+            path = getattr(module, "__file__", None)
+            if path is None:
+                digest.update(f"{name}:missing\0".encode())
+                continue
+            with open(path, "rb") as source:
+                digest.update(source.read())
+        _fingerprint = digest.hexdigest()
+    return _fingerprint
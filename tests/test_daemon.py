@@ -0,0 +1,20 @@
+from batch_runner import CRASH, OK
+from daemon import Daemon
+
+SOURCE = ["(class main (method void main () (print 42)))"]
+
+
+# a worker that died while idle is replaced, and the request that found it dead reports a crash
+def test_dead_worker_is_replaced():
+    for timeout in (None, 10):
+        daemon = Daemon(workers=1, timeout=timeout)
+        try:
+            worker = daemon.idle[0]
+            worker.process.kill()
+            worker.process.join()
+            assert daemon.handle({"source": SOURCE})["status"] == CRASH
+            assert daemon.idle and daemon.idle[0] is not worker
+            response = daemon.handle({"source": SOURCE})
+            assert (response["status"], response["output"]) == (OK, ["42"])
+        finally:
+            daemon.close()
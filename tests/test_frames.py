@@ -0,0 +1,86 @@
+from intbase import ErrorType
+from interpreterv3 import Interpreter
+
+
+# (output, error type, error line) of running source, a string of Brewin code
+def run(source, **options):
+    interpreter = Interpreter(console_output=False, **options)
+    try:
+        interpreter.run(source.strip().splitlines())
+    except RuntimeError:
+        pass
+    return interpreter.get_output(), *interpreter.get_error_type_and_line()
+
+
+def test_locals_shadow_params_and_fields():
+    source = """
+(class main
+  (field int x 100)
+  (method void f ((int x) (int y))
+    (begin
+      (let ((int x 1))
+        (print x " " y)
+        (let ((int x 3)) (set x 4) (print x))
+        (print x))
+      (print x)
+      (let ((int z 9)) (print z))))
+  (method void main ()
+    (begin
+      (call me f 10 20)
+      (print x))))
+"""
+    assert run(source) == (["1 20", "4", "1", "10", "9", "100"], None, None)
+
+
+# a caught exception is bound in the innermost block, and the end of the catch pops that block: the let's
+# locals go away and its names fall through to the parameters; the end of the let then pops the parameters
+def test_catch_pops_the_innermost_block():
+    source = """
+(class main
+  (field int x 100)
+  (method void f ((int x) (int y))
+    (begin
+      (let ((int x 1) (int z 2))
+        (try (throw "boom") (print exception " " x " " z))
+        (print x " " y))
+      (print x)))
+  (method void main ()
+    (call me f 10 20)))
+"""
+    assert run(source) == (["boom 1 2", "10 20", "100"], None, None)
+
+
+def test_duplicate_params_and_locals():
+    params = """
+(class main
+  (method void f ((int a) (int a)) (print a))
+  (method void main ()
+    (call me f 1 2)))
+"""
+    assert run(params) == ([], ErrorType.NAME_ERROR, 1)
+    locals_ = """
+(class main
+  (method void main ()
+    (let ((int a 1)) (let ((int a 2) (int a 3)) (print a)))))
+"""
+    assert run(locals_) == ([], ErrorType.NAME_ERROR, 2)
+    exception = """
+(class main
+  (method void main ()
+    (let ((string exception "x")) (try (throw "a") (print exception)))))
+"""
+    assert run(exception) == ([], ErrorType.NAME_ERROR, 2)
+
+
+def test_the_engines_agree():
+    source = """
+(class main
+  (method int sum ((int n))
+    (let ((int i 0) (int s 0))
+      (while (< i n) (let ((int j 0)) (set j (* i 2)) (set s (+ s j)) (set i (+ i 1))))
+      (return s)))
+  (method void main ()
+    (print (call me sum 10))))
+"""
+    for engine in ("tree", "closure", "bytecode"):
+        assert run(source, engine=engine) == (["90"], None, None)
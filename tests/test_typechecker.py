@@ -0,0 +1,148 @@
+from intbase import ErrorType
+from interpreterv3 import Interpreter
+
+
+# (output, error type, error line) of running source, a string of Brewin code
+def run(source, **options):
+    interpreter = Interpreter(console_output=False, **options)
+    try:
+        interpreter.run(source.strip().splitlines())
+    except RuntimeError:
+        pass
+    return interpreter.get_output(), *interpreter.get_error_type_and_line()
+
+
+def validate(source):
+    return Interpreter(console_output=False).validate(source.strip().splitlines())
+
+
+# a template method that only type checks for some type arguments (compare_to_5 for Foo@Duck) is not an error
+# unless something calls it with them
+TEMPLATE_METHODS = """
+(tclass Foo (field_type)
+  (method void chatter ((field_type x))
+    (call x quack))
+  (method bool compare_to_5 ((field_type x))
+    (return (== x 5))))
+(class Duck
+  (method void quack () (print "quack")))
+(class main
+  (field Foo@Duck t1)
+  (field Foo@int t2)
+  (method void main ()
+    (begin
+      (set t1 (new Foo@Duck))
+      (set t2 (new Foo@int))
+      (call t1 chatter (new Duck))
+      (print (call t2 compare_to_5 5))
+      {last})))
+"""
+
+
+def test_unreached_template_method_passes():
+    source = TEMPLATE_METHODS.format(last='(print "done")')
+    assert validate(source) == []
+    assert run(source, type_check=True) == (["quack", "true", "done"], None, None)
+
+
+def test_reached_template_method_error_matches_runtime():
+    source = TEMPLATE_METHODS.format(last="(call (new Foo@Duck) chatter 10)")
+    assert run(source) == (["quack", "true"], ErrorType.NAME_ERROR, 16)
+    assert run(source, type_check=True) == ([], ErrorType.NAME_ERROR, 16)
+
+
+def test_template_method_reached_with_bad_type_arguments():
+    source = TEMPLATE_METHODS.format(last="(call (new Foo@Duck) compare_to_5 (new Duck))")
+    assert run(source, type_check=True) == ([], ErrorType.TYPE_ERROR, 4)
+
+
+def test_while_false_body_is_not_checked():
+    source = """
+(class main
+  (method void main ()
+    (begin (while false (print (+ 1 "z"))) (print "end"))))
+"""
+    assert validate(source) == []
+    assert run(source, type_check=True) == (["end"], None, None)
+
+
+def test_if_branch_ruled_out_is_not_checked():
+    source = """
+(class main
+  (method void main ()
+    (begin
+      (if true (print "then") (print (+ 1 "z")))
+      (if false (print (+ 1 "z")))
+      (print "end"))))
+"""
+    assert validate(source) == []
+    assert run(source, type_check=True) == (["then", "end"], None, None)
+
+
+def test_if_branch_that_runs_is_checked():
+    source = """
+(class main
+  (method void main ()
+    (if false (print "then") (print (+ 1 "z")))))
+"""
+    assert run(source, type_check=True) == ([], ErrorType.TYPE_ERROR, 2)
+
+
+def test_statements_after_return_are_not_checked():
+    source = """
+(class main
+  (method int f () (begin (return 1) (return "bad")))
+  (method int g () (let ((int x 0)) (if true (return x) (return 2)) (set x "bad")))
+  (method void main () (begin (print (call me f)) (print (call me g)))))
+"""
+    assert validate(source) == []
+    assert run(source, type_check=True) == (["1", "0"], None, None)
+
+
+def test_statements_after_throw_are_not_checked():
+    source = """
+(class main
+  (method void f () (begin (throw "bye") (print (+ 1 "z"))))
+  (method void main () (try (call me f) (print exception))))
+"""
+    assert validate(source) == []
+    assert run(source, type_check=True) == (["bye"], None, None)
+
+
+def test_statements_after_a_return_that_may_not_run_are_checked():
+    source = """
+(class main
+  (method int f ((bool b)) (begin (if b (return 1)) (return "bad")))
+  (method void main () (print (call me f true))))
+"""
+    assert run(source, type_check=True) == ([], ErrorType.TYPE_ERROR, 1)
+
+
+# a field of a class type may be null, and a call on a null receiver faults before the method is looked up
+NULL_RECEIVER = """
+(class Dog
+  (method void bark () (print "woof")))
+(class main
+  (field Dog d)
+  (method void main ()
+    (begin
+      (print "start")
+      {call})))
+"""
+
+
+def test_guarded_call_on_null_receiver_passes():
+    source = NULL_RECEIVER.format(call="(if (!= d null) (call d meow (+ 1 \"z\")))")
+    assert validate(source) == []
+    assert run(source, type_check=True) == (["start"], None, None)
+
+
+def test_unguarded_call_on_null_receiver_faults():
+    source = NULL_RECEIVER.format(call="(call d meow)")
+    assert run(source) == (["start"], ErrorType.FAULT_ERROR, 7)
+    assert run(source, type_check=True) == (["start"], ErrorType.FAULT_ERROR, 7)
+
+
+def test_unknown_method_of_new_object_is_reported():
+    source = NULL_RECEIVER.format(call="(call (new Dog) meow)")
+    assert run(source, type_check=True) == ([], ErrorType.NAME_ERROR, 7)
@@ -0,0 +1,374 @@
+"""
+Structured execution tracing.
+
+    tracer = Tracer("run.trace")                    # compact binary; Tracer("run.jsonl", fmt="jsonl") for JSON lines
+    Interpreter(tracer=tracer).run(program)
+    tracer.close()
+
+    python tracer.py run.trace                      # render a trace as indented text
+    python tracer.py --json run.trace               # or as JSON lines
+
+The interpreter reports every method call and return (ObjectDef.call_method) and every statement it is about
+to execute, whichever engine runs it, to the tracer. Events are encoded into an in-memory buffer that is
+written to the sink whenever it grows past buffer_size, when a run ends (finish()) and on close(), so tracing
+costs one small record per event instead of a formatted print of the whole statement.
+Interpreter(trace_output=True) still prints every statement, with or without a tracer.
+
+Every event carries the call depth. Events are:
+    call    depth, line (of the caller), class (of the object), method (class.method that runs), args
+    stmt    depth, line, kind (begin, set, if, ...), class, method
+    return  depth, class, method, status (return, throw, or abort for a Python error), value
+args and value are only recorded with values=True; values are rendered as Brewin literals (objects as
+<class>).
+
+Filters: methods only records events of the named methods (a method name or class.method), lines=(first,
+last) only records statements on those lines, and every=N keeps every Nth event that passes the filters.
+
+The binary format is a header (MAGIC, format version) followed by records that each start with a tag byte.
+Names (classes, methods, statement kinds) are written once as STRING records and referenced by id afterwards.
+"""
+
+import argparse
+import json
+import os
+import struct
+import sys
+
+from intbase import InterpreterBase
+from type_valuev2 import BOOL_TYPE, NOTHING_TYPE, STRING_TYPE, create_default_value, flatten
+
+BINARY = "binary"
+JSONL = "jsonl"
+
+MAGIC = b"BRWNTRC\0"
+FORMAT_VERSION = 1
+FILE_HEADER = struct.Struct(">8sH")
+
+# record tags
+STRING = 0
+STMT = 1
+CALL = 2
+RETURN = 3
+
+STRING_RECORD = struct.Struct(">BII")  # tag, id, length; followed by the utf-8 bytes
+STMT_RECORD = struct.Struct(">BIIIII")  # tag, depth, line, kind id, class id, method id
+CALL_RECORD = struct.Struct(">BIIIIH")  # tag, depth, line, class id, method id, argument count; then the args
+RETURN_RECORD = struct.Struct(">BIIIB")  # tag, depth, class id, method id, status; then the value
+LENGTH = struct.Struct(">I")  # prefix of a value's utf-8 bytes
+NO_LINE = 0xFFFFFFFF
+NO_VALUE = 0xFFFFFFFF
+NO_ARGS = 0xFFFF
+
+STATUSES = ("return", "throw", "abort")
+
+
+# renders a Value the way Brewin source would spell it
+def describe_value(value):
+    if value is None:
+        return "null"
+    val = value.value()
+    if value.type() is BOOL_TYPE:
+        return InterpreterBase.TRUE_DEF if val else InterpreterBase.FALSE_DEF
+    if value.type() is STRING_TYPE:
+        return json.dumps(flatten(val))
+    if val is None:
+        return InterpreterBase.NULL_DEF
+    if type(val) is int:
+        return str(val)
+    return f"<{val.class_def.get_name()}>"
+
+
+class Tracer:
+    FORMATS = (BINARY, JSONL)
+
+    # sink is a path or a binary file object; the tracer closes only the files it opened
+    def __init__(
+        self, sink, fmt=BINARY, methods=None, lines=None, every=1, values=False, buffer_size=64 * 1024
+    ):
+        if fmt not in Tracer.FORMATS:
+            raise ValueError(f"unknown trace format {fmt}")
+        if every < 1:
+            raise ValueError("every must be at least 1")
+        if isinstance(sink, (str, os.PathLike)):
+            self.output = open(sink, "wb")
+            self.owns_output = True
+        else:
+            self.output = sink
+            self.owns_output = False
+        self.binary = fmt == BINARY
+        self.methods = None if methods is None else frozenset(methods)
+        self.lines = lines
+        self.every = every
+        self.values = values
+        self.buffer_size = buffer_size
+        self.buffer = bytearray()
+        self.names = {}  # name -> id (binary) or JSON string (jsonl)
+        self.labels = {}  # MethodDef -> class.method
+        self.stack = []  # (MethodDef, traced, class key, method key) per active call
+        self.passed = 0  # events that passed the filters, for every=N
+        self.events = 0  # events written
+        if self.binary:
+            self.buffer += FILE_HEADER.pack(MAGIC, FORMAT_VERSION)
+
+    # hooks
+
+    def enter(self, obj, method_def, actual_params, line_num_of_caller):
+        label = self.labels.get(method_def)
+        if label is None:
+            label = f"{method_def.class_def.get_name()}.{method_def.method_name}"
+            self.labels[method_def] = label
+        if self.methods is None or label in self.methods or method_def.method_name in self.methods:
+            # statements run on obj, so the frame keeps its encoded class and method names for them
+            frame = (method_def, True, self.__name(obj.class_def.get_name()), self.__name(label))
+        else:
+            frame = (method_def, False, None, None)
+        self.stack.append(frame)
+        if frame[1] and self.__sampled():
+            args = [describe_value(actual) for actual in actual_params] if self.values else None
+            self.__call(len(self.stack) - 1, line_num_of_caller, frame[2], frame[3], args)
+
+    # status is None when a Python error unwinds the call
+    def exit(self, status, return_value):
+        method_def, traced, class_key, method_key = self.stack.pop()
+        if not traced or not self.__sampled():
+            return
+        if status is None:
+            status_index = 2
+        elif status == 2:  # ObjectDef.STATUS_ERROR: the method threw return_value
+            status_index = 1
+        else:
+            status_index = 0
+        value = None
+        if self.values and status is not None:
+            if return_value is None and status_index == 0:
+                return_value = create_default_value(method_def.get_return_type())
+            if return_value.type() is not NOTHING_TYPE:  # void methods return nothing
+                value = describe_value(return_value)
+        self.__return(len(self.stack), class_key, method_key, status_index, value)
+
+    def statement(self, obj, code):
+        frame = self.stack[-1]
+        if not frame[1]:
+            return
+        line_num = code[0].line_num
+        if self.lines is not None and not self.lines[0] <= line_num <= self.lines[1]:
+            return
+        self.passed += 1
+        if self.every != 1 and self.passed % self.every:
+            return
+        kind_key = self.names.get(code[0])
+        if kind_key is None:
+            kind_key = self.__name(code[0])
+        if self.binary:
+            self.buffer += STMT_RECORD.pack(STMT, len(self.stack), line_num, kind_key, frame[2], frame[3])
+        else:
+            self.buffer += (
+                f'{{"event":"stmt","depth":{len(self.stack)},"line":{line_num},"kind":{kind_key},'
+                f'"class":{frame[2]},"method":{frame[3]}}}\n'
+            ).encode()
+        self.events += 1
+        if len(self.buffer) >= self.buffer_size:
+            self.flush()
+
+    def __sampled(self):
+        self.passed += 1
+        return self.every == 1 or self.passed % self.every == 0
+
+    # encoding; names are written once and then referred to by key: an id in binary traces, a JSON string in
+    # JSON lines
+
+    def __name(self, name):
+        key = self.names.get(name)
+        if key is None:
+            if self.binary:
+                key = len(self.names)
+                data = str(name).encode()
+                self.buffer += STRING_RECORD.pack(STRING, key, len(data))
+                self.buffer += data
+            else:
+                key = json.dumps(str(name))
+            self.names[name] = key
+        return key
+
+    def __call(self, depth, line_num, class_key, method_key, args):
+        if self.binary:
+            self.buffer += CALL_RECORD.pack(
+                CALL,
+                depth,
+                NO_LINE if line_num is None else line_num,
+                class_key,
+                method_key,
+                NO_ARGS if args is None else len(args),
+            )
+            for arg in args or ():
+                self.__value(arg)
+        else:
+            text = (
+                f'{{"event":"call","depth":{depth},"line":{json.dumps(line_num)},'
+                f'"class":{class_key},"method":{method_key}'
+            )
+            if args is not None:
+                text += f',"args":{json.dumps(args)}'
+            self.buffer += (text + "}\n").encode()
+        self.__written()
+
+    def __return(self, depth, class_key, method_key, status_index, value):
+        if self.binary:
+            self.buffer += RETURN_RECORD.pack(RETURN, depth, class_key, method_key, status_index)
+            if value is None:
+                self.buffer += LENGTH.pack(NO_VALUE)
+            else:
+                self.__value(value)
+        else:
+            text = (
+                f'{{"event":"return","depth":{depth},"class":{class_key},"method":{method_key},'
+                f'"status":"{STATUSES[status_index]}"'
+            )
+            if value is not None:
+                text += f',"value":{json.dumps(value)}'
+            self.buffer += (text + "}\n").encode()
+        self.__written()
+
+    def __value(self, text):
+        data = text.encode()
+        self.buffer += LENGTH.pack(len(data))
+        self.buffer += data
+
+    def __written(self):
+        self.events += 1
+        if len(self.buffer) >= self.buffer_size:
+            self.flush()
+
+    # output
+
+    def flush(self):
+        if self.buffer:
+            self.output.write(self.buffer)
+            self.buffer = bytearray()
+        self.output.flush()
+
+    # called by Interpreter.run when the program ends
+    def finish(self):
+        # a Python error can unwind past calls that never exited
+        del self.stack[:]
+        self.flush()
+
+    def close(self):
+        self.flush()
+        if self.owns_output:
+            self.output.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+# reading
+
+# yields the events of a trace file (either format) as dicts
+def read_trace(path):
+    with open(path, "rb") as source:
+        data = source.read()
+    if not data.startswith(MAGIC):
+        for line in data.decode().splitlines():
+            if line:
+                yield json.loads(line)
+        return
+    magic, version = FILE_HEADER.unpack_from(data, 0)
+    if version != FORMAT_VERSION:
+        raise ValueError(f"unsupported trace format version {version}")
+    names = []
+    offset = FILE_HEADER.size
+    while offset < len(data):
+        tag = data[offset]
+        if tag == STRING:
+            _, name_id, length = STRING_RECORD.unpack_from(data, offset)
+            offset += STRING_RECORD.size
+            names.append(data[offset:offset + length].decode())
+            offset += length
+        elif tag == STMT:
+            _, depth, line_num, kind_id, class_id, method_id = STMT_RECORD.unpack_from(data, offset)
+            offset += STMT_RECORD.size
+            yield {
+                "event": "stmt",
+                "depth": depth,
+                "line": line_num,
+                "kind": names[kind_id],
+                "class": names[class_id],
+                "method": names[method_id],
+            }
+        elif tag == CALL:
+            _, depth, line_num, class_id, method_id, argc = CALL_RECORD.unpack_from(data, offset)
+            offset += CALL_RECORD.size
+            event = {
+                "event": "call",
+                "depth": depth,
+                "line": None if line_num == NO_LINE else line_num,
+                "class": names[class_id],
+                "method": names[method_id],
+            }
+            if argc != NO_ARGS:
+                event["args"] = []
+                for _ in range(argc):
+                    value, offset = _read_value(data, offset)
+                    event["args"].append(value)
+            yield event
+        elif tag == RETURN:
+            _, depth, class_id, method_id, status_index = RETURN_RECORD.unpack_from(data, offset)
+            offset += RETURN_RECORD.size
+            value, offset = _read_value(data, offset)
+            event = {
+                "event": "return",
+                "depth": depth,
+                "class": names[class_id],
+                "method": names[method_id],
+                "status": STATUSES[status_index],
+            }
+            if value is not None:
+                event["value"] = value
+            yield event
+        else:
+            raise ValueError(f"corrupt trace: unknown record tag {tag} at offset {offset}")
+
+
+def _read_value(data, offset):
+    (length,) = LENGTH.unpack_from(data, offset)
+    offset += LENGTH.size
+    if length == NO_VALUE:
+        return None, offset
+    return data[offset:offset + length].decode(), offset + length
+
+
+# one line of text per event, indented by call depth, with the source line in the first column
+def render_event(event):
+    line_num = event.get("line")
+    column = f"{'-' if line_num is None else line_num:>6}  "
+    indent = "  " * event["depth"]
+    if event["event"] == "stmt":
+        return f"{column}{indent}{event['kind']}  [{event['method']}]"
+    if event["event"] == "call":
+        args = f"({', '.join(event['args'])})" if "args" in event else ""
+        return f"{column}{indent}-> {event['method']}{args} on {event['class']}"
+    text = f"{column}{indent}<- {event['method']}"
+    if event["status"] != "return":
+        text += f" {event['status']}"
+    if "value" in event:
+        text += f" {event['value']}"
+    return text
+
+
+def main(argv):
+    arg_parser = argparse.ArgumentParser(description="Render a Brewin execution trace.")
+    arg_parser.add_argument("trace")
+    arg_parser.add_argument("--json", action="store_true", help="print events as JSON lines")
+    args = arg_parser.parse_args(argv)
+
+    for event in read_trace(args.trace):
+        print(json.dumps(event) if args.json else render_event(event))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -2,16 +2,135 @@ from intbase import InterpreterBase
 
 
 # Enumerated type for our different language data types
+# Type objects are interned: Type(name) returns the same instance for every use of a type name, so types
+# are compared by identity. Supertypes are a property of the program and are tracked by the TypeManager.
 class Type:
-    def __init__(self, type_name, supertype_name=None):
-        self.type_name = type_name
-        self.supertype_name = supertype_name
+    __interned = {}
 
+    def __new__(cls, type_name):
+        try:
+            type_obj = Type.__interned.get(type_name)
+        except TypeError:  # malformed type name (e.g., a list); the type checks report it later
+            type_obj = super().__new__(cls)
+            type_obj.type_name = type_name
+            return type_obj
+        if type_obj is None:
+            type_obj = super().__new__(cls)
+            type_obj.type_name = str(type_name)
+            Type.__interned[type_obj.type_name] = type_obj
+        return type_obj
+
+    # unpickled and copied types resolve to the interned instance
+    def __reduce__(self):
+        return (Type, (self.type_name,))
+
+    def __copy__(self):
+        return self
+
+    def __deepcopy__(self, memo):
+        return self
+
+    def __repr__(self):
+        return f"Type({self.type_name!r})"
+
+
+BOOL_TYPE = Type(InterpreterBase.BOOL_DEF)
+INT_TYPE = Type(InterpreterBase.INT_DEF)
+STRING_TYPE = Type(InterpreterBase.STRING_DEF)
+NULL_TYPE = Type(InterpreterBase.NULL_DEF)
+NOTHING_TYPE = Type(InterpreterBase.NOTHING_DEF)
+
+
+# a string built by concatenation, kept as a tree of the pieces so that (+ s "x") doesn't copy s: building a
+# string one piece at a time is linear rather than quadratic in its length. a Rope is flattened into a str, once,
+# when its text is needed (printing it, comparing it, throwing it); concatenations that stay shorter than
+# LEAF_SIZE produce plain strs, and short pieces appended to a rope are merged into its last leaf, so a rope has
+# about one node per LEAF_SIZE characters
+class Rope:
+    LEAF_SIZE = 256
+
+    __slots__ = ("left", "right", "length", "flat")
+
+    def __init__(self, left, right, length):
+        self.left = left  # str or Rope
+        self.right = right  # str or Rope
+        self.length = length
+        self.flat = None  # the text, once flattened; left and right are dropped then
+
+    # returns the text as a str; walks the tree with a stack, since ropes built in a loop are very deep
+    def flatten(self):
+        if self.flat is None:
+            pieces = []
+            stack = [self]
+            while stack:
+                node = stack.pop()
+                if type(node) is str:
+                    pieces.append(node)
+                elif node.flat is not None:
+                    pieces.append(node.flat)
+                else:
+                    stack.append(node.right)
+                    stack.append(node.left)
+            self.flat = "".join(pieces)
+            self.left = self.right = None
+        return self.flat
+
+    def __len__(self):
+        return self.length
+
+    def __str__(self):
+        return self.flatten()
+
+    def __repr__(self):
+        return f"Rope({self.flatten()!r})"
+
+    # comparisons (with strs or other ropes) compare the text
     def __eq__(self, other):
-        return (
-            self.type_name == other.type_name
-            and self.supertype_name == other.supertype_name
-        )
+        return self.flatten() == flatten(other)
+
+    def __ne__(self, other):
+        return self.flatten() != flatten(other)
+
+    def __lt__(self, other):
+        return self.flatten() < flatten(other)
+
+    def __le__(self, other):
+        return self.flatten() <= flatten(other)
+
+    def __gt__(self, other):
+        return self.flatten() > flatten(other)
+
+    def __ge__(self, other):
+        return self.flatten() >= flatten(other)
+
+    def __hash__(self):
+        return hash(self.flatten())
+
+    def __reduce__(self):
+        return str, (self.flatten(),)
+
+
+# the value of a Brewin string concatenation (+ a b) of two Python values of string Values (strs or Ropes)
+def concatenate(a, b):
+    if type(a) is Rope and a.flat is not None:
+        a = a.flat
+    if type(b) is Rope and b.flat is not None:
+        b = b.flat
+    length = len(a) + len(b)
+    if length < Rope.LEAF_SIZE:
+        return a + b  # both are strs: ropes are never this short
+    if type(a) is Rope and type(b) is str and type(a.right) is str and len(a.right) + len(b) <= Rope.LEAF_SIZE:
+        return Rope(a.left, a.right + b, length)
+    if type(b) is Rope and type(a) is str and type(b.left) is str and len(a) + len(b.left) <= Rope.LEAF_SIZE:
+        return Rope(a + b.left, b.right, length)
+    return Rope(a, b, length)
+
+
+# the str of the Python value of a string Value
+def flatten(text):
+    if type(text) is Rope:
+        return text.flatten()
+    return text
 
 
 # Represents a value, which has a type and its value
@@ -31,44 +150,42 @@ class Value:
         return self.t
 
     def is_null(self):
-        return self.v == None and self.t != Type(InterpreterBase.NOTHING_DEF)
+        return self.v is None and self.t is not NOTHING_TYPE
   
     def is_typeless_null(self):
-        return self.v == None and self.t == Type(InterpreterBase.NULL_DEF)
+        return self.v is None and self.t is NULL_TYPE
     
     def __eq__(self, other):
-        return self.t == other.t and self.v == other.v
+        return self.t is other.t and self.v == other.v
 
 
 # val is a string with the value we want to use to construct a Value object.
 # e.g., '1234' 'null' 'true' '"foobar"'
 def create_value(val):
     if val == InterpreterBase.TRUE_DEF:
-        return Value(Type(InterpreterBase.BOOL_DEF), True)
+        return Value(BOOL_TYPE, True)
     elif val == InterpreterBase.FALSE_DEF:
-        return Value(Type(InterpreterBase.BOOL_DEF), False)
+        return Value(BOOL_TYPE, False)
     elif val[0] == '"':
-        return Value(Type(InterpreterBase.STRING_DEF), val.strip('"'))
+        return Value(STRING_TYPE, val.strip('"'))
     elif val.lstrip('-').isnumeric():
-        return Value(Type(InterpreterBase.INT_DEF), int(val))
+        return Value(INT_TYPE, int(val))
     elif val == InterpreterBase.NULL_DEF:
-        return Value(Type(InterpreterBase.NULL_DEF), None)
+        return Value(NULL_TYPE, None)
     else:
         return None
 
 
 # create a default value of the specified type; type_def is a Type object
 def create_default_value(type_def):
-    if type_def == Type(InterpreterBase.BOOL_DEF):
-        return Value(Type(InterpreterBase.BOOL_DEF), False)
-    elif type_def == Type(InterpreterBase.STRING_DEF):
-        return Value(Type(InterpreterBase.STRING_DEF), "")
-    elif type_def == Type(InterpreterBase.INT_DEF):
-        return Value(Type(InterpreterBase.INT_DEF), 0)
-    elif type_def == Type(
-        InterpreterBase.NOTHING_DEF
-    ):  # used for void return type on methods
-        return Value(Type(InterpreterBase.NOTHING_DEF), None)
+    if type_def is BOOL_TYPE:
+        return Value(BOOL_TYPE, False)
+    elif type_def is STRING_TYPE:
+        return Value(STRING_TYPE, "")
+    elif type_def is INT_TYPE:
+        return Value(INT_TYPE, 0)
+    elif type_def is NOTHING_TYPE:  # used for void return type on methods
+        return Value(NOTHING_TYPE, None)
     else:
         return Value(
             type_def, None
@@ -80,6 +197,15 @@ def create_default_value(type_def):
 class TypeManager:
     def __init__(self):
         self.map_typename_to_type = {}
+        self.map_typename_to_supertype_name = {}
+        # subtype tests use ancestor bitsets: every registered type gets a bit, and a type's ancestor mask
+        # has the bits of itself and all its supertypes set. masks are computed lazily
+        self.type_bits = {}
+        self.ancestor_masks = {}
+        # (typea, typeb, for_assignment) -> result of check_type_compatibility
+        self.compatibility_cache = {}
+        # bumped whenever the set of types or their supertypes changes; caches of type checks compare it
+        self.generation = 0
         self.__setup_primitive_types()
 
     # used to register a new class name (and its supertype name, if present as a valid type so it can be used
@@ -87,8 +213,18 @@ class TypeManager:
     # needs to be called the moment we parse the class name and superclass name to enable things like linked lists
     # and other self-referential structures
     def add_class_type(self, class_name, superclass_name):
-        class_type = Type(class_name, superclass_name)
-        self.map_typename_to_type[class_name] = class_type
+        if (
+            class_name in self.map_typename_to_type
+            and self.map_typename_to_supertype_name[class_name] == superclass_name
+        ):
+            return  # already registered (e.g., a template instantiated again); cached results still hold
+        if class_name not in self.type_bits:
+            self.type_bits[class_name] = 1 << len(self.type_bits)
+        self.map_typename_to_type[class_name] = Type(class_name)
+        self.map_typename_to_supertype_name[class_name] = superclass_name
+        self.ancestor_masks.clear()
+        self.compatibility_cache.clear()
+        self.generation += 1
 
     def is_valid_type(self, typename):
         return typename in self.map_typename_to_type
@@ -99,27 +235,58 @@ class TypeManager:
             return None
         return self.map_typename_to_type[typename]
 
+    # return the name of the supertype of the specified typename string, or None
+    def get_supertype_name(self, typename):
+        return self.map_typename_to_supertype_name.get(typename)
+
     # args are strings
     def is_a_subtype(self, suspected_supertype, suspected_subtype):
         if not self.is_valid_type(suspected_supertype) or not self.is_valid_type(
             suspected_subtype
         ):
             return False
+        mask = self.ancestor_masks.get(suspected_subtype)
+        if mask is None:
+            mask = self.__compute_ancestor_mask(suspected_subtype)
+            if mask is None:
+                return self.__walk_supertypes(suspected_supertype, suspected_subtype)
+        return mask & self.type_bits[suspected_supertype] != 0
+
+    # returns the ancestor mask of typename, or None if its inheritance chain runs through an unregistered
+    # type or a cycle; such chains are checked by walking them
+    def __compute_ancestor_mask(self, typename):
+        mask = 0
+        cur_type = typename
+        while cur_type is not None:
+            bit = self.type_bits.get(cur_type)
+            if bit is None or mask & bit:
+                return None
+            mask |= bit
+            cur_type = self.map_typename_to_supertype_name[cur_type]
+        self.ancestor_masks[typename] = mask
+        return mask
+
+    def __walk_supertypes(self, suspected_supertype, suspected_subtype):
         cur_type = suspected_subtype
         while True:
             if (
                 suspected_supertype == cur_type
             ):  # passing a Student object to a Student parameter
                 return True
-            type_info = self.get_type_info(cur_type)
-            if type_info.supertype_name is None:
+            cur_type = self.map_typename_to_supertype_name[cur_type]
+            if cur_type is None:
                 return False
-            cur_type = (
-                type_info.supertype_name #check suspected supertype is in the inheritance chain
-            )  # check the base class of the subtype next
 
     # typea and typeb are Type objects
     def check_type_compatibility(self, typea, typeb, for_assignment):
+        key = (typea, typeb, for_assignment)
+        result = self.compatibility_cache.get(key)
+        if result is None:
+            result = self.__check_type_compatibility(typea, typeb, for_assignment)
+            self.compatibility_cache[key] = result
+        return result
+
+    def __check_type_compatibility(self, typea, typeb, for_assignment):
         # if either type is invalid (E.g., the user referenced a class name that doesn't exist) then
         # return false
         if not self.is_valid_type(typea.type_name) or not self.is_valid_type(
@@ -137,7 +304,7 @@ class TypeManager:
         ):  # person == animal
             return True
         # if the types are identical then they're compatible
-        if typea == typeb:
+        if typea is typeb:
             return True
         # if either is a primitive type, but the types aren't the same, they can't match
         if (
@@ -163,15 +330,10 @@ class TypeManager:
             InterpreterBase.STRING_DEF,
             InterpreterBase.BOOL_DEF,
         }
-        self.map_typename_to_type[InterpreterBase.INT_DEF] = Type(
-            InterpreterBase.INT_DEF
-        )
-        self.map_typename_to_type[InterpreterBase.STRING_DEF] = Type(
-            InterpreterBase.STRING_DEF
-        )
-        self.map_typename_to_type[InterpreterBase.BOOL_DEF] = Type(
-            InterpreterBase.BOOL_DEF
-        )
-        self.map_typename_to_type[InterpreterBase.NULL_DEF] = Type(
-            InterpreterBase.NULL_DEF
-        )
\ No newline at end of file
+        for type_name in (
+            InterpreterBase.INT_DEF,
+            InterpreterBase.STRING_DEF,
+            InterpreterBase.BOOL_DEF,
+            InterpreterBase.NULL_DEF,
+        ):
+            self.add_class_type(type_name, None)
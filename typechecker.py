@@ -0,0 +1,535 @@
+"""
+Ahead-of-time type checker for loaded Brewin programs.
+
+    Interpreter(type_check=True).run(program)    # reject ill-typed programs before main runs
+    Interpreter().validate(program)              # list of Diagnostics, without running anything
+    python typechecker.py program.br ...         # validate a batch of programs from the command line
+
+TypeChecker walks every method of every ClassDef and infers a static type for each expression. Values can be
+of a subclass of their static type at run time, so a static type is an upper bound; an error is only reported
+when it would happen for every value the expression could produce - e.g. assigning a string to an int, an if
+condition that is an int, a method that no possible receiver class defines (when the receiver can't be null,
+which would fault first) - so a program that passes can still fail at run time, but never with an error the
+checker reported.
+
+Errors are not reported in code that can't run: the branch of an if, or the body of a while, that a literal
+true or false condition rules out, the statements of a block after one that always returns or throws, and the
+methods of a template instantiation that no checked call reaches
+(a template method may only type check for some type arguments, e.g. (== x 5) with x a field_type). That code
+is still walked, so the template instantiations it names get built, but silently.
+
+The statements whose runtime check the checker proves can never fail are recorded per ClassDef (set, return,
+if and while statements, by id); when a program passes, the engines skip those checks. Methods that use try
+are never verified, because a caught exception can leave the walker's environment with fewer blocks than the
+source has.
+"""
+
+import sys
+
+from intbase import InterpreterBase, ErrorType
+from objectv2 import ObjectDef
+from type_valuev2 import Type, create_value
+
+INT_TYPE_CONST = ObjectDef.INT_TYPE_CONST
+STRING_TYPE_CONST = ObjectDef.STRING_TYPE_CONST
+BOOL_TYPE_CONST = ObjectDef.BOOL_TYPE_CONST
+NULL_TYPE_CONST = Type(InterpreterBase.NULL_DEF)
+NOTHING_TYPE_CONST = Type(InterpreterBase.NOTHING_DEF)
+PRIMITIVE_TYPES = (INT_TYPE_CONST, STRING_TYPE_CONST, BOOL_TYPE_CONST)
+PRIMITIVE_TYPE_NAMES = (InterpreterBase.INT_DEF, InterpreterBase.BOOL_DEF, InterpreterBase.STRING_DEF)
+
+# result type of each binary operator whatever its operands are, or None if it depends on them (+)
+BINARY_RESULT_TYPES = {
+    "+": None,
+    "-": INT_TYPE_CONST,
+    "*": INT_TYPE_CONST,
+    "/": INT_TYPE_CONST,
+    "%": INT_TYPE_CONST,
+}
+
+
+# one error the checker proved, in the same terms the interpreter would report it
+class Diagnostic:
+    def __init__(self, error_type, description, line_num):
+        self.error_type = error_type
+        self.description = description
+        self.line_num = line_num
+
+    def __str__(self):
+        where = f" on line {self.line_num}" if self.line_num else ""
+        return f"{self.error_type}{where}: {self.description}"
+
+    def __repr__(self):
+        return f"Diagnostic({self.error_type}, {self.description!r}, {self.line_num!r})"
+
+
+class TypeChecker:
+    def __init__(self, interpreter):
+        self.interpreter = interpreter
+        self.diagnostics = []
+        self.verified = {}  # ClassDef -> ids of the statements whose runtime type checks can't fail
+        self.pending = []  # (ClassDef, MethodDef) still to check, including those of templates reached on the way
+        self.unreached = {}  # id(MethodDef) -> (ClassDef, MethodDef), for template instance methods not reached yet
+        self.seen = set()
+        self.reporting = True  # False while walking code that can't run
+        self.descendants = {}  # ClassDef -> ClassDefs that inherit from it, directly or not
+        # per-method state
+        self.class_def = None
+        self.scopes = None  # stack of {name: Type}, the parameters at the bottom
+        self.verifiable = False
+        self.exact = True  # False once a try may have unbalanced the environment's blocks
+
+    # checks the whole loaded program; returns the list of Diagnostics, in source order per class
+    def check(self):
+        for class_def in self.interpreter.class_index.values():
+            superclass = class_def.get_superclass()
+            while superclass is not None:
+                self.descendants.setdefault(superclass, []).append(class_def)
+                superclass = superclass.get_superclass()
+        for class_def in list(self.interpreter.class_index.values()):
+            self.__enqueue(class_def)
+        while self.pending or self.unreached:
+            if self.pending:
+                class_def, method_def = self.pending.pop(0)
+                self.reporting = True
+            else:
+                class_def, method_def = self.unreached.pop(next(iter(self.unreached)))
+                self.reporting = False
+            self.__check_method(class_def, method_def)
+        return self.diagnostics
+
+    # hands the verified statements to their classes, so the engines skip their checks
+    def install(self):
+        for class_def, statement_ids in self.verified.items():
+            class_def.verified_statements = frozenset(statement_ids)
+
+    def __enqueue(self, class_def):
+        if class_def is not None and class_def not in self.seen:
+            self.seen.add(class_def)
+            template_instance = InterpreterBase.TYPE_CONCAT_CHAR in class_def.get_name()
+            for method_def in class_def.get_methods():
+                if template_instance:
+                    self.unreached[id(method_def)] = (class_def, method_def)
+                else:
+                    self.pending.append((class_def, method_def))
+
+    # queues the template instance methods among method_defs, which a call being checked can dispatch to
+    def __reach(self, method_defs):
+        if self.reporting:
+            for method_def in method_defs:
+                reached = self.unreached.pop(id(method_def), None)
+                if reached is not None:
+                    self.pending.append(reached)
+
+    def __report(self, error_type, description, line_num):
+        if self.exact and self.reporting:
+            self.diagnostics.append(Diagnostic(error_type, description, line_num))
+
+    def __verify(self, code):
+        if self.verifiable:
+            self.verified.setdefault(self.class_def, set()).add(id(code))
+
+    def __check_method(self, class_def, method_def):
+        self.class_def = class_def
+        self.exact = True
+        self.verifiable = not self.__uses_try(method_def.code)
+        parameters = {}
+        for param in method_def.formal_params:
+            if param.name in parameters:
+                self.__report(
+                    ErrorType.NAME_ERROR, "duplicate formal param name " + param.name, method_def.line_num
+                )
+            parameters[param.name] = param.type
+        self.scopes = [parameters]
+        try:
+            self.__check_statement(method_def.code, method_def.return_type)
+        except (IndexError, TypeError, AttributeError):
+            pass  # malformed code; the interpreter reports (or trips over) it when it runs
+
+    @staticmethod
+    def __uses_try(code):
+        pending = [code]
+        while pending:
+            node = pending.pop()
+            if type(node) is list and node:
+                if node[0] == InterpreterBase.TRY_DEF:
+                    return True
+                pending.extend(node)
+        return False
+
+    # types
+
+    # returns the ClassDef of a class Type (instantiating templates it names), or None for other types
+    def __class_for(self, type_obj, line_num):
+        if type_obj is None:
+            return None
+        return self.__class_named(type_obj.type_name, line_num)
+
+    def __class_named(self, class_name, line_num):
+        class_def = self.interpreter.class_index.get(class_name)
+        if class_def is None and InterpreterBase.TYPE_CONCAT_CHAR in class_name:
+            class_def = self.__instantiate(class_name, line_num)
+        self.__enqueue(class_def)
+        return class_def
+
+    def __instantiate(self, class_name, line_num):
+        template_def = self.interpreter.template_class_index.get(class_name.split(InterpreterBase.TYPE_CONCAT_CHAR)[0])
+        if template_def is None:
+            return None
+        error_type, error_line = self.interpreter.get_error_type_and_line()
+        try:
+            return template_def.instantiate(class_name)
+        except RuntimeError as error:
+            description = self.interpreter.error_description(error)
+            self.__report(self.interpreter.error_type, description, self.interpreter.error_line or line_num)
+            # it's only an error if the program gets as far as using the template
+            self.interpreter.error_type, self.interpreter.error_line = error_type, error_line
+            return None
+
+    @staticmethod
+    def __is_class_type(type_obj):
+        return type_obj not in PRIMITIVE_TYPES and type_obj is not NULL_TYPE_CONST and type_obj is not NOTHING_TYPE_CONST
+
+    # True if a value whose static type is source can always be assigned to target, False if it never can,
+    # None if that depends on the value (a subclass instance stored in a superclass reference)
+    def __assignable(self, target, source):
+        if target is None or source is None:
+            return None
+        if self.interpreter.check_type_compatibility(target, source, True):
+            return True
+        if (
+            self.__is_class_type(source)
+            and self.__is_class_type(target)
+            and self.interpreter.is_a_subtype(source.type_name, target.type_name)
+        ):
+            return None
+        return False
+
+    # statements
+
+    def __check_statement(self, code, return_type):
+        tok = code[0]
+        line_num = tok.line_num
+        if tok == InterpreterBase.BEGIN_DEF:
+            self.__check_block(code[1:], return_type)
+        elif tok == InterpreterBase.SET_DEF:
+            value_type = self.__expression_type(code[2], line_num)
+            if self.__check_assignment(code[1], value_type, line_num):
+                self.__verify(code)
+        elif tok == InterpreterBase.IF_DEF:
+            self.__check_condition(code, InterpreterBase.IF_DEF, line_num)
+            condition = self.__constant_condition(code[1])
+            self.__check_branch(code[2], return_type, condition is not False)
+            if len(code) > 3:
+                self.__check_branch(code[3], return_type, condition is not True)
+        elif tok == InterpreterBase.WHILE_DEF:
+            self.__check_condition(code, InterpreterBase.WHILE_DEF, line_num)
+            self.__check_branch(code[2], return_type, self.__constant_condition(code[1]) is not False)
+        elif tok == InterpreterBase.CALL_DEF:
+            self.__call_type(code, line_num)
+        elif tok == InterpreterBase.RETURN_DEF:
+            self.__check_return(code, return_type, line_num)
+        elif tok == InterpreterBase.INPUT_STRING_DEF:
+            self.__check_assignment(code[1], STRING_TYPE_CONST, line_num)
+        elif tok == InterpreterBase.INPUT_INT_DEF:
+            self.__check_assignment(code[1], INT_TYPE_CONST, line_num)
+        elif tok == InterpreterBase.PRINT_DEF:
+            for expr in code[1:]:
+                self.__expression_type(expr, line_num)
+        elif tok == InterpreterBase.LET_DEF:
+            self.__check_let(code, return_type, line_num)
+        elif tok == InterpreterBase.TRY_DEF:
+            self.__check_statement(code[1], return_type)
+            self.scopes.append({InterpreterBase.EXCEPTION_VARIABLE_DEF: STRING_TYPE_CONST})
+            for statement in code[2:3]:
+                self.__check_statement(statement, return_type)
+            self.scopes.pop()
+            self.exact = False  # the walker pops a block of the enclosing let after a caught exception
+        elif tok == InterpreterBase.THROW_DEF:
+            exception_type = self.__expression_type(code[1], line_num)
+            if exception_type is not None and exception_type is not STRING_TYPE_CONST:
+                self.__report(ErrorType.TYPE_ERROR, "exception is not a string", line_num)
+
+    # checks a branch or loop body, silently if its condition rules out ever running it
+    def __check_branch(self, code, return_type, runs):
+        reporting = self.reporting
+        self.reporting = reporting and runs
+        self.__check_statement(code, return_type)
+        self.reporting = reporting
+
+    # checks the statements of a block in order; those after one that always ends the method can't run
+    def __check_block(self, statements, return_type):
+        runs = True
+        for statement in statements:
+            self.__check_branch(statement, return_type, runs)
+            runs = runs and not self.__terminates(statement)
+
+    # True if running code always ends the method, by a return or a throw, or never finishes (a while true loop)
+    def __terminates(self, code):
+        tok = code[0]
+        if tok == InterpreterBase.RETURN_DEF or tok == InterpreterBase.THROW_DEF:
+            return True
+        if tok == InterpreterBase.BEGIN_DEF:
+            return any(self.__terminates(statement) for statement in code[1:])
+        if tok == InterpreterBase.LET_DEF:
+            return any(self.__terminates(statement) for statement in code[2:])
+        if tok == InterpreterBase.IF_DEF:
+            condition = self.__constant_condition(code[1])
+            then_ends = condition is False or self.__terminates(code[2])
+            else_ends = condition is True or (len(code) > 3 and self.__terminates(code[3]))
+            return then_ends and else_ends
+        if tok == InterpreterBase.WHILE_DEF:
+            return self.__constant_condition(code[1]) is True
+        return False
+
+    # the value of a condition that is a literal true or false, else None
+    def __constant_condition(self, expr):
+        if type(expr) is list or self.__variable_type(expr) is not None:
+            return None
+        value = self.__constant(expr)
+        if value is None or value.type() is not BOOL_TYPE_CONST:
+            return None
+        return value.value()
+
+    def __check_let(self, code, return_type, line_num):
+        scope = {}
+        for var_def in code[1]:
+            var_type = self.__local_type(var_def, line_num)
+            if var_def[1] in scope:
+                self.__report(ErrorType.NAME_ERROR, "duplicate local variable name " + var_def[1], line_num)
+            scope[var_def[1]] = var_type
+        self.scopes.append(scope)
+        self.__check_block(code[2:], return_type)
+        self.scopes.pop()
+
+    # the declared Type of a let local, checking it the way ObjectDef._create_local does
+    def __local_type(self, var_def, line_num):
+        type_name = var_def[0]
+        if InterpreterBase.TYPE_CONCAT_CHAR in type_name:
+            self.__class_named(type_name, line_num)
+        elif len(var_def) == 2 and type_name not in PRIMITIVE_TYPE_NAMES:
+            if type_name not in self.interpreter.class_index:
+                self.__report(ErrorType.TYPE_ERROR, "invalid field type", line_num)
+        elif type_name not in PRIMITIVE_TYPE_NAMES:
+            self.__class_named(type_name, line_num)
+        var_type = Type(type_name)
+        if len(var_def) > 2:
+            default_value = self.__constant(var_def[2])
+            if default_value is not None and not self.interpreter.check_type_compatibility(
+                var_type, default_value.type(), True
+            ):
+                self.__report(
+                    ErrorType.TYPE_ERROR,
+                    f"type mismatch {var_type.type_name} and {default_value.type().type_name}",
+                    line_num,
+                )
+        return var_type
+
+    # checks storing a value of static type value_type into var_name; returns True if the runtime check is
+    # redundant
+    def __check_assignment(self, var_name, value_type, line_num):
+        if type(var_name) is list:
+            return False
+        var_type = self.__variable_type(var_name)
+        if var_type is None:
+            self.__report(ErrorType.NAME_ERROR, "unknown field/variable " + var_name, line_num)
+            return False
+        assignable = self.__assignable(var_type, value_type)
+        if assignable is False:
+            self.__report(
+                ErrorType.TYPE_ERROR, f"type mismatch {var_type.type_name} and {value_type.type_name}", line_num
+            )
+        return assignable is True
+
+    def __check_condition(self, code, kind, line_num):
+        condition_type = self.__expression_type(code[1], line_num)
+        if condition_type is BOOL_TYPE_CONST:
+            self.__verify(code)
+        elif condition_type is not None and all(type(x) is not list for x in code[1]):
+            self.__report(
+                ErrorType.TYPE_ERROR, f"non-boolean {kind} condition " + " ".join(x for x in code[1]), line_num
+            )
+
+    def __check_return(self, code, return_type, line_num):
+        if len(code) == 1:
+            return
+        result_type = self.__expression_type(code[1], line_num)
+        assignable = self.__assignable(return_type, result_type)
+        if assignable is True:
+            self.__verify(code)
+        elif assignable is False:
+            self.__report(
+                ErrorType.TYPE_ERROR,
+                f"type mismatch {return_type.type_name} and {result_type.type_name}",
+                line_num,
+            )
+
+    # expressions
+
+    # the declared Type of the local, parameter or field var_name, or None if there isn't one
+    def __variable_type(self, var_name):
+        for scope in reversed(self.scopes):
+            if var_name in scope:
+                return scope[var_name]
+        field_index = self.class_def.field_index.get(var_name)
+        if field_index is not None:
+            return self.class_def.slot_types[field_index]
+        return None
+
+    @staticmethod
+    def __constant(token):
+        try:
+            return create_value(token)
+        except (ValueError, IndexError):
+            return None
+
+    # returns the static Type of expr, or None if it can't be determined
+    def __expression_type(self, expr, line_num):
+        if type(expr) is not list:
+            for scope in reversed(self.scopes):
+                if expr in scope:
+                    return scope[expr]
+            field_index = self.class_def.field_index.get(expr)
+            if field_index is not None:
+                return self.class_def.slot_types[field_index]
+            value = self.__constant(expr)
+            if value is not None:
+                return value.type()
+            if expr == InterpreterBase.ME_DEF:
+                return Type(self.class_def.get_name())
+            self.__report(ErrorType.NAME_ERROR, "invalid field or parameter " + expr, line_num)
+            return None
+
+        operator = expr[0]
+        if operator in ObjectDef.binary_op_list:
+            return self.__binary_type(operator, expr, line_num)
+        if operator in ObjectDef.unary_op_list:
+            operand_type = self.__expression_type(expr[1], line_num)
+            return BOOL_TYPE_CONST if operand_type is BOOL_TYPE_CONST else None
+        if operator == InterpreterBase.CALL_DEF:
+            return self.__call_type(expr, line_num)
+        if operator == InterpreterBase.NEW_DEF:
+            if self.__class_named(expr[1], line_num) is None:
+                self.__report(ErrorType.TYPE_ERROR, f"No class named {expr[1]} found", line_num)
+                return None
+            return Type(expr[1])
+        return None
+
+    def __binary_type(self, operator, expr, line_num):
+        type1 = self.__expression_type(expr[1], line_num)
+        type2 = self.__expression_type(expr[2], line_num)
+        result_type = BINARY_RESULT_TYPES.get(operator, BOOL_TYPE_CONST)
+        if type1 is None or type2 is None:
+            return result_type
+        if type1 is type2 and type1 in PRIMITIVE_TYPES:
+            if operator not in ObjectDef.binary_ops[type1.type_name]:
+                kind = "bool" if type1 is BOOL_TYPE_CONST else type1.type_name + "s"
+                self.__report(ErrorType.TYPE_ERROR, f"invalid operator applied to {kind}", line_num)
+            return type1 if operator == "+" else result_type
+        if not self.interpreter.check_type_compatibility(type1, type2, False):
+            self.__report(
+                ErrorType.TYPE_ERROR, f"operator {operator} applied to two incompatible types", line_num
+            )
+        return result_type
+
+    # the static type of (call target method_name args...): the return type shared by every method the call
+    # could dispatch to, or None
+    def __call_type(self, code, line_num):
+        target, method_name = code[1], code[2]
+        # a receiver that may be null faults before the arguments are evaluated and the method is looked up, so
+        # their errors don't happen for every value it could have. only me, super and a new object can't be null
+        nullable = False
+        # the methods the call is checked against (it's an error if none accepts the arguments), then the ones
+        # it can dispatch to
+        if target == InterpreterBase.ME_DEF:
+            searched = self.__chain_methods(self.class_def, method_name)
+            dispatched = searched + self.__descendant_methods(self.class_def, method_name)
+        elif target == InterpreterBase.SUPER_DEF:
+            superclass = self.class_def.get_superclass()
+            if superclass is None:
+                self.__report(
+                    ErrorType.TYPE_ERROR,
+                    "invalid call to super object by class " + self.class_def.get_name(),
+                    line_num,
+                )
+                return None
+            searched = dispatched = self.__chain_methods(superclass, method_name)
+        else:
+            receiver_type = self.__expression_type(target, line_num)
+            nullable = type(target) is not list or target[0] != InterpreterBase.NEW_DEF
+            # null receivers fault at run time and primitive ones never get as far as the method lookup
+            class_def = self.__class_for(receiver_type, line_num) if self.__is_class_type(receiver_type) else None
+            if class_def is None:
+                self.__argument_types(code, line_num, receiver_type is NULL_TYPE_CONST)
+                return None
+            # the receiver may be an instance of any subclass
+            searched = dispatched = self.__chain_methods(class_def, method_name) + self.__descendant_methods(
+                class_def, method_name
+            )
+        arg_types = self.__argument_types(code, line_num, nullable)
+        existing = self.__accepting(searched, arg_types)
+        candidates = self.__accepting(dispatched, arg_types)
+        if not existing:
+            if not nullable:
+                self.__report(ErrorType.NAME_ERROR, "unknown method " + method_name, line_num)
+            return None
+        self.__reach(candidates)
+        return_types = {method_def.return_type for method_def in candidates}
+        return return_types.pop() if len(return_types) == 1 else None
+
+    # the static types of the arguments of a call, without reporting their errors if the call may never get to
+    # evaluate them
+    def __argument_types(self, code, line_num, may_fault):
+        reporting = self.reporting
+        self.reporting = reporting and not may_fault
+        arg_types = [self.__expression_type(expr, line_num) for expr in code[3:]]
+        self.reporting = reporting
+        return arg_types
+
+    @staticmethod
+    def __chain_methods(class_def, method_name):
+        return list(class_def.get_vtable().get(method_name, ()))
+
+    def __descendant_methods(self, class_def, method_name):
+        methods = []
+        for descendant in self.descendants.get(class_def, ()):
+            methods.extend(
+                method_def for method_def in descendant.get_methods() if method_def.method_name == method_name
+            )
+        return methods
+
+    # the methods that could accept arguments of the given static types
+    def __accepting(self, method_defs, arg_types):
+        return [
+            method_def
+            for method_def in method_defs
+            if len(method_def.formal_params) == len(arg_types)
+            and all(
+                self.__assignable(formal.type, arg_type) is not False
+                for formal, arg_type in zip(method_def.formal_params, arg_types)
+            )
+        ]
+
+
+# validates each program named on the command line without running it; exits with 1 if any has errors
+def main(paths):
+    from interpreterv3 import Interpreter
+
+    failed = 0
+    for path in paths:
+        with open(path) as source:
+            program = source.read().splitlines()
+        diagnostics = Interpreter(console_output=False).validate(program)
+        if diagnostics:
+            failed += 1
+            for diagnostic in diagnostics:
+                print(f"{path}: {diagnostic}")
+    print(f"{len(paths)} programs checked, {failed} with errors")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        print("usage: python typechecker.py program.br ...")
+        sys.exit(2)
+    sys.exit(main(sys.argv[1:]))